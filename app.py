@@ -1,10 +1,25 @@
 import streamlit as st
-import pandas as pd
 import datetime
+import csv
+import gzip
+import hashlib
+import io
+import json
 import re
 import os
 import time
-import calendar
+import contextlib
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from login_page import STARTUP_TIMES, login, logout, startup_step
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
 
 # --- 1. KONFIGURACJA STRONY ---
 st.set_page_config(
@@ -87,8 +102,6 @@ def apply_custom_css():
     """, unsafe_allow_html=True)
 
 
-apply_custom_css()  # <--- Uruchomienie stylów
-
 # --- 2. ZARZĄDZANIE SESJĄ (State) ---
 if 'uploader_key' not in st.session_state:
     st.session_state['uploader_key'] = 0
@@ -99,53 +112,38 @@ if 'username' not in st.session_state:
     st.session_state['username'] = ""
 
 # --- 3. LOGOWANIE ---
-USERS = {
-    "Djero": "TSP1995",
-    "KKowalski": "Tsp2025",
-    "PPorebski": "TSP2025",
-    "MCzerniak": "TSP2025",
-    "SJaszczurowski": "TSP2025",
-    "guest": "123456789",
-    "Gabrielba": "TSP2026",
-    "MSeredyniecki": "TSP2026"
-}
-
-
-def login():
-    st.title("🔒 Panel Logowania TSP")
-    col1, col2, col3 = st.columns([1, 2, 1])
-    with col2:
-        u = st.text_input("Użytkownik")
-        p = st.text_input("Hasło", type="password")
-        if st.button("Zaloguj", use_container_width=True):
-            if u in USERS and USERS[u] == p:
-                st.session_state['logged_in'] = True
-                st.session_state['username'] = u
-                st.rerun()
-            else:
-                st.error("Błąd logowania")
-
-
-def logout():
-    st.session_state['logged_in'] = False
-    st.session_state['username'] = ""
-    st.rerun()
-
-
+# Ekran logowania (login_page) nie potrzebuje pandas, plotly ani stylów - to wszystko ładujemy dopiero niżej
 if not st.session_state['logged_in']:
     login()
     st.stop()
 
 # --- GŁÓWNA APLIKACJA ---
+with startup_step("import pandas + numpy"):
+    import pandas as pd
+    import numpy as np
+with startup_step("import calendar"):
+    import calendar
+
+# Ramki z loaderów są współdzielone przez wszystkie sesje (st.cache_resource, bez kopii na przebieg).
+# Copy-on-Write sprawia, że zapis do ramki pochodnej nie przecieka do oryginału; w pandas >= 3.0
+# jest zawsze włączony. Samej ramki z loadera nie wolno zmieniać - nowe kolumny przez assign()/copy().
+if int(pd.__version__.split('.')[0]) < 3:
+    pd.set_option('mode.copy_on_write', True)
+
+with startup_step("style CSS"):
+    apply_custom_css()
+
 st.title("⚽ Baza Danych TSP - Centrum Wiedzy")
 
-try:
-    import plotly.express as px
-    import plotly.graph_objects as go
 
-    HAS_PLOTLY = True
-except:
-    HAS_PLOTLY = False
+def load_plotly():
+    """plotly.graph_objects albo None (brak pakietu). Import dopiero przy pierwszym wykresie, nie przy starcie."""
+    try:
+        with startup_step("import plotly (pierwszy wykres)"):
+            import plotly.graph_objects as go
+        return go
+    except ImportError:
+        return None
 
 # --- MAPOWANIE KRAJÓW (BEZ ZMIAN) ---
 COUNTRY_TO_ISO = {
@@ -174,6 +172,7 @@ COUNTRY_TO_ISO = {
 # --- FUNKCJE POMOCNICZE ---
 def render_player_profile(player_name):
     # 1. Ładowanie danych
+    preload_data(HELPER_DATA['render_player_profile'])
     df_uv = load_data("pilkarze.csv")
     df_long = load_data("pilkarze.csv")
     df_strzelcy = load_data("strzelcy.csv")
@@ -187,7 +186,7 @@ def render_player_profile(player_name):
     sort_col = 'suma' if 'suma' in df_uv.columns else ('mecze' if 'mecze' in df_uv.columns else None)
 
     if sort_col:
-        df_uv[sort_col] = pd.to_numeric(df_uv[sort_col], errors='coerce').fillna(0)
+        df_uv = df_uv.assign(**{sort_col: pd.to_numeric(df_uv[sort_col], errors='coerce').fillna(0)})
         df_uv_sorted = df_uv.sort_values(sort_col, ascending=False).drop_duplicates(subset=['imię i nazwisko'])
     else:
         df_uv_sorted = df_uv.drop_duplicates(subset=['imię i nazwisko'])
@@ -277,9 +276,9 @@ def render_player_profile(player_name):
         gole_l = [0] * len(p_stats)
     p_stats['Gole'] = gole_l
 
-    if 'sezon' in p_stats.columns:
+    go = load_plotly()
+    if 'sezon' in p_stats.columns and go is not None:
         try:
-            import plotly.graph_objects as go
             fig = go.Figure()
             if not p_stats.empty and p_stats['liczba'].sum() > 0:
                 fig.add_trace(go.Bar(x=p_stats['sezon'], y=p_stats['liczba'], name='Mecze', marker_color='#3498db'))
@@ -292,7 +291,7 @@ def render_player_profile(player_name):
 
     # C. LISTA GOLI
     if df_det_goals is not None and 'Gole' in df_det_goals.columns:
-        df_det_goals['Gole'] = pd.to_numeric(df_det_goals['Gole'], errors='coerce').fillna(0).astype(int)
+        df_det_goals = df_det_goals.assign(Gole=pd.to_numeric(df_det_goals['Gole'], errors='coerce').fillna(0).astype(int))
         goals_df = df_det_goals[(df_det_goals['Zawodnik_Clean'] == player_name) & (df_det_goals['Gole'] > 0)].copy()
 
         if not goals_df.empty:
@@ -388,6 +387,7 @@ def render_coach_profile(coach_name):
     """Generuje pełny profil trenera obsługujący WIELE KADENCJI + FLAGI."""
 
     # 1. Ładowanie danych
+    preload_data(HELPER_DATA['render_coach_profile'])
     df_t = load_data("trenerzy.csv")
     df_m = load_data("mecze.csv")
 
@@ -407,44 +407,21 @@ def render_coach_profile(coach_name):
     # Pobieramy dane personalne z pierwszego wpisu
     base_info = coach_rows.iloc[0]
 
-    # 3. Przetwarzanie dat dla wszystkich kadencji
-    def smart_date(s):
-        if pd.isna(s) or str(s).strip() == '-': return pd.NaT
-        for fmt in ['%d.%m.%Y', '%Y-%m-%d', '%Y/%m/%d']:
-            try:
-                return pd.to_datetime(s, format=fmt)
-            except:
-                continue
-        return pd.to_datetime(s, errors='coerce')
-
-    # Przygotowanie maski logicznej dla meczów
-    matches_mask = pd.Series([False] * len(df_m)) if df_m is not None else pd.Series([], dtype=bool)
+    # 3. Kadencje i mecze trenera (przypisanie meczów liczone raz na wersję danych)
+    tenures = load_coach_tenures()
     tenure_list = []
-
-    if df_m is not None:
-        col_d = next((c for c in df_m.columns if 'data' in c and 'sort' not in c), None)
-        if col_d:
-            df_m['dt_temp'] = pd.to_datetime(df_m[col_d], dayfirst=True, errors='coerce')
-
-            for _, row in coach_rows.iterrows():
-                s_date = smart_date(row.get('początek'))
-                e_date = smart_date(row.get('koniec'))
-
-                is_curr = False
-                if pd.isna(e_date):
-                    e_date = pd.Timestamp.today() + pd.Timedelta(days=1)
-                    is_curr = True
-
-                s_txt = s_date.strftime('%d.%m.%Y') if pd.notna(s_date) else "?"
-                e_txt = "obecnie" if is_curr else (e_date.strftime('%d.%m.%Y') if pd.notna(row.get('koniec')) else "?")
-                tenure_list.append(f"{s_txt} — {e_txt}")
-
-                if pd.notna(s_date):
-                    matches_mask |= (df_m['dt_temp'] >= s_date) & (df_m['dt_temp'] <= e_date)
+    for _, ten in tenures[tenures['coach_id'] == coach_id(coach_name)].iterrows():
+        s_txt = ten['start'].strftime('%d.%m.%Y') if pd.notna(ten['start']) else "?"
+        e_txt = "obecnie" if pd.isna(ten['end']) else ten['end'].strftime('%d.%m.%Y')
+        tenure_list.append(f"{s_txt} — {e_txt}")
 
     # 4. Filtrowanie meczów
-    coach_matches = df_m[matches_mask].sort_values('dt_temp',
-                                                   ascending=False) if not matches_mask.empty else pd.DataFrame()
+    all_coach_matches = load_coach_matches() if df_m is not None else None
+    if all_coach_matches is not None:
+        coach_matches = all_coach_matches[all_coach_matches['coach_id'] == coach_id(coach_name)].sort_values(
+            'dt', ascending=False)
+    else:
+        coach_matches = pd.DataFrame()
 
     # --- WIDOK PROFILU ---
 
@@ -482,25 +459,9 @@ def render_coach_profile(coach_name):
 
     # B. Statystyki Zbiorcze
     if not coach_matches.empty:
-        wins = 0;
-        draws = 0;
-        losses = 0;
-        gf = 0;
-        ga = 0
-        for _, m in coach_matches.iterrows():
-            res = parse_result(m.get('wynik'))
-            if res:
-                gf += res[0];
-                ga += res[1]
-                if res[0] > res[1]:
-                    wins += 1
-                elif res[0] == res[1]:
-                    draws += 1
-                else:
-                    losses += 1
+        wins, draws, losses, gf, ga, pts = match_balance(coach_matches)
 
         total = wins + draws + losses
-        pts = (wins * 3) + draws
         ppg = pts / total if total > 0 else 0
 
         k1, k2, k3, k4 = st.columns(4)
@@ -511,10 +472,10 @@ def render_coach_profile(coach_name):
 
         with st.expander("📜 Pełna historia meczów"):
             display_df = coach_matches.copy()
-            if 'dt_temp' in display_df.columns: display_df['Data'] = display_df['dt_temp']
+            if 'dt' in display_df.columns: display_df['Data'] = display_df['dt']
             cols_needed = ['Data', 'rywal', 'wynik', 'rozgrywki', 'dom']
             final_cols = [c for c in cols_needed if c in display_df.columns]
-            st.dataframe(display_df[final_cols].style.map(color_results_logic,
+            st.dataframe(display_df[final_cols].style.apply(color_results,
                                                           subset=['wynik'] if 'wynik' in display_df.columns else None),
                          use_container_width=True, hide_index=True,
                          column_config={"Data": st.column_config.DatetimeColumn("Data", format="DD.MM.YYYY")})
@@ -522,37 +483,318 @@ def render_coach_profile(coach_name):
         st.info("Brak zarejestrowanych meczów w bazie dla tego trenera.")
 
 
-@st.cache_data
+# ==========================================
+# WSPÓLNE PARSOWANIE DAT (WEKTOROWO)
+# ==========================================
+PL_MONTHS = {
+    'stycznia': '01', 'lutego': '02', 'marca': '03', 'kwietnia': '04',
+    'maja': '05', 'czerwca': '06', 'lipca': '07', 'sierpnia': '08',
+    'września': '09', 'października': '10', 'listopada': '11', 'grudnia': '12',
+    'styczeń': '01', 'luty': '02', 'marzec': '03', 'kwiecień': '04',
+    'maj': '05', 'czerwiec': '06', 'lipiec': '07', 'sierpień': '08',
+    'wrzesień': '09', 'październik': '10', 'listopad': '11', 'grudzień': '12'
+}
+# Dłuższe nazwy najpierw, żeby 'maja' nie zostało złapane jako 'maj' + 'a'
+PL_MONTHS_RE = re.compile('|'.join(sorted(PL_MONTHS, key=len, reverse=True)))
+TRAILING_TIME_RE = r'\s+\d{1,2}:\d{2}(?::\d{2})?$'
+DATE_FORMATS = ['%d %m %Y', '%d.%m.%Y', '%Y-%m-%d', '%d.%m.%y', '%d-%m-%Y', '%Y.%m.%d', '%d/%m/%Y']
+
+
+def parse_pl_dates(values):
+    """
+    Parsuje całą kolumnę dat naraz: polskie nazwy miesięcy ('9 sierpnia 1997 18:00'),
+    DD.MM.YYYY, DD.MM.YY, daty ISO i doklejoną godzinę HH:mm.
+    Zwraca Series datetime64 (NaT tam, gdzie nie da się odczytać daty).
+    """
+    s = pd.Series(values).astype(str).str.strip().str.lower()
+    s = s.where(~s.isin(['nan', '', '-', 'null', 'none', 'nat']))
+
+    # Jedno przejście regexa: godzina na końcu, nazwy miesięcy, podwójne spacje
+    s = s.str.replace(TRAILING_TIME_RE, '', regex=True)
+    s = s.str.replace(PL_MONTHS_RE, lambda m: PL_MONTHS[m.group(0)], regex=True)
+    s = s.str.replace(r'\s+', ' ', regex=True)
+
+    result = pd.Series(pd.NaT, index=s.index, dtype='datetime64[ns]')
+    for fmt in DATE_FORMATS:
+        todo = result.isna() & s.notna()
+        if not todo.any():
+            break
+        result[todo] = pd.to_datetime(s[todo], format=fmt, errors='coerce')
+    return result
+
+
+# ==========================================
+# WERSJE PLIKÓW I UNIEWAŻNIANIE CACHE
+# ==========================================
+# Wpisy cache loaderów są kluczowane wersją pliku źródłowego (mtime + rozmiar z os.stat), więc zmiana
+# jednego CSV nie rusza ramek wczytanych z innych plików. invalidate_files() od razu zwalnia wpisy
+# zmienionego pliku.
+# Zmiany spoza panelu admina (edycja w Excelu, git pull) nie przechodzą przez invalidate_files, więc
+# track_cache_entry() przy każdym nowym wpisie usuwa wpisy tego samego loadera dla tych samych danych
+# zbudowane ze starszych wersji plików - w pamięci zostaje najwyżej bieżąca i ostatnio przypięta wersja.
+def file_version(filename):
+    """(mtime_ns, rozmiar) pliku albo None, gdy go nie ma."""
+    try:
+        stat = os.stat(filename)
+        return stat.st_mtime_ns, stat.st_size
+    except OSError:
+        return None
+
+
+@st.cache_resource
+def _cache_entries():
+    """Wspólny dla wszystkich sesji spis wpisów cache: nazwa loadera -> {argumenty: pliki źródłowe}."""
+    return {}
+
+
+def _cache_slot(args):
+    """
+    Argumenty wpisu cache rozdzielone na klucz danych (wersje plików zastąpione znacznikiem) i mtime_ns
+    tych wersji. Wersja to (mtime_ns, rozmiar[, i-węzeł]) albo None; argument może być krotką wersji.
+    """
+    def is_version(v):
+        return v is None or (isinstance(v, tuple) and len(v) in (2, 3) and all(isinstance(x, int) for x in v))
+    slot, stamps = [], []
+    for arg in args:
+        if is_version(arg):
+            versions = (arg,)
+        elif isinstance(arg, tuple) and arg and all(is_version(v) for v in arg):
+            versions = arg
+        else:
+            slot.append(arg)
+            continue
+        slot.append(('wersje', len(versions)))
+        stamps.extend(v[0] if v else -1 for v in versions)
+    return tuple(slot), stamps
+
+
+def track_cache_entry(loader_name, args, files):
+    """
+    Zapamiętuje wpis cache loadera (wołane z wnętrza funkcji z cache, czyli tylko przy liczeniu) i zwalnia
+    wpisy tych samych danych zbudowane z wersji plików nie nowszych niż bieżąca.
+    """
+    entries = _cache_entries().setdefault(loader_name, {})
+    slot, stamps = _cache_slot(args)
+    loader = globals().get(loader_name)
+    for old_args in list(entries):
+        old_slot, old_stamps = _cache_slot(old_args)
+        if old_args != args and old_slot == slot and all(o <= n for o, n in zip(old_stamps, stamps)):
+            if loader is not None:
+                loader.clear(*old_args)
+            entries.pop(old_args, None)
+    entries[args] = tuple(os.path.basename(f) for f in files)
+
+
+def invalidate_files(*filenames):
+    """Usuwa z cache wpisy zbudowane z podanych plików (inne pliki zostają w pamięci). Zwraca liczbę wpisów."""
+    changed = {os.path.basename(f) for f in filenames}
+    dropped = 0
+    for loader_name, entries in list(_cache_entries().items()):
+        loader = globals().get(loader_name)
+        for args, files in list(entries.items()):
+            if changed.intersection(files):
+                if loader is not None:
+                    loader.clear(*args)
+                entries.pop(args, None)
+                dropped += 1
+    return dropped
+
+
+# ==========================================
+# GENERACJE DANYCH (SPÓJNY ODCZYT PRZY ZAPISACH)
+# ==========================================
+# Każdy przebieg skryptu przypina jedną generację danych: dla każdego CSV twardy link do bieżącego
+# i-węzła w GENERATIONS_DIR/<i-węzeł>-<mtime>/<plik> oraz rozmiar pliku, i wszystkie loadery tego
+# przebiegu czytają przypięte pliki. Przepisanie pliku to zawsze plik tymczasowy + os.replace (nowy
+# i-węzeł); dopisanie wierszy zostaje w miejscu (koszt niezależny od rozmiaru pliku) i tylko wydłuża
+# i-węzeł, więc czytelnik bierze pierwsze `rozmiar` bajtów przypiętej wersji (read_pinned). Przebieg
+# widzi spójny zestaw plików nawet w trakcie zapisu admina. Zapisujący (również z różnych procesów)
+# wykluczają się blokadą GENERATIONS_DIR/.lock.
+# Przypięcie odświeża mtime katalogu wersji - wersja nieprzypięta przez GENERATION_TTL i niebędąca
+# bieżącym plikiem nie jest już używana przez żadną sesję i gc_generations() ją usuwa. Gdy przebieg
+# częściowy (fragment karty bezczynnej dłużej niż GENERATION_TTL) trafi na usuniętą wersję, plik jest
+# przypinany ponownie tylko wtedy, gdy nadal jest dokładnie tą wersją - inaczej pełny przebieg od nowa.
+GENERATIONS_DIR = ".tsp_data"
+GENERATION_TTL = 600  # s
+
+
+def _pin_file(filename):
+    """Przypina bieżącą wersję pliku. Zwraca (mtime_ns, rozmiar, i-węzeł) - wersję jak w file_version + i-węzeł."""
+    with open(filename, 'rb') as src:
+        stat = os.fstat(src.fileno())
+        version_dir = os.path.join(GENERATIONS_DIR, f"{stat.st_ino}-{stat.st_mtime_ns}")
+        target = os.path.join(version_dir, os.path.basename(filename))
+        if os.path.exists(target):
+            os.utime(version_dir)
+        else:
+            os.makedirs(version_dir, exist_ok=True)
+            tmp = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                os.link(filename, tmp)
+                if os.stat(tmp).st_ino != stat.st_ino:
+                    raise OSError("plik podmieniony w trakcie przypinania")
+            except OSError:
+                # Brak twardych linków albo wyścig z zapisem - kopiujemy z już otwartego i-węzła
+                if os.path.exists(tmp): os.remove(tmp)
+                with open(tmp, 'wb') as dst:
+                    dst.write(src.read(stat.st_size))
+                os.utime(tmp, ns=(stat.st_atime_ns, stat.st_mtime_ns))  # Kopia ma wersję oryginału
+            os.replace(tmp, target)
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+
+def pin_data_generation():
+    """Na początku przebiegu: przypina bieżące wersje wszystkich CSV (jedna generacja na cały przebieg)."""
+    generation = {}
+    for name in sorted(f for f in os.listdir('.') if f.endswith('.csv')):
+        try:
+            generation[name] = _pin_file(name)
+        except OSError:
+            pass  # Plik znika / brak uprawnień - loader przeczyta go wprost
+    st.session_state['data_generation'] = generation
+    gc_state = _generation_gc_state()
+    if time.time() - gc_state['last'] > GENERATION_TTL:
+        gc_state['last'] = time.time()
+        gc_generations()
+    return generation
+
+
+def pinned_version(filename):
+    """Wersja pliku przypięta w tym przebiegu (a dla plików spoza generacji - bieżąca)."""
+    return st.session_state.get('data_generation', {}).get(os.path.basename(filename)) or file_version(filename)
+
+
+def pinned_versions(filenames):
+    return tuple(pinned_version(f) for f in filenames)
+
+
+def generation_lost(filename):
+    """Bajty wersji z klucza nie są już dostępne - przebieg zaczyna się od nowa i przypina bieżące pliki."""
+    st.rerun()
+    raise RuntimeError(f"przypięta wersja pliku {os.path.basename(filename)} nie jest już dostępna")
+
+
+def generation_path(filename, version):
+    """
+    Ścieżka, pod którą leżą bajty danej wersji (przypiętej), inaczej sam plik. Gdy przypięty i-węzeł
+    urósł od przypięcia (dopisane wiersze), zwraca kopię jego pierwszych `rozmiar` bajtów.
+    """
+    if not (version and len(version) == 3):
+        return filename
+    path = os.path.join(GENERATIONS_DIR, f"{version[2]}-{version[0]}", os.path.basename(filename))
+    if not os.path.exists(path):
+        # Wersję usunął gc_generations - przypinamy ponownie tylko niezmieniony plik (nie czytamy go wprost)
+        try:
+            if file_version(filename) != version[:2] or _pin_file(filename) != version:
+                generation_lost(filename)
+        except OSError:
+            generation_lost(filename)
+    return pin_prefix(path, version) if os.path.getsize(path) > version[1] else path
+
+
+def pin_prefix(path, version):
+    """Kopia pierwszych version[1] bajtów przypiętego pliku, z mtime wersji (jak oryginał przed dopisaniem)."""
+    mtime, size, ino = version
+    version_dir = os.path.join(GENERATIONS_DIR, f"{ino}-{mtime}-{size}")
+    target = os.path.join(version_dir, os.path.basename(path))
+    if not os.path.exists(target):
+        os.makedirs(version_dir, exist_ok=True)
+        tmp = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(path, 'rb') as src, open(tmp, 'wb') as dst:
+            dst.write(src.read(size))
+        os.utime(tmp, ns=(mtime, mtime))
+        os.replace(tmp, target)
+    return target
+
+
+def read_pinned(filename, version, reader):
+    """
+    reader(ścieżka) na bajtach przypiętej wersji pliku. Jeśli w trakcie odczytu do przypiętego i-węzła
+    dopisano wiersze, odczyt jest powtarzany z kopii prefiksu - wynik zawsze odpowiada wersji z klucza.
+    """
+    path = generation_path(filename, version)
+    result = reader(path)
+    if path == filename:
+        # Plik spoza generacji - wynik pasuje do klucza tylko, jeśli w trakcie odczytu nic się nie zmieniło
+        if file_version(filename) != version:
+            generation_lost(filename)
+    elif file_version(path) != version[:2]:
+        result = reader(pin_prefix(path, version))
+    return result
+
+
+@st.cache_resource
+def _generation_gc_state():
+    return {'last': 0.0}
+
+
+def gc_generations():
+    """Usuwa wersje, które nie są bieżącymi plikami i których żadna sesja nie przypięła od GENERATION_TTL."""
+    if not os.path.isdir(GENERATIONS_DIR): return 0
+    current = set()
+    for name in os.listdir('.'):
+        if name.endswith('.csv'):
+            stat = os.stat(name)
+            current.add(f"{stat.st_ino}-{stat.st_mtime_ns}")
+    removed = 0
+    now = time.time()
+    for entry in os.listdir(GENERATIONS_DIR):
+        path = os.path.join(GENERATIONS_DIR, entry)
+        if entry in current or not os.path.isdir(path):
+            continue
+        try:
+            if now - os.stat(path).st_mtime > GENERATION_TTL:
+                shutil.rmtree(path)
+                removed += 1
+        except OSError:
+            pass
+    return removed
+
+
+@contextlib.contextmanager
+def data_write_lock():
+    """Wyłączność zapisu plików danych między wątkami i procesami (flock, na Windows msvcrt.locking)."""
+    os.makedirs(GENERATIONS_DIR, exist_ok=True)
+    with open(os.path.join(GENERATIONS_DIR, ".lock"), 'a+b') as fh:
+        if fcntl is not None:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+        else:
+            fh.seek(0)
+            msvcrt.locking(fh.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+            else:
+                fh.seek(0)
+                msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+# ==========================================
+# WCZYTYWANIE DANYCH (WYSTĘPY I PLIKI CSV)
+# ==========================================
+# Ta kopia parsuje CSV bezpośrednio przy każdej nowej wersji pliku. Snapshoty na dysku, rejestr schematów
+# CSV_SCHEMAS, kompaktowa tabela występów, doczytywanie dopisanych wierszy, match_id z indeksem meczów
+# i rejestr zawodników (player_id) są tylko w pythonProject3/app.py - moduły tej kopii z nich nie korzystają.
 def load_details(filename="wystepy.csv"):
     if not os.path.exists(filename):
         return None
+    return _load_details(filename, pinned_version(filename))
+
+
+@st.cache_resource
+def _load_details(filename, version):
+    track_cache_entry('_load_details', (filename, version), [filename])
     try:
-        df = pd.read_csv(filename, sep=';')
+        df = read_pinned(filename, version, lambda path: pd.read_csv(path, sep=';'))
 
         # --- 1. ZAPAMIĘTANIE KOLEJNOŚCI Z PLIKU (Dla Bramkarza na górze) ---
         df['File_Order'] = df.index
 
         # --- PARSOWANIE DATY ---
-        PL_MONTHS = {
-            'stycznia': '01', 'lutego': '02', 'marca': '03', 'kwietnia': '04',
-            'maja': '05', 'czerwca': '06', 'lipca': '07', 'sierpnia': '08',
-            'września': '09', 'października': '10', 'listopada': '11', 'grudnia': '12'
-        }
-
-        def parse_pl_date(date_str):
-            if not isinstance(date_str, str): return pd.NaT
-            s = date_str.lower().strip()
-            for pl, num in PL_MONTHS.items():
-                if pl in s:
-                    s = s.replace(pl, num)
-                    break
-            try:
-                return pd.to_datetime(s, dayfirst=True)
-            except:
-                return pd.NaT
-
         if 'Data' in df.columns:
-            df['Data_Sort'] = df['Data'].apply(parse_pl_date)
+            df['Data_Sort'] = parse_pl_dates(df['Data'])
             # Sortowanie miesza kolejność, ale mamy File_Order
             df = df.sort_values('Data_Sort', ascending=False)
 
@@ -570,21 +812,18 @@ def load_details(filename="wystepy.csv"):
         else:
             df['Czas_Gry'] = 0
 
-        def calc_event_minute(row):
-            status = str(row.get('Status', '')).strip()
-            duration = row['Czas_Gry']
-
-            if status == 'Zszedł':
-                if duration == 45: return 46  # Zmiana w przerwie
-                return duration
-
-            elif status == 'Wszedł':
-                if duration == 45: return 46  # Wejście w przerwie
-                return 90 - duration
-
-            return 0
-
-        df['Minuta_Zmiany_Calc'] = df.apply(calc_event_minute, axis=1)
+        status = df['Status'].astype(str).str.strip() if 'Status' in df.columns else pd.Series('', index=df.index)
+        duration = df['Czas_Gry'].to_numpy()
+        df['Minuta_Zmiany_Calc'] = np.select(
+            [
+                # Zmiana w przerwie (zejście / wejście)
+                status.isin(['Zszedł', 'Wszedł']).to_numpy() & (duration == 45),
+                (status == 'Zszedł').to_numpy(),
+                (status == 'Wszedł').to_numpy(),
+            ],
+            [46, duration, 90 - duration],
+            default=0
+        )
         df['Minuty'] = df['Czas_Gry']  # Dla wyświetlania
 
         return df
@@ -601,18 +840,25 @@ def get_flag_url(name):
     return f"https://flagcdn.com/w40/{code}.png" if code else None
 
 
-@st.cache_data
 def load_data(filename):
     # 1. Sprawdzenie czy plik istnieje
     if not os.path.exists(filename):
         return None
+    return _load_data(filename, pinned_version(filename))
+
 
+@st.cache_resource
+def _load_data(filename, version):
+    track_cache_entry('_load_data', (filename, version), [filename])
     try:
         # 2. Próba wczytania (Auto-separator: wykrywa , lub ;)
-        try:
-            df = pd.read_csv(filename, sep=None, engine='python', encoding='utf-8')
-        except:
-            df = pd.read_csv(filename, sep=None, engine='python', encoding='windows-1250')
+        def read(path):
+            try:
+                return pd.read_csv(path, sep=None, engine='python', encoding='utf-8')
+            except:
+                return pd.read_csv(path, sep=None, engine='python', encoding='windows-1250')
+
+        df = read_pinned(filename, version, read)
 
         df = df.fillna("-")
         # Normalizacja nazw kolumn (małe litery, bez spacji)
@@ -677,16 +923,17 @@ def load_data(filename):
             place_col = next((c for c in df.columns if c in ['miejsce rozgrywania', 'miejsce', 'stadion', 'miasto']),
                              None)
             if place_col:
-                def is_home_match(val):
-                    s = str(val).lower()
-                    keywords = ['bielsko', 'rychlińskiego', 'startowa', 'rekord', 'bks', 'czechowice', 'dom',
-                                'gospodarz']
-                    return '1' if any(k in s for k in keywords) else '0'
-
-                df['dom'] = df[place_col].apply(is_home_match)
+                is_h = df[place_col].astype(str).str.lower().str.contains('|'.join(HOME_PLACE_KEYWORDS), regex=True)
+                df['dom'] = np.where(is_h, '1', '0')
             else:
                 if 'dom' not in df.columns: df['dom'] = '-'
 
+            # 3. Data, wynik, rezultat i miejsce meczu - raz, przy ładowaniu
+            col_date = next((c for c in df.columns if c in ['data meczu', 'data']), None)
+            if col_date:
+                df['dt'] = parse_pl_dates(df[col_date])
+            df = enrich_matches(df)
+
         # --- C. KONWERSJA LICZB (BEZ SEZONU!) ---
         # Lista kolumn, które NA PEWNO mają być liczbami
         int_candidates = [
@@ -721,7 +968,7 @@ def prepare_flags(df, col='narodowość'):
         if poss: target_col = poss[0]
 
     if target_col in df.columns:
-        df['flaga'] = df[target_col].apply(get_flag_url)
+        df = df.assign(flaga=df[target_col].apply(get_flag_url))
         df = df.rename(columns={target_col: 'Narodowość', 'flaga': 'Flaga'})
         cols = list(df.columns)
         if 'Narodowość' in cols and 'Flaga' in cols:
@@ -731,170 +978,351 @@ def prepare_flags(df, col='narodowość'):
     return df
 
 
-def parse_result(val):
-    if not isinstance(val, str): return None
+# ==========================================
+# WZBOGACONA TABELA MECZÓW (mecze.csv)
+# ==========================================
+# Wynik, rezultat (W/D/L), punkty i miejsce meczu liczone raz przy ładowaniu - bilanse w modułach
+# to sumy gotowych kolumn zamiast parsowania 'wynik' w pętlach iterrows().
+HOME_PLACE_KEYWORDS = ['bielsko', 'rychlińskiego', 'startowa', 'rekord', 'bks', 'czechowice', 'dom', 'gospodarz']
+HOME_FLAG_VALUES = ['1', '1.0', 'true', 'tak', 't', 'd', 'dom', 'gospodarz', 'u siebie']
+PENALTIES_RE = r'\(?k\.?(\d+)[:\-](\d+)\)?'
+SCORE_RE = r'(\d+)[:\-](\d+)'
+OUTCOME_POINTS = {'W': 3, 'D': 1, 'L': 0}
+
+
+def parse_results(values):
+    """
+    Parsuje kolumnę wyników: bramki (bez karnych, bez 'pd.') i osobno karne.
+    Kolumny Int64, <NA> gdy wyniku nie ma.
+    """
+    clean = pd.Series(values, dtype='string').str.lower().str.replace(' ', '', regex=False)
+    pens = clean.str.extract(PENALTIES_RE)
+    rest = clean.str.replace(PENALTIES_RE, '', regex=True)
+    rest = rest.str.replace('pd.', '', regex=False).str.replace('dogr.', '', regex=False)
+    rest = rest.str.replace(r'\(.*?\)', '', regex=True)
+    goals = rest.str.extract(SCORE_RE)
+    return pd.DataFrame({
+        'goals_for': goals[0].astype('Int64'), 'goals_against': goals[1].astype('Int64'),
+        'penalties_for': pens[0].astype('Int64'), 'penalties_against': pens[1].astype('Int64'),
+    }, index=clean.index)
+
+
+def result_outcomes(res):
+    """W/D/L dla wyników z parse_results (karne rozstrzygają), None gdy brak wyniku."""
+    t = res['penalties_for'].fillna(res['goals_for'])
+    o = res['penalties_against'].fillna(res['goals_against'])
+    conds = [(t > o).fillna(False).to_numpy(bool), (t == o).fillna(False).to_numpy(bool),
+             (t < o).fillna(False).to_numpy(bool)]
+    return np.select(conds, ['W', 'D', 'L'], default=None)
+
+
+def enrich_matches(df):
+    """Dodaje kolumny goals_for/against, penalties_for/against, outcome, points i is_home."""
+    res = parse_results(df['wynik'] if 'wynik' in df.columns else [None] * len(df))
+    for col in res.columns:
+        df[col] = res[col].array
+    df['outcome'] = result_outcomes(res)
+    df['points'] = df['outcome'].map(OUTCOME_POINTS).fillna(0).astype(int)
+    if 'dom' in df.columns:
+        df['is_home'] = df['dom'].astype(str).str.lower().str.strip().isin(HOME_FLAG_VALUES)
+    else:
+        df['is_home'] = False
+    return df
 
-    clean_val = val.lower().replace(" ", "")
 
-    # 1. SZUKANIE KARNYCH (Priorytet najwyższy)
-    pen_match = re.search(r'\(?k\.?(\d+)[:\-](\d+)\)?', clean_val)
-    if pen_match:
-        return int(pen_match.group(1)), int(pen_match.group(2))
+def match_balance(df):
+    """Bilans meczów z wzbogaconej tabeli: (zwycięstwa, remisy, porażki, strzelone, stracone, punkty)."""
+    counts = df['outcome'].value_counts()
+    played = df['outcome'].notna()
+    return (int(counts.get('W', 0)), int(counts.get('D', 0)), int(counts.get('L', 0)),
+            int(df.loc[played, 'goals_for'].sum()), int(df.loc[played, 'goals_against'].sum()),
+            int(df['points'].sum()))
 
-    # 2. CZYSZCZENIE "pd." (Po dogrywce)
-    clean_val = clean_val.replace("pd.", "").replace("dogr.", "")
-    clean_val = re.sub(r'\(.*?\)', '', clean_val)
 
-    # 3. SZUKANIE STANDARDOWEGO WYNIKU
-    score_match = re.search(r'(\d+)[:\-](\d+)', clean_val)
-    if score_match:
-        return int(score_match.group(1)), int(score_match.group(2))
+RESULT_STYLES = {'W': 'color: #28a745; font-weight: bold;', 'L': 'color: #dc3545; font-weight: bold;',
+                 'D': 'color: #fd7e14; font-weight: bold;'}
 
-    return None
 
+def color_results(col):
+    """Style całej kolumny wyników naraz (do Styler.apply): kolor wg W/D/L, kursywa dla pd./karnych/walkowerów."""
+    outcomes = pd.Series(result_outcomes(parse_results(col.to_numpy())), index=col.index)
+    style = outcomes.map(RESULT_STYLES).fillna('')
+    special = col.astype('string').str.lower().str.contains(r'pd|k\.|wo', regex=True).fillna(False).astype(bool)
+    style[special] += ' font-style: italic; background-color: #f0f0f040;'
+    is_text = col.map(lambda v: isinstance(v, str)).astype(bool)
+    return style.where(is_text, '')
 
-def color_results_logic(val):
-    if not isinstance(val, str): return ''
-    res = parse_result(val)
-    style = ''
-    if res:
-        t, o = res
-        if t > o:
-            style = 'color: #28a745; font-weight: bold;'
-        elif t < o:
-            style = 'color: #dc3545; font-weight: bold;'
-        else:
-            style = 'color: #fd7e14; font-weight: bold;'
 
-    if any(x in val.lower() for x in ['pd', 'k.', 'wo']):
-        style += ' font-style: italic; background-color: #f0f0f040;'
-    return style
+# ==========================================
+# KADENCJE TRENERÓW (PRZYPISANIE MECZÓW)
+# ==========================================
+# Trener każdego meczu z mecze.csv jest ustalany jednym złączeniem przedziałów (start <= data meczu
+# <= koniec), liczonym raz na wersję danych. Profil, porównywarka i rankingi to potem filtry / groupby
+# po coach_id. Gdy w dniu meczu trwa kilka kadencji (tymczasowy trener w trakcie kadencji, zmiana
+# w dniu meczu), mecz należy do rozpoczętej najpóźniej, a przy tym samym dniu początku - do późniejszego
+# wpisu w trenerzy.csv. Po końcu krótkiej kadencji wewnątrz dłuższej mecze wracają do tej dłuższej.
+COACH_MATCH_FILES = ['mecze.csv', 'trenerzy.csv']
+TENURE_COLS = ['tenure_id', 'coach_id', 'coach', 'start', 'end', 'tenure_no']
+
+
+def coach_ids(names):
+    """Stały identyfikator trenera (int64) liczony z nazwiska - ten sam dla wszystkich jego kadencji."""
+    keys = pd.Series(names, dtype=object).astype(str).str.replace(r'\s+', ' ', regex=True).str.strip().str.lower()
+    return np.array([int.from_bytes(hashlib.blake2b(k.encode('utf-8'), digest_size=7).digest(), 'big')
+                     for k in keys], dtype='int64')
+
+
+def coach_id(name):
+    return int(coach_ids([name])[0])
+
+
+def build_coach_tenures(df_t):
+    """
+    Kadencje z trenerzy.csv w kolejności pliku: tenure_id (numer wiersza), coach_id,
+    start/end (end = NaT - kadencja trwa) i tenure_no - która to kadencja trenera.
+    """
+    if df_t is None or df_t.empty or 'imię i nazwisko' not in df_t.columns:
+        return pd.DataFrame(columns=TENURE_COLS)
+    col_start = next((c for c in df_t.columns if c in ['początek', 'start']), None)
+    col_end = next((c for c in df_t.columns if c in ['koniec', 'end']), None)
+    no_dates = [None] * len(df_t)
+    ten = pd.DataFrame({
+        'tenure_id': np.arange(len(df_t)),
+        'coach_id': coach_ids(df_t['imię i nazwisko']),
+        'coach': df_t['imię i nazwisko'].astype(str).str.strip().to_numpy(),
+        'start': parse_pl_dates(df_t[col_start] if col_start else no_dates).to_numpy(),
+        'end': parse_pl_dates(df_t[col_end] if col_end else no_dates).to_numpy(),
+    })
+    ten['tenure_no'] = ten.sort_values(['start', 'tenure_id']).groupby('coach_id').cumcount() + 1
+    return ten[TENURE_COLS]
+
+
+def tenure_ids_on(dates, tenures):
+    """
+    tenure_id kadencji trwającej w każdej z dat (koniec pusty = trwa do dziś), spośród kilku trwających
+    rozpoczętej najpóźniej; -1, gdy żadna. Maska data x kadencja - kadencji jest kilkadziesiąt.
+    """
+    dates = np.asarray(dates, dtype='datetime64[ns]')
+    out = np.full(len(dates), -1, dtype='int64')
+    ten = tenures.dropna(subset=['start']).sort_values(['start', 'tenure_id'])
+    if ten.empty or not len(dates):
+        return out
+    start = ten['start'].to_numpy('datetime64[ns]')
+    end = ten['end'].to_numpy('datetime64[ns]')
+    day = dates[:, None]
+    active = (start <= day) & (np.isnat(end) | (day <= end))  # Data NaT nie pasuje do żadnej kadencji
+    hit = active.any(axis=1)
+    latest = active.shape[1] - 1 - active[:, ::-1].argmax(axis=1)  # Ostatnia trwająca w kolejności startu
+    out[hit] = ten['tenure_id'].to_numpy('int64')[latest[hit]]
+    return out
+
+
+def build_coach_matches(df_m, tenures):
+    """
+    Tabela meczów (indeks jak w df_m) z kolumnami kadencji: tenure_id, coach_id, coach, tenure_no
+    i tenure_match_no (numer meczu w kadencji, od 1). Mecz bez trenera: tenure_id -1, coach_id 0.
+    """
+    if 'dt' in df_m.columns:
+        tenure_id = tenure_ids_on(df_m['dt'].astype('datetime64[ns]').to_numpy(), tenures)
+    else:
+        tenure_id = np.full(len(df_m), -1, dtype='int64')
 
+    # Int64, bo NaN dla meczów bez trenera zamieniłby 56-bitowe coach_id na float
+    info = tenures.astype({'coach_id': 'Int64', 'tenure_no': 'Int64'}).set_index('tenure_id').reindex(tenure_id)
+    out = df_m.assign(tenure_id=tenure_id,
+                      coach_id=info['coach_id'].fillna(0).to_numpy('int64'),
+                      coach=info['coach'].to_numpy(),
+                      tenure_no=info['tenure_no'].array)
+    order = out.sort_values('dt', kind='stable') if 'dt' in out.columns else out
+    match_no = order.groupby('tenure_id').cumcount() + 1
+    out['tenure_match_no'] = match_no.astype('Int64').where(out['tenure_id'] >= 0)
+    return out
 
-def parse_scorers(scorers_str):
-    if not isinstance(scorers_str, str) or pd.isna(scorers_str) or scorers_str == '-': return {}
-    parts = scorers_str.split(',')
-    stats = {}
-    current_scorer = None
-    for part in parts:
-        part = part.strip()
-        if not part: continue
-        is_own = bool(re.search(r'\(s\)|s\.|sam\.', part.lower()))
-        clean_check = re.sub(r'\(k\)|k\.|\(s\)|s\.|sam\.', '', part.lower())
-        has_letters = bool(re.search(r'[a-z]{2,}', clean_check))
-
-        if has_letters:
-            name = re.sub(r'\d+', '', part)
-            name = re.sub(r'\(k\)|k\.|\(s\)|s\.|sam\.', '', name, flags=re.IGNORECASE)
-            name = name.replace('(', '').replace(')', '').replace('.', '').strip()
-            if name:
-                current_scorer = name
-                target = 'Bramka samobójcza' if is_own else current_scorer
-                stats[target] = stats.get(target, 0) + 1
-        else:
-            if current_scorer:
-                target = 'Bramka samobójcza' if is_own else current_scorer
-                stats[target] = stats.get(target, 0) + 1
-    return stats
 
+def load_coach_tenures(filename="trenerzy.csv"):
+    return _load_coach_tenures(filename, pinned_version(filename))
 
-def format_scorers_html(scorers_str):
-    """Formatuje tekst strzelców dodając ikony dla karnych i samobójów."""
-    if not isinstance(scorers_str, str) or pd.isna(scorers_str) or scorers_str.strip() in ['-', '']:
-        return "<span style='color: gray; font-style: italic;'>Brak bramek / Brak danych</span>"
 
-    parts = scorers_str.split(',')
-    html_parts = []
+@st.cache_resource
+def _load_coach_tenures(filename, version):
+    track_cache_entry('_load_coach_tenures', (filename, version), [filename])
+    return build_coach_tenures(load_data(filename))
+
+
+def load_coach_matches():
+    """mecze.csv z przypisanym trenerem i kadencją (None, gdy brak pliku z meczami)."""
+    return _load_coach_matches(pinned_versions(COACH_MATCH_FILES))
+
+
+@st.cache_resource
+def _load_coach_matches(versions):
+    track_cache_entry('_load_coach_matches', (versions,), COACH_MATCH_FILES)
+    df_m = load_data("mecze.csv")
+    if df_m is None:
+        return None
+    return build_coach_matches(df_m, load_coach_tenures())
+
+
+def coach_results(coach_matches, by):
+    """Mecze i punkty policzone z wyników (tylko rozegrane mecze) w grupach kolumny by."""
+    played = coach_matches[coach_matches['outcome'].notna() & (coach_matches['tenure_id'] >= 0)]
+    return played.groupby(by).agg(mecze=('outcome', 'size'), punkty=('points', 'sum'))
+
 
-    for part in parts:
+# ==========================================
+# TABELA BRAMEK (strzelcy z mecze.csv)
+# ==========================================
+# Jeden tokenizer kolumny 'strzelcy' dla HTML strzelców i mapy minut (jeden element listy = jeden gol).
+# Obsługiwane zapisy: "Lazar 27, 43" (kolejne minuty tego samego strzelca), "Biernat 90 (k)",
+# "Nowak 80 (s)" (samobój rywala), "Sitek 90+2", "Pajkos74", samo nazwisko bez minuty.
+SCORER_OWN_RE = re.compile(r"\(\s*s\s*\)|\(\s*sam\.?\s*\)|\bsam\.|(?<!\w)s\.", re.IGNORECASE)
+SCORER_PEN_RE = re.compile(r"\(\s*k\s*\)|\(\s*karny\s*\)|\bkarny\b|(?<!\w)k\.", re.IGNORECASE)
+SCORER_MINUTE_RE = re.compile(r"(\d{1,3})(?:\s*\+\s*(\d{1,2}))?'?")
+SCORER_NAME_RE = re.compile(r"[^\W\d_]{2,}")
+SCORER_JUNK_RE = re.compile(r"[()]|\s+")
+
+
+def tokenize_scorers(text):
+    """
+    Rozbija tekst strzelców na listę goli: (strzelec, minuta, doliczony czas, karny, samobój).
+    Minuty bez nazwiska (również te stojące przed nazwiskiem, np. "24 Więzik 83") należą do poprzedniego strzelca.
+    """
+    if not isinstance(text, str) or text.strip().lower() in ('', '-', 'nan'):
+        return []
+    goals = []
+    last_name = ''
+    for part in text.split(','):
         part = part.strip()
-        if not part: continue
+        if not part:
+            continue
+        is_own = bool(SCORER_OWN_RE.search(part))
+        is_pen = not is_own and bool(SCORER_PEN_RE.search(part))
+        body = SCORER_PEN_RE.sub(' ', SCORER_OWN_RE.sub(' ', part))
+
+        name_m = SCORER_NAME_RE.search(body)
+        name_start = name_m.start() if name_m else len(body)
+        name = SCORER_JUNK_RE.sub(' ', SCORER_MINUTE_RE.sub(' ', body)).strip(" .'") if name_m else ''
+
+        minutes = [(int(m.group(1)), int(m.group(2)) if m.group(2) else None, m.start() < name_start)
+                   for m in SCORER_MINUTE_RE.finditer(body)]
+        for minute, added, leading in minutes:
+            if leading and name:
+                goals.append((last_name, minute, added, False, False))
+        if name:
+            last_name = name
+            own_minutes = [(m, a) for m, a, leading in minutes if not leading] or [(None, None)]
+        else:
+            own_minutes = [(m, a) for m, a, _ in minutes]
+        for minute, added in own_minutes:
+            goals.append((last_name, minute, added, is_pen, is_own))
+    return goals
 
-        # Logika ikon i stylów
-        icon = "⚽"  # Domyślna piłka
-        style = ""
-        suffix = ""
 
-        # Samobóje (priorytet sprawdzania)
-        if any(x in part.lower() for x in ['(s)', 's.', 'sam.']):
-            icon = "🔴"
-            suffix = " (sam.)"
-            part = re.sub(r'\(s\)|s\.|sam\.', '', part, flags=re.IGNORECASE).strip()
-            style = "color: #dc3545;"  # Czerwony kolor
+def goal_label(minute, added, is_pen, is_own):
+    txt = f"{minute}" + (f"+{added}" if added is not None else "") + "'" if minute is not None else ""
+    if is_pen: txt += " (k)"
+    if is_own: txt += " (sam.)"
+    return txt.strip()
 
-        # Karne
-        elif any(x in part.lower() for x in ['(k)', 'k.', 'karny']):
-            icon = "⚽🥅"  # Piłka + Bramka
-            part = re.sub(r'\(k\)|k\.|karny', '', part, flags=re.IGNORECASE).strip()
-            style = "font-weight: bold; color: #28a745;"  # Zielony pogrubiony
 
-        html_parts.append(f"<span style='{style}'>{icon} {part}{suffix}</span>")
+def format_scorers_html(scorers_str):
+    """Formatuje tekst strzelców dodając ikony dla karnych i samobójów."""
+    goals = tokenize_scorers(scorers_str)
+    if not goals:
+        return "<span style='color: gray; font-style: italic;'>Brak bramek / Brak danych</span>"
 
+    html_parts = []
+    for name, minute, added, is_pen, is_own in goals:
+        if is_own:
+            icon, style = "🔴", "color: #dc3545;"
+        elif is_pen:
+            icon, style = "⚽🥅", "font-weight: bold; color: #28a745;"
+        else:
+            icon, style = "⚽", ""
+        html_parts.append(f"<span style='{style}'>{icon} {name} {goal_label(minute, added, is_pen, is_own)}</span>")
     return " | ".join(html_parts)
 
 
 def get_minutes_map(scorers_str):
-    """Tworzy mapę: nazwisko -> sformatowany tekst minut (np. 15', 88' (k))"""
-    if not isinstance(scorers_str, str) or pd.isna(scorers_str): return {}
-
+    """Mapa: nazwisko (małe litery) -> sformatowany tekst minut (np. 15', 88' (k))."""
     mapping = {}
-    # Dzielimy po przecinkach, ale staramy się nie dzielić wewnątrz nawiasów (uproszczone podejście)
-    parts = scorers_str.split(',')
+    for name, minute, added, is_pen, is_own in tokenize_scorers(scorers_str):
+        note = goal_label(minute, added, is_pen, is_own)
+        if not name or not note:
+            continue
+        key = name.lower()
+        mapping[key] = f"{mapping[key]}, {note}" if key in mapping else note
+    return mapping
 
-    for part in parts:
-        part = part.strip()
-        if not part: continue
 
-        # Wykrywanie flag
-        is_pen = any(x in part.lower() for x in ['(k)', 'k.', 'karny'])
-        is_own = any(x in part.lower() for x in ['(s)', 's.', 'sam.'])
+# ==========================================
+# ZALEŻNOŚCI DANYCH MODUŁÓW (LENIWE ŁADOWANIE)
+# ==========================================
+# Loadery są leniwe: plik jest parsowany dopiero przy pierwszym odczycie danej wersji. Mapy poniżej
+# deklarują, czego potrzebuje widok modułu lub helper - preload_data() wczytuje brakujące pliki
+# równolegle na puli wątków, a kod modułu odczytuje je potem z cache tymi samymi wywołaniami co dotąd.
+DATA_SOURCES = {
+    "mecze.csv": lambda: load_data("mecze.csv"),
+    "pilkarze.csv": lambda: load_data("pilkarze.csv"),
+    "25_26.csv": lambda: load_data("25_26.csv"),
+    "trenerzy.csv": lambda: load_data("trenerzy.csv"),
+    "strzelcy.csv": lambda: load_data("strzelcy.csv"),
+    "transfery.csv": lambda: load_data("transfery.csv"),
+    "me.csv": lambda: load_data("me.csv"),
+    "wystepy.csv": lambda: load_details("wystepy.csv"),
+    "kadencje trenerów": lambda: load_coach_matches(),
+}
+
+HELPER_DATA = {
+    'render_player_profile': ["pilkarze.csv", "strzelcy.csv", "wystepy.csv"],
+    'render_coach_profile': ["trenerzy.csv", "mecze.csv", "kadencje trenerów"],
+}
 
-        # Wyciąganie minut (wszystko co w nawiasie i jest cyfrą)
-        mins_match = re.search(r'\(([\d\s\+]+)\)', part)
-        minutes_txt = mins_match.group(1) if mins_match else ""
+# Dane głównego widoku modułu
+MODULE_DATA = {
+    "Aktualny Sezon (25/26)": ["25_26.csv"],
+    "Kalendarz": ["mecze.csv", "pilkarze.csv", "25_26.csv", "trenerzy.csv"],
+    "Centrum Zawodników": ["pilkarze.csv", "wystepy.csv", "strzelcy.csv", "transfery.csv", "me.csv"],
+    "Centrum Meczowe": ["mecze.csv", "wystepy.csv"],
+    "Trenerzy": ["trenerzy.csv", "mecze.csv", "kadencje trenerów"],
+}
 
-        # Wyciąganie nazwiska (wszystko przed nawiasem, bez flag k/s)
-        name_raw = re.sub(r'\s*\(.*?\)', '', part)  # Usuń nawiasy z zawartością
-        name_raw = re.sub(r'\(?[ks]\.?\)?', '', name_raw, flags=re.IGNORECASE).strip()
+# Widoki rysowane zamiast głównego: (moduł, klucz sesji, wartość) -> dane.
+# Profile zawodnika i trenera ładują swoje dane same (HELPER_DATA), stąd puste listy.
+MODULE_VIEW_DATA = {
+    ("Kalendarz", 'cal_view_mode', 'profile'): [],
+    ("Kalendarz", 'cal_view_mode', 'coach_profile'): [],
+    ("Kalendarz", 'cal_view_mode', 'match'): ["wystepy.csv"],
+    ("Trenerzy", 'coach_view_mode', 'profile'): [],
+}
+DATA_PRELOAD_WORKERS = 4
 
-        # Budowanie sformatowanego stringa
-        final_note = ""
-        if minutes_txt:
-            final_note = f"{minutes_txt}'"
 
-        if is_pen: final_note += " (k)"
-        if is_own: final_note += " (sam.)"
+def module_data(module):
+    """Pliki, które moduł narysuje w tym przebiegu (zależnie od otwartego widoku)."""
+    for (view_module, key, value), keys in MODULE_VIEW_DATA.items():
+        if view_module == module and st.session_state.get(key) == value:
+            return keys
+    return MODULE_DATA.get(module, [])
 
-        if name_raw and final_note:
-            # Klucz to nazwisko małymi literami
-            key = name_raw.lower().strip()
-            if key in mapping:
-                mapping[key] += f", {final_note}"
-            else:
-                mapping[key] = final_note
 
-    return mapping
-    # Dzielimy po przecinkach, ale uważamy na nawiasy (proste podejście)
-    # Zakładamy format: Nazwisko (minuty), Nazwisko (minuty)
-    # Używamy Regex, żeby wyłapać: Tekst przed nawiasem + Zawartość nawiasu
-    import re
-    # Wzorzec: Grupa 1 (Nazwisko - litery, spacje), Grupa 2 (cyfry, przecinki w nawiasie)
-    # Ignorujemy (k), (s) przy wyciąganiu nazwiska do klucza
-    pattern = re.compile(r'([^\(\d]+)(?:\([ks]\))?\s*\(([\d,\s+]+)\)')
-
-    # Ponieważ format może być "Górski (15, 20), Nowak (30)", musimy szukać wszystkich dopasowań
-    matches = pattern.findall(scorers_str)
-
-    for name_raw, mins_raw in matches:
-        # Czyszczenie nazwiska (usuwamy przecinki z przodu/tyłu, spacje)
-        name_clean = name_raw.replace(',', '').strip()
-        # Czyszczenie minut
-        mins_clean = mins_raw.strip()
-
-        # Klucz to nazwisko w lower case dla łatwiejszego dopasowania
-        mapping[name_clean.lower()] = mins_clean
+def preload_data(keys):
+    """Wczytuje pliki równolegle. Pojedynczy plik zostaje leniwy - moduł wczyta go przy odczycie."""
+    keys = [k for k in dict.fromkeys(keys) if k in DATA_SOURCES]
+    if len(keys) < 2:
+        return
+    ctx = get_script_run_ctx()
 
-    return mapping
+    def load(key):
+        # Wątek dostaje kontekst przebiegu - loadery czytają przypiętą generację z st.session_state
+        add_script_run_ctx(threading.current_thread(), ctx)
+        try:
+            DATA_SOURCES[key]()
+        except Exception:
+            pass  # Błąd zgłosi moduł przy własnym odczycie
+
+    with ThreadPoolExecutor(max_workers=min(DATA_PRELOAD_WORKERS, len(keys))) as pool:
+        list(pool.map(load, keys))
 
 
 def get_age_and_birthday(birth_date_val):
@@ -918,83 +1346,630 @@ def get_age_and_birthday(birth_date_val):
     return age, is_birthday
 
 
+# ==========================================
+# ZAPIS CSV (DOPISYWANIE I ATOMOWA PODMIANA)
+# ==========================================
+# Dodanie wiersza dopisuje jedną linię na końcu pliku (koszt nie zależy od rozmiaru pliku). Edycje całego
+# pliku idą przez plik tymczasowy i os.replace, więc przerwany zapis nie zostawia połowy CSV.
+# Jeden rekord = jedna linia pliku (csv_cell), bo edytor i dziennik zmian adresują wiersze numerem linii.
+ADMIN_COLUMN_ALIASES = {'kraj': 'narodowość', 'narodowość': 'kraj', 'widzów': 'frekwencja', 'frekwencja': 'widzów'}
+
+
+def csv_dialect(filename):
+    """(separator, kodowanie, koniec linii) pliku, rozpoznane z pierwszej linii."""
+    with open(filename, 'rb') as f:
+        first = f.readline()
+    newline = '\r\n' if first.endswith(b'\r\n') else '\n'
+    try:
+        head, encoding = first.decode('utf-8'), 'utf-8'
+    except UnicodeDecodeError:
+        head, encoding = first.decode('windows-1250'), 'windows-1250'
+    sep = ';' if head.count(';') > head.count(',') else ','
+    return sep, encoding, newline
+
+
+def read_csv_header(filename, sep, encoding):
+    with open(filename, encoding=encoding, newline='') as f:
+        return next(csv.reader([f.readline()], delimiter=sep), [])
+
+
+def csv_cell(val):
+    """
+    Wartość komórki do zapisu. Znaki końca linii zamieniamy na spację: edytor i dziennik adresują wiersze
+    numerem linii pliku, a komórka z nową linią dałaby rekord na kilku liniach i przesunęła kolejne.
+    """
+    return '' if val is None else re.sub(r'[\r\n]+', ' ', str(val))
+
+
+def admin_append_csv(filename, new_data_dict):
+    """
+    Dopisuje jeden wiersz w kolejności kolumn pliku (klucze bez względu na wielkość liter, aliasy z
+    ADMIN_COLUMN_ALIASES). Zwraca False, gdy wiersz ma kolumny, których w pliku nie ma.
+    """
+    sep, encoding, newline = csv_dialect(filename)
+    header = read_csv_header(filename, sep, encoding)
+    positions = {c.strip().lower(): i for i, c in enumerate(header)}
+    row = [''] * len(header)
+    for key, val in new_data_dict.items():
+        k = str(key).strip().lower()
+        pos = positions.get(k, positions.get(ADMIN_COLUMN_ALIASES.get(k)))
+        if pos is None:
+            return False
+        row[pos] = csv_cell(val)
+
+    buf = io.StringIO()
+    csv.writer(buf, delimiter=sep, lineterminator='').writerow(row)
+    with data_write_lock():
+        batch = journal_begin(filename, [{'op': 'insert', 'line': None, 'before': None, 'after': buf.getvalue()}])
+        append_csv_lines(filename, [buf.getvalue()], encoding, newline)
+        journal_commit(batch)
+    return True
+
+
+def append_csv_lines(filename, new_lines, encoding, newline):
+    """
+    Dopisuje linie na końcu pliku, w miejscu - koszt nie zależy od rozmiaru pliku. Przypięte generacje
+    czytelników znają rozmiar swojej wersji i czytają tylko tyle bajtów (read_pinned).
+    """
+    with open(filename, 'rb') as f:
+        needs_newline = False
+        if f.seek(0, os.SEEK_END) > 0:
+            f.seek(-1, os.SEEK_END)
+            needs_newline = f.read(1) != b'\n'
+    with open(filename, 'a', encoding=encoding, newline='') as f:
+        f.write((newline if needs_newline else '') + ''.join(line + newline for line in new_lines))
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def replace_file_atomic(filename, text, encoding):
+    """Podmienia zawartość pliku atomowo: plik tymczasowy w tym samym katalogu + os.replace."""
+    tmp = os.path.join(os.path.dirname(os.path.abspath(filename)), f".{os.path.basename(filename)}.{os.getpid()}.tmp")
+    try:
+        with open(tmp, 'w', encoding=encoding, newline='') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, filename)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def write_csv_lines(filename, lines, encoding, newline):
+    replace_file_atomic(filename, ''.join(line + newline for line in lines), encoding)
+
+
+def admin_write_csv(filename, df):
+    """Zapisuje całą ramkę atomowo, w formacie (separator, kodowanie, końce linii) pliku."""
+    sep, encoding, newline = csv_dialect(filename) if os.path.exists(filename) else (',', 'utf-8', '\n')
+    before = read_csv_lines(filename, encoding) if os.path.exists(filename) else []
+    after = df.to_csv(index=False, sep=sep, lineterminator=newline).split(newline)[:-1]
+    with data_write_lock():
+        batch = journal_begin(filename, [{'op': 'rewrite', 'line': None, 'before': journal_blob(before),
+                                          'after': journal_blob(after)}])
+        write_csv_lines(filename, after, encoding, newline)
+        journal_commit(batch)
+
+
+def admin_data_changed(*filenames):
+    """
+    Po każdym zapisie z panelu admina: zwalnia cache zmienionych plików i zamyka bieżącą sesję edytora
+    (nowy uploader_key, bez przypiętych wersji) - edytor przypnie się do nowej wersji pliku, a nie do
+    tej sprzed zapisu, względem której każdy kolejny zapis byłby odrzucany.
+    """
+    invalidate_files(*filenames)
+    st.session_state.pop('editor_versions', None)
+    st.session_state['uploader_key'] += 1
+
+
 def admin_save_csv(filename, new_data_dict):
     try:
-        df = pd.read_csv(filename)
-        new_row = pd.DataFrame([new_data_dict])
-        df = pd.concat([df, new_row], ignore_index=True)
-        df.to_csv(filename, index=False)
-        st.cache_data.clear()
+        if not admin_append_csv(filename, new_data_dict):
+            # Nowa kolumna - trzeba przepisać cały plik
+            sep, encoding, _ = csv_dialect(filename)
+            df = pd.read_csv(filename, sep=sep, encoding=encoding, dtype=str, keep_default_na=False)
+            df = pd.concat([df, pd.DataFrame([{k: csv_cell(v) for k, v in new_data_dict.items()}])], ignore_index=True)
+            admin_write_csv(filename, df)
+        admin_data_changed(filename)
         return True
     except Exception as e:
         st.error(f"Błąd zapisu: {e}");
         return False
 
 
+# ==========================================
+# EDYTOR DANYCH (FILTR, STRONY, ZAPIS RÓŻNICY)
+# ==========================================
+# Edytor nie wysyła do przeglądarki całego pliku (wystepy.csv to ~14 tys. wierszy): najpierw filtr
+# (sezon / mecz / zawodnik), potem strona po EDITOR_PAGE_SIZE wierszy. Przy zapisie bierzemy z widżetu
+# tylko różnicę (edited_rows / deleted_rows / added_rows) i podmieniamy wyłącznie dotknięte linie pliku.
+EDITOR_PAGE_SIZE = 200
+EDITOR_FILTER_COLS = {
+    'season': ['sezon'],
+    'match': ['data meczu', 'data'],
+    'opponent': ['rywal', 'przeciwnik'],
+    'player': ['zawodnik', 'imię i nazwisko'],
+}
+
+
+def editor_column_names(header):
+    """Unikalne nazwy kolumn dla edytora (puste i powtórzone nagłówki jak w pandas: 'Unnamed: 0', 'x.1')."""
+    names, seen = [], {}
+    for i, col in enumerate(header):
+        name = col if col else f"Unnamed: {i}"
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def read_csv_lines(filename, encoding):
+    """Linie pliku bez znaków końca linii (numer linii = pozycja na liście)."""
+    with open(filename, encoding=encoding, newline='') as f:
+        text = f.read()
+    lines = text.split('\n')
+    if text.endswith('\n'):
+        lines.pop()
+    return [line[:-1] if line.endswith('\r') else line for line in lines]
+
+
+def load_editor_table(filename, version):
+    """Tabela do edytora dla wersji `version` (= file_version); RuntimeError, gdy plik ma już inną wersję."""
+    if not os.path.exists(filename): return None
+    return _load_editor_table(filename, version)
+
+
+@st.cache_data
+def _load_editor_table(filename, version):
+    """
+    Surowa tabela do edytora: same napisy, bez konwersji typów; indeks 'linia' = numer linii w pliku.
+    Klucz cache to rzeczywista wersja pliku - sprawdzana pod blokadą zapisu, więc pod wersją nie trafi
+    do cache inna treść (wyjątek nie jest zapamiętywany).
+    """
+    with data_write_lock():
+        if file_version(filename) != version:
+            raise RuntimeError("plik zmienił się w trakcie wczytywania do edytora - spróbuj ponownie")
+        sep, encoding, _ = csv_dialect(filename)
+        lines = read_csv_lines(filename, encoding)
+    track_cache_entry('_load_editor_table', (filename, version), [filename])
+    rows = list(csv.reader(lines, delimiter=sep))
+    columns = editor_column_names(rows[0])
+    width = len(columns)
+    body = [(i, (r + [''] * width)[:width]) for i, r in enumerate(rows[1:], start=1) if r]
+    return pd.DataFrame([r for _, r in body], columns=columns, dtype=str,
+                        index=pd.Index([i for i, _ in body], name='linia'))
+
+
+def apply_csv_diff(filename, changed, deleted, added, expected_version=None):
+    """
+    Nanosi na plik różnicę z edytora: changed = {linia: {kolumna: wartość}}, deleted = numery linii,
+    added = lista wierszy (słowników). Pozostałe linie zostają bajt w bajt, plik jest podmieniany atomowo.
+    Zmiany idą najpierw do dziennika, całość pod blokadą zapisu.
+    """
+    with data_write_lock():
+        if expected_version is not None and file_version(filename) != expected_version:
+            raise RuntimeError("plik zmienił się od wczytania do edytora - wczytaj aktualną wersję (🔄) i nanieś zmiany ponownie")
+        sep, encoding, newline = csv_dialect(filename)
+        lines = read_csv_lines(filename, encoding)
+        columns = editor_column_names(next(csv.reader([lines[0]], delimiter=sep)))
+        positions = {c: i for i, c in enumerate(columns)}
+
+        def render(values):
+            buf = io.StringIO()
+            csv.writer(buf, delimiter=sep, lineterminator='').writerow(values)
+            return buf.getvalue()
+
+        def row_values(updates, values):
+            values = values + [''] * (len(columns) - len(values))
+            for col, val in updates.items():
+                if col in positions:
+                    values[positions[col]] = csv_cell(val)
+            return values
+
+        entries = []
+        for line_no, updates in sorted(changed.items()):
+            if line_no in deleted:
+                continue
+            values = next(csv.reader([lines[line_no]], delimiter=sep), [])
+            new_values = row_values(updates, values)
+            if new_values[:len(values)] != values or any(new_values[len(values):]):
+                entries.append({'op': 'update', 'line': line_no, 'before': lines[line_no], 'after': render(new_values)})
+        # Usuwamy od końca, żeby numery kolejnych wpisów się nie przesuwały
+        entries += [{'op': 'delete', 'line': i, 'before': lines[i], 'after': None} for i in sorted(deleted, reverse=True)]
+        inserts = [{'op': 'insert', 'line': None, 'before': None, 'after': render(row_values(row, []))} for row in added]
+        if not entries and not inserts:
+            return
+
+        batch = journal_begin(filename, entries + inserts)
+        if entries:
+            write_csv_lines(filename, journal_apply(lines, entries + inserts), encoding, newline)
+        else:
+            append_csv_lines(filename, [e['after'] for e in inserts], encoding, newline)
+        journal_commit(batch)
+
+
+def editor_filter_column(df, kind):
+    cols = {c.strip().lower(): c for c in df.columns}
+    return next((cols[c] for c in EDITOR_FILTER_COLS[kind] if c in cols), None)
+
+
+# ==========================================
+# DZIENNIK ZMIAN (WRITE-AHEAD, ODTWARZANIE, COFANIE)
+# ==========================================
+# Każda zmiana z panelu admina (dopisanie, edytor, szybkie dodawanie) trafia najpierw do JOURNAL_FILE,
+# dopiero potem do CSV. Wpis = jedna operacja na linii pliku (insert / update / delete, albo rewrite
+# całego pliku przy nowej kolumnie) z wartością przed i po. Wpisy jednego zapisu mają wspólny 'batch',
+# a na końcu rekord 'commit' - paczka bez commitu (przerwany zapis) jest pomijana.
+# Wpisy nakłada się po kolei, więc odwrotnością paczki są odwrócone wpisy w odwrotnej kolejności.
+# Rewrite nie trzyma w dzienniku całych plików - przed i po to identyfikatory blobów (gzip, nazwa = sha256
+# treści) w JOURNAL_DIR/bloby, więc ten sam stan pliku jest zapisany raz. Gdy dziennik przekroczy
+# JOURNAL_MAX_BYTES, compact_journal() robi kopię wszystkich CSV (JOURNAL_DIR/kopie/<ostatnia paczka>) i
+# zostawia w dzienniku JOURNAL_KEEP ostatnich paczek. Kopia + późniejsze paczki z dziennika odtwarzają plik
+# (restore_from_backup), np. nadpisany poza aplikacją. Widok panelu czyta tylko koniec dziennika.
+JOURNAL_FILE = '.dziennik_zmian.jsonl'
+JOURNAL_DIR = '.dziennik_zmian'
+JOURNAL_MAX_BYTES = 4_000_000
+JOURNAL_KEEP = 50  # Paczek zostawianych przy kompaktowaniu (tyle zmian wstecz da się cofnąć)
+JOURNAL_VIEW_BYTES = 256_000  # Koniec dziennika czytany przez widok panelu
+JOURNAL_START_TAG = 'start'  # Kopia sprzed pierwszej paczki w dzienniku
+
+
+def journal_append(records):
+    with open(JOURNAL_FILE, 'a', encoding='utf-8') as f:
+        f.write(''.join(json.dumps(r, ensure_ascii=False) + '\n' for r in records))
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def journal_blob(lines):
+    """Zapisuje (raz) linie pliku jako blob i zwraca jego identyfikator do wpisu rewrite."""
+    data = json.dumps(lines, ensure_ascii=False).encode('utf-8')
+    blob_id = hashlib.sha256(data).hexdigest()
+    path = os.path.join(JOURNAL_DIR, 'bloby', f"{blob_id}.gz")
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(gzip.compress(data))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    return blob_id
+
+
+def journal_lines(value):
+    """Linie pliku z wpisu rewrite: identyfikator blobu (albo lista linii - wpisy sprzed blobów)."""
+    if isinstance(value, list):
+        return value
+    with open(os.path.join(JOURNAL_DIR, 'bloby', f"{value}.gz"), 'rb') as f:
+        return json.loads(gzip.decompress(f.read()))
+
+
+def journal_begin(filename, entries, undo_of=None):
+    """Zapisuje wpisy paczki (przed zmianą pliku). Zwraca identyfikator paczki do journal_commit."""
+    if os.path.exists(JOURNAL_FILE) and os.path.getsize(JOURNAL_FILE) > JOURNAL_MAX_BYTES:
+        compact_journal()
+    batch = f"{time.time_ns():x}"
+    meta = {'batch': batch, 'ts': datetime.datetime.now().isoformat(timespec='seconds'),
+            'user': st.session_state.get('username', ''), 'file': os.path.basename(filename)}
+    if undo_of:
+        meta['undo_of'] = undo_of
+    journal_append([dict(meta, **e) for e in entries])
+    return batch
+
+
+def journal_commit(batch):
+    journal_append([{'batch': batch, 'op': 'commit'}])
+
+
+def journal_records(batches):
+    """Paczki z read_journal z powrotem jako rekordy dziennika (wpisy + commit)."""
+    records = []
+    for b in batches:
+        meta = {k: b[k] for k in ('batch', 'ts', 'user', 'file')}
+        if b['undo_of']:
+            meta['undo_of'] = b['undo_of']
+        records += [dict(meta, **e) for e in b['entries']] + [{'batch': b['batch'], 'op': 'commit'}]
+    return records
+
+
+def read_journal(tail_bytes=None):
+    """
+    Zatwierdzone paczki w kolejności zapisu: [{'batch', 'ts', 'user', 'file', 'undo_of', 'entries'}].
+    Z tail_bytes czyta tylko koniec pliku (do podglądu) - pierwsza paczka w oknie może być urwana, więc
+    jest pomijana.
+    """
+    if not os.path.exists(JOURNAL_FILE): return []
+    batches, committed = {}, []
+    skip_first = tail_bytes is not None and os.path.getsize(JOURNAL_FILE) > tail_bytes
+    with open(JOURNAL_FILE, 'rb') as f:
+        if skip_first:
+            f.seek(-tail_bytes, os.SEEK_END)
+            f.readline()  # Urwana linia na początku okna
+        first_batch = None
+        for line in f:
+            try:
+                rec = json.loads(line.decode('utf-8'))
+            except ValueError:
+                continue  # Urwany ostatni wpis
+            first_batch = first_batch or rec['batch']
+            if rec['op'] == 'commit':
+                if rec['batch'] in batches and not (skip_first and rec['batch'] == first_batch):
+                    committed.append(batches[rec['batch']])
+                continue
+            b = batches.setdefault(rec['batch'], {'batch': rec['batch'], 'ts': rec['ts'], 'user': rec['user'],
+                                                  'file': rec['file'], 'undo_of': rec.get('undo_of'), 'entries': []})
+            b['entries'].append({k: rec[k] for k in ('op', 'line', 'before', 'after')})
+    return committed
+
+
+def journal_apply(lines, entries, check_rewrite=True):
+    """
+    Nakłada wpisy po kolei. Każdy wpis sprawdza, czy zastaje linię w stanie 'before'. Rewrite niesie cały
+    plik, więc przy odtwarzaniu (check_rewrite=False) jego 'after' obowiązuje bez względu na 'before' -
+    np. paczka odtworzenia z kopii ma w 'before' stan spoza dziennika.
+    """
+    lines = list(lines)
+    for e in entries:
+        if e['op'] == 'rewrite':
+            if check_rewrite and lines != journal_lines(e['before']):
+                raise RuntimeError("plik różni się od stanu zapisanego w dzienniku")
+            lines = list(journal_lines(e['after']))
+            continue
+        pos = e['line']
+        if e['op'] == 'insert':
+            lines.insert(len(lines) if pos is None else pos, e['after'])
+            continue
+        pos = len(lines) - 1 if pos is None else pos
+        if not 0 <= pos < len(lines) or lines[pos] != e['before']:
+            raise RuntimeError(f"linia {pos} różni się od stanu zapisanego w dzienniku")
+        if e['op'] == 'update':
+            lines[pos] = e['after']
+        else:
+            del lines[pos]
+    return lines
+
+
+def journal_inverse(entries):
+    swap = {'insert': 'delete', 'delete': 'insert', 'update': 'update', 'rewrite': 'rewrite'}
+    return [dict(e, op=swap[e['op']], before=e['after'], after=e['before']) for e in reversed(entries)]
+
+
+def replay_journal(filename, base_lines, after_batch=None):
+    """
+    Odtwarza zmiany pliku na kopii bazowej: nakłada wszystkie zatwierdzone paczki tego pliku - łącznie
+    z cofnięciami - zapisane po paczce after_batch (None = od początku dziennika).
+    """
+    name = os.path.basename(filename)
+    batches = read_journal()
+    if after_batch is not None:
+        ids = [b['batch'] for b in batches]
+        if after_batch not in ids:
+            raise RuntimeError("paczki, od której zaczyna się kopia, nie ma już w dzienniku")
+        batches = batches[ids.index(after_batch) + 1:]
+    lines = list(base_lines)
+    for b in batches:
+        if b['file'] == name:
+            lines = journal_apply(lines, b['entries'], check_rewrite=False)
+    return lines
+
+
+def backup_data_files():
+    """
+    Kopia wszystkich CSV z chwili ostatniej zatwierdzonej paczki (pod blokadą zapisu, więc stan pasuje
+    do dziennika). Zwraca znacznik kopii: identyfikator tej paczki albo JOURNAL_START_TAG.
+    """
+    batches = read_journal()
+    tag = batches[-1]['batch'] if batches else JOURNAL_START_TAG
+    target = os.path.join(JOURNAL_DIR, 'kopie', tag)
+    if not os.path.isdir(target):
+        tmp = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+        os.makedirs(tmp, exist_ok=True)
+        for name in os.listdir('.'):
+            if name.endswith('.csv'):
+                shutil.copy2(name, os.path.join(tmp, name))
+        os.replace(tmp, target)
+    return tag
+
+
+def list_backups():
+    """Znaczniki kopii od najnowszej."""
+    root = os.path.join(JOURNAL_DIR, 'kopie')
+    if not os.path.isdir(root): return []
+    tags = [t for t in os.listdir(root) if not t.endswith('.tmp')]
+    return sorted(tags, key=lambda t: os.path.getmtime(os.path.join(root, t)), reverse=True)
+
+
+def compact_journal():
+    """
+    Kopia CSV + dziennik skrócony do JOURNAL_KEEP ostatnich paczek. Usuwa kopie, których paczki nie ma
+    już w dzienniku (nie da się ich odtworzyć), i bloby nieużywane przez pozostałe wpisy.
+    Wołane pod blokadą zapisu.
+    """
+    tag = backup_data_files()
+    kept = read_journal()[-JOURNAL_KEEP:]
+    tmp = f"{JOURNAL_FILE}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(''.join(json.dumps(r, ensure_ascii=False) + '\n' for r in journal_records(kept)))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, JOURNAL_FILE)
+
+    kept_ids = {b['batch'] for b in kept}
+    for old in list_backups():
+        if old != tag and old not in kept_ids:
+            shutil.rmtree(os.path.join(JOURNAL_DIR, 'kopie', old), ignore_errors=True)
+    used = {e[k] for b in kept for e in b['entries'] if e['op'] == 'rewrite' for k in ('before', 'after')
+            if isinstance(e[k], str)}
+    blob_dir = os.path.join(JOURNAL_DIR, 'bloby')
+    for name in os.listdir(blob_dir) if os.path.isdir(blob_dir) else []:
+        if name.split('.')[0] not in used:
+            os.remove(os.path.join(blob_dir, name))
+
+
+def restore_from_backup(tag, filename):
+    """
+    Odtwarza plik z kopii `tag` i zapisanych po niej paczek dziennika (np. po nadpisaniu pliku poza
+    aplikacją). Samo odtworzenie też jest paczką, więc da się je cofnąć. False, gdy plik już jest w tym stanie.
+    """
+    base_path = os.path.join(JOURNAL_DIR, 'kopie', tag, os.path.basename(filename))
+    with data_write_lock():
+        sep, encoding, newline = csv_dialect(base_path)
+        base = read_csv_lines(base_path, encoding)
+        lines = replay_journal(filename, base, after_batch=None if tag == JOURNAL_START_TAG else tag)
+        current = read_csv_lines(filename, encoding) if os.path.exists(filename) else []
+        if lines == current:
+            return False
+        batch = journal_begin(filename, [{'op': 'rewrite', 'line': None, 'before': journal_blob(current),
+                                          'after': journal_blob(lines)}])
+        write_csv_lines(filename, lines, encoding, newline)
+        journal_commit(batch)
+    return True
+
+
+def undo_last_changes(n):
+    """Cofa n ostatnich (jeszcze niecofniętych) zmian. Cofnięcie też jest paczką w dzienniku. Zwraca pliki."""
+    with data_write_lock():
+        batches = read_journal()
+        undone = {b['undo_of'] for b in batches if b['undo_of']}
+        todo = [b for b in reversed(batches) if not b['undo_of'] and b['batch'] not in undone][:n]
+        touched = []
+        for b in todo:
+            sep, encoding, newline = csv_dialect(b['file'])
+            entries = journal_inverse(b['entries'])
+            lines = journal_apply(read_csv_lines(b['file'], encoding), entries)
+            batch = journal_begin(b['file'], entries, undo_of=b['batch'])
+            write_csv_lines(b['file'], lines, encoding, newline)
+            journal_commit(batch)
+            touched.append(b['file'])
+        return touched
+
+
+def journal_summary(b):
+    ops = [e['op'] for e in b['entries']]
+    if 'rewrite' in ops:
+        return "przebudowa pliku"
+    return f"+{ops.count('insert')} ~{ops.count('update')} -{ops.count('delete')}"
+
+
 def get_match_icon(val):
     if pd.isna(val): return "🚌"
     s = str(val).lower().strip()
-    if s in ['1', 'true', 'tak', 'dom', 'gospodarz', 'd', 'u siebie']: return "🏠"
+    if s in HOME_FLAG_VALUES: return "🏠"
     return "🚌"
 
 
+# Jedna generacja danych na cały przebieg - równoległy zapis admina nie rozspójni odczytów
+with startup_step("przypięcie generacji danych"):
+    pin_data_generation()
+
 # --- MENU ---
 st.sidebar.header("Nawigacja")
 opcja = st.sidebar.radio("Moduł:",
                          ["Aktualny Sezon (25/26)", "Kalendarz", "Centrum Zawodników", "Centrum Meczowe", "Trenerzy"])
+with startup_step("wczytanie danych modułu"):
+    preload_data(module_data(opcja))
 st.sidebar.divider()
 
 # --- PANEL ADMINA (Djero) ---
 if st.session_state.get('username') == 'Djero':
     st.sidebar.markdown("### 🛠️ Panel Admina (Djero)")
+
+    with st.sidebar.expander("⏱️ CZAS STARTU"):
+        st.caption("Sekundy na krok: pierwszy przebieg w tym procesie (zimny start) i ostatni przebieg. "
+                   "Dane modułu zależą od otwartego modułu i stanu cache.")
+        st.dataframe(pd.DataFrame([{'Krok': name, 'Zimny start': t['first'], 'Ostatnio': t['last']}
+                                   for name, t in STARTUP_TIMES.items()]),
+                     hide_index=True, use_container_width=True,
+                     column_config={"Zimny start": st.column_config.NumberColumn(format="%.3f"),
+                                    "Ostatnio": st.column_config.NumberColumn(format="%.3f")})
     all_files = [f for f in os.listdir('.') if f.endswith('.csv')]
 
     with st.sidebar.expander("📝 EDYTOR DANYCH"):
-        st.info("💡 Kliknij w pusty wiersz na dole tabeli, aby dodać nowy rekord.")
+        st.info("💡 Zawęź dane filtrem - edytor wczytuje tylko pasujące wiersze, stronami. "
+                "Kliknij w pusty wiersz na dole tabeli, aby dodać nowy rekord.")
         selected_file = st.selectbox("Wybierz plik do edycji:", all_files)
 
         if selected_file:
             try:
-                try:
-                    df_editor = pd.read_csv(selected_file, encoding='utf-8')
-                except:
-                    df_editor = pd.read_csv(selected_file, encoding='windows-1250')
-
-                # --- AUTO-NAPRAWA DLA MECZE.CSV ---
-                is_changed = False
-                if selected_file == "mecze.csv":
-                    for col in df_editor.columns:
-                        if col.lower().strip() == 'frekwencja':
-                            df_editor.rename(columns={col: 'Widzów'}, inplace=True)
-                            is_changed = True
-                            break
-
-                    synonyms_dom = ['dom', 'gospodarz', 'u siebie', 'gdzie']
-                    cols_lower = [c.lower().strip() for c in df_editor.columns]
-                    if not any(x in cols_lower for x in synonyms_dom):
-                        df_editor['Dom'] = "-"
-                        is_changed = True
-
-                edited_df = st.data_editor(
-                    df_editor,
-                    num_rows="dynamic",
-                    key=f"editor_{selected_file}_{st.session_state['uploader_key']}",
-                    height=400
-                )
-
-                save_label = "💾 Zapisz zmiany"
-                if is_changed: save_label += " (Auto-korekta kolumn)"
-
-                if st.button(save_label, use_container_width=True):
-                    try:
-                        edited_df.to_csv(selected_file, index=False)
-                        st.success(f"✅ Zapisano {selected_file}!")
-                        st.cache_data.clear()
-                        st.session_state['uploader_key'] += 1
-                        time.sleep(1)
+                # Wersja pliku z chwili otwarcia edytora - zapis na nowszym pliku byłby nadpisaniem cudzych zmian
+                ed_versions = st.session_state.setdefault('editor_versions', {})
+                ed_session = (selected_file, st.session_state['uploader_key'])
+                cur_version = file_version(selected_file)
+                ed_version = ed_versions.setdefault(ed_session, cur_version)
+                if ed_version != cur_version:
+                    # Plik zmienił się poza tą sesją edytora (inna sesja, zapis spoza aplikacji) - każdy zapis
+                    # byłby odrzucony, więc zamiast tabeli jawne wczytanie aktualnej wersji
+                    st.warning("⚠️ Plik zmienił się od otwarcia edytora. Wczytaj aktualną wersję - "
+                               "niezapisane zmiany z tego widoku trzeba będzie nanieść ponownie.")
+                    if st.button("🔄 Wczytaj aktualną wersję", use_container_width=True):
+                        admin_data_changed()
                         st.rerun()
-                    except Exception as e:
-                        st.error(f"Błąd zapisu: {e}")
+                else:
+                    df_full = load_editor_table(selected_file, ed_version)
+
+                    mask = pd.Series(True, index=df_full.index)
+                    ed_filters = []
+                    season_col = editor_filter_column(df_full, 'season')
+                    if season_col:
+                        seasons = sorted(df_full[season_col].unique(), reverse=True)
+                        ed_season = st.selectbox("Sezon:", ["Wszystkie"] + seasons, key=f"ed_season_{selected_file}")
+                        if ed_season != "Wszystkie":
+                            mask &= df_full[season_col] == ed_season
+                        ed_filters.append(ed_season)
+                    match_col = editor_filter_column(df_full, 'match')
+                    if match_col:
+                        opp_col = editor_filter_column(df_full, 'opponent')
+                        match_labels = df_full[match_col] + " - " + df_full[opp_col] if opp_col else df_full[match_col]
+                        match_opts = list(dict.fromkeys(match_labels[mask]))
+                        ed_match = st.selectbox("Mecz:", ["Wszystkie"] + match_opts, key=f"ed_match_{selected_file}")
+                        if ed_match != "Wszystkie":
+                            mask &= match_labels == ed_match
+                        ed_filters.append(ed_match)
+                    player_col = editor_filter_column(df_full, 'player')
+                    if player_col:
+                        ed_player = st.text_input("Zawodnik (fragment nazwiska):", key=f"ed_player_{selected_file}")
+                        if ed_player:
+                            mask &= df_full[player_col].str.contains(ed_player, case=False, regex=False)
+                        ed_filters.append(ed_player)
+
+                    df_sel = df_full[mask]
+                    n_pages = max(1, -(-len(df_sel) // EDITOR_PAGE_SIZE))
+                    page = 1
+                    if n_pages > 1:
+                        page = st.number_input(f"Strona (z {n_pages}):", min_value=1, max_value=n_pages, value=1,
+                                               key=f"ed_page_{selected_file}")
+                    df_page = df_sel.iloc[(page - 1) * EDITOR_PAGE_SIZE: page * EDITOR_PAGE_SIZE]
+                    st.caption(f"Wiersze: {len(df_page)} z {len(df_sel)} pasujących ({len(df_full)} w pliku)")
+
+                    # Klucz zależy od filtra i strony - różnica z widżetu odnosi się do pozycji na tej stronie
+                    filter_tag = hashlib.md5(repr((ed_filters, page)).encode('utf-8')).hexdigest()[:8]
+                    editor_key = f"editor_{selected_file}_{st.session_state['uploader_key']}_{filter_tag}"
+                    st.data_editor(df_page, num_rows="dynamic", key=editor_key, height=400)
+
+                    if st.button("💾 Zapisz zmiany", use_container_width=True):
+                        try:
+                            delta = st.session_state.get(editor_key, {})
+                            page_lines = df_page.index
+                            changed = {int(page_lines[int(i)]): upd for i, upd in delta.get('edited_rows', {}).items()}
+                            deleted = {int(page_lines[int(i)]) for i in delta.get('deleted_rows', [])}
+                            added = [row for row in delta.get('added_rows', []) if row]
+                            if changed or deleted or added:
+                                apply_csv_diff(selected_file, changed, deleted, added, expected_version=ed_version)
+                                admin_data_changed(selected_file)
+                                st.success(f"✅ Zapisano {selected_file}: zmienione {len(changed)}, "
+                                           f"usunięte {len(deleted)}, dodane {len(added)}")
+                            else:
+                                st.info("Brak zmian do zapisania.")
+                                admin_data_changed()
+                            time.sleep(1)
+                            st.rerun()
+                        except Exception as e:
+                            st.error(f"Błąd zapisu: {e}")
 
             except Exception as e:
                 st.error(f"Błąd pliku: {e}")
@@ -1009,7 +1984,7 @@ if st.session_state.get('username') == 'Djero':
                 a_data = st.date_input("Data urodzenia", min_value=datetime.date(1970, 1, 1))
                 if st.form_submit_button("Zapisz Piłkarza"):
                     if a_imie and os.path.exists("pilkarze.csv"):
-                        admin_save_csv("pilkarze.csv", {"imię i nazwisko": a_imie, "kraj": a_kraj, "pozycja": a_poz,
+                        admin_save_csv("pilkarze.csv", {"imię i nazwisko": a_imie, "narodowość": a_kraj, "pozycja": a_poz,
                                                         "data urodzenia": str(a_data), "SUMA": 0})
                         st.success(f"Dodano: {a_imie}");
                         time.sleep(1);
@@ -1021,14 +1996,64 @@ if st.session_state.get('username') == 'Djero':
                 a_wynik = st.text_input("Wynik (np. 2:1)")
                 a_data_m = st.date_input("Data meczu")
                 a_dom = st.selectbox("Gdzie?", ["Dom", "Wyjazd"])
-                dom_val = "1" if a_dom == "Dom" else "0"
+                # Dom / wyjazd load_data wylicza z miejsca rozgrywania (HOME_PLACE_KEYWORDS)
+                place_val = "Bielsko-Biała" if a_dom == "Dom" else "-"
                 if st.form_submit_button("Zapisz Mecz"):
                     if os.path.exists("mecze.csv"):
                         admin_save_csv("mecze.csv", {"sezon": a_sezon, "rywal": a_rywal, "wynik": a_wynik,
-                                                     "data meczu": str(a_data_m), "Dom": dom_val, "Widzów": 0})
+                                                     "data meczu": str(a_data_m), "miejsce rozgrywania": place_val,
+                                                     "frekwencja": 0})
                         st.success("Dodano mecz!");
                         time.sleep(1);
                         st.rerun()
+    with st.sidebar.expander("🕘 DZIENNIK ZMIAN"):
+        journal = read_journal(tail_bytes=JOURNAL_VIEW_BYTES)
+        undone = {b['undo_of'] for b in journal if b['undo_of']}
+        if not journal:
+            st.caption("Brak zapisanych zmian.")
+        else:
+            st.dataframe(pd.DataFrame([{
+                'Czas': b['ts'].replace('T', ' '), 'Kto': b['user'], 'Plik': b['file'],
+                'Zmiana': ("↩️ cofnięcie" if b['undo_of'] else journal_summary(b)) + (" (cofnięta)" if b['batch'] in undone else "")
+            } for b in reversed(journal[-20:])]), hide_index=True, use_container_width=True)
+            n_undo = st.number_input("Cofnij ostatnie zmiany (ile):", min_value=1, max_value=20, value=1)
+            if st.button("↩️ Cofnij", use_container_width=True):
+                try:
+                    touched = undo_last_changes(int(n_undo))
+                    if touched:
+                        admin_data_changed(*touched)
+                        st.success(f"Cofnięto zmian: {len(touched)}")
+                        time.sleep(1)
+                        st.rerun()
+                    else:
+                        st.info("Nie ma nic do cofnięcia.")
+                except Exception as e:
+                    st.error(f"Nie udało się cofnąć: {e}")
+
+        st.markdown("**Kopie zapasowe**")
+        st.caption("Kopia wszystkich plików powstaje też sama przy kompaktowaniu dziennika. Odtworzenie = kopia "
+                   "+ późniejsze zmiany z dziennika (np. gdy plik nadpisano poza aplikacją).")
+        if st.button("💾 Utwórz kopię teraz", use_container_width=True):
+            with data_write_lock():
+                backup_data_files()
+            st.rerun()
+        backups = list_backups()
+        if backups:
+            bk_tag = st.selectbox("Kopia:", backups, format_func=lambda t: datetime.datetime.fromtimestamp(
+                os.path.getmtime(os.path.join(JOURNAL_DIR, 'kopie', t))).strftime('%Y-%m-%d %H:%M:%S'))
+            bk_files = sorted(os.listdir(os.path.join(JOURNAL_DIR, 'kopie', bk_tag)))
+            bk_file = st.selectbox("Plik do odtworzenia:", bk_files)
+            if st.button("♻️ Odtwórz z kopii i dziennika", use_container_width=True):
+                try:
+                    if restore_from_backup(bk_tag, bk_file):
+                        admin_data_changed(bk_file)
+                        st.success(f"Odtworzono {bk_file}")
+                        time.sleep(1)
+                        st.rerun()
+                    else:
+                        st.info("Plik jest już w stanie z kopii i dziennika.")
+                except Exception as e:
+                    st.error(f"Nie udało się odtworzyć: {e}")
     st.sidebar.divider()
     # [NOWOŚĆ] SYMULACJA DATY
     with st.sidebar.expander("🕒 SYMULACJA CZASU"):
@@ -1047,6 +2072,8 @@ if opcja == "Aktualny Sezon (25/26)":
     st.header("📊 Kadra 2025/2026")
     df = load_data("25_26.csv")
     if df is not None:
+        # Przygotowanie danych (na własnej kopii - ramka z load_data jest współdzielona)
+        df = df.copy()
         df['is_youth'] = False
         if 'status' in df.columns:
             df['is_youth'] = df['status'].astype(str).str.contains(r'\(M\)', case=False, regex=True)
@@ -1261,7 +2288,7 @@ elif opcja == "Kalendarz":
         if df_m is not None:
             col_date_m = next((c for c in df_m.columns if 'data' in c and 'sort' not in c), None)
             if col_date_m:
-                df_m['dt_obj'] = pd.to_datetime(df_m[col_date_m], dayfirst=True, errors='coerce')
+                df_m = df_m.assign(dt_obj=pd.to_datetime(df_m[col_date_m], dayfirst=True, errors='coerce'))
                 # Szukamy meczu DOKŁADNIE DZIŚ (dzień, miesiąc, rok bieżący)
                 matches_today = df_m[df_m['dt_obj'].dt.date == today]
                 if not matches_today.empty:
@@ -1287,7 +2314,7 @@ elif opcja == "Kalendarz":
 
         # A. Urodziny Piłkarzy
         if df_p is not None:
-            df_p['id_name'] = df_p['imię i nazwisko'].astype(str).str.lower().str.strip()
+            df_p = df_p.assign(id_name=df_p['imię i nazwisko'].astype(str).str.lower().str.strip())
             df_unique = df_p.drop_duplicates(subset=['id_name'], keep='first')
             col_b = next((c for c in df_unique.columns if c in ['data urodzenia', 'urodzony', 'data_ur']), None)
 
@@ -1318,7 +2345,7 @@ elif opcja == "Kalendarz":
 
         # B. Urodziny Trenerów
         if df_t is not None:
-            df_t['id_name'] = df_t['imię i nazwisko'].astype(str).str.lower().str.strip()
+            df_t = df_t.assign(id_name=df_t['imię i nazwisko'].astype(str).str.lower().str.strip())
             df_t_unique = df_t.drop_duplicates(subset=['id_name'], keep='first')
             col_bt = next((c for c in df_t_unique.columns if c in ['data urodzenia', 'urodzony', 'data_ur']), None)
             if col_bt:
@@ -1529,6 +2556,7 @@ elif opcja == "Centrum Zawodników":
             minutes_dict = df_det.groupby('Zawodnik_Clean')['Minuty'].sum().to_dict()
 
         if df_long is not None:
+            df_long = df_long.copy()
             # 2. Ustalanie kolumny z meczami (suma)
             col_s = 'SUMA'
             if 'SUMA' not in df_long.columns:
@@ -1647,6 +2675,7 @@ elif opcja == "Centrum Zawodników":
                     col_s = 'liczba'
 
             if col_s in df.columns:
+                df = df.copy()
                 # 2. Czyszczenie danych (konwersja na liczby)
                 if isinstance(df[col_s], pd.DataFrame): df[col_s] = df[col_s].iloc[:, 0]
                 df[col_s] = pd.to_numeric(df[col_s], errors='coerce').fillna(0).astype(int)
@@ -1706,6 +2735,7 @@ elif opcja == "Centrum Meczowe":
 
     if df_m is not None:
         # --- 1. GLOBALNE PRZETWARZANIE DANYCH ---
+        df_m = df_m.copy()
 
         # A. Normalizacja wyniku
         def standardize_score(s):
@@ -1819,8 +2849,8 @@ elif opcja == "Centrum Meczowe":
                             final_cols.append('wynik')
 
                         st.dataframe(
-                            matches_with_score[final_cols].style.map(
-                                color_results_logic,
+                            matches_with_score[final_cols].style.apply(
+                                color_results,
                                 subset=['wynik'] if 'wynik' in final_cols else None
                             ),
                             use_container_width=True,
@@ -1842,7 +2872,7 @@ elif opcja == "Centrum Meczowe":
 
                 c1, c2 = st.columns(2)
                 with c1:
-                    if HAS_PLOTLY:
+                    if load_plotly() is not None:
                         import plotly.express as px
 
                         color_map = {"Zwycięstwo": "green", "Remis": "gray", "Porażka": "red"}
@@ -1883,24 +2913,17 @@ elif opcja == "Centrum Meczowe":
                         if sel_riv: df_arch = df_arch[df_arch['rywal'].isin(sel_riv)]
 
                         if sel_dom != "Wszystkie":
-                            # LOGIKA UWZGLĘDNIAJĄCA CZECHOWICE
-                            def check_is_home_arch(val):
-                                s = str(val).lower()
-                                return any(
-                                    k in s for k in
-                                    ['1', 'true', 'tak', 'dom', 'bielsko', 'czechowice', 'rekord', 'u siebie'])
-
-
+                            # is_home z load_data (uwzględnia Czechowice)
                             if sel_dom == "Dom":
-                                df_arch = df_arch[df_arch['dom'].apply(check_is_home_arch)]
+                                df_arch = df_arch[df_arch['is_home']]
                             else:
-                                df_arch = df_arch[~df_arch['dom'].apply(check_is_home_arch)]
+                                df_arch = df_arch[~df_arch['is_home']]
 
                         cols_show = ['data meczu', 'sezon', 'rywal', 'wynik', 'rozgrywki', 'strzelcy', 'widzów']
                         final_cols = [c for c in cols_show if c in df_arch.columns]
 
                         st.dataframe(
-                            df_arch[final_cols].style.map(color_results_logic,
+                            df_arch[final_cols].style.apply(color_results,
                                                           subset=['wynik'] if 'wynik' in df_arch.columns else None),
                             use_container_width=True,
                             hide_index=True,
@@ -1924,35 +2947,14 @@ elif opcja == "Centrum Meczowe":
                     # 1. Definiowanie nazw kolumn (na podstawie Twojej diagnostyki)
                     # Szukamy kolumny widzów
                     col_att = next((c for c in df_m.columns if c.lower() in ['widzów', 'frekwencja', 'kibiców']), None)
-                    # Szukamy kolumny dom/gospodarz
-                    col_dom = next((c for c in df_m.columns if c.lower() in ['dom', 'gospodarz', 'u siebie']), None)
                     # Szukamy kolumny ligi
                     col_liga = next((c for c in df_m.columns if c.lower() in ['rozgrywki', 'liga', 'turniej']), None)
-                    # Szukamy kolumny miejsca (dla Czechowic itp.)
-                    col_miejsce = next(
-                        (c for c in df_m.columns if c.lower() in ['miejsce rozgrywania', 'miejsce', 'stadion']), None)
 
                     # 2. Główny warunek: Musimy mieć kolumnę widzów i sezon
                     if col_att and 'sezon' in df_m.columns:
 
-                        # --- LOGIKA FILTROWANIA MECZÓW DOMOWYCH ---
-                        def check_is_home(row):
-                            # A. Sprawdź kolumnę 'dom' (czy jest 1, True, tak)
-                            if col_dom and str(row[col_dom]).lower().strip() in ['1', '1.0', 'true', 'tak', 't', 'dom']:
-                                return True
-                            # B. Sprawdź miejsce rozgrywania (Bielsko, Rekord, Czechowice)
-                            if col_miejsce and pd.notna(row[col_miejsce]):
-                                s = str(row[col_miejsce]).lower()
-                                if any(x in s for x in ['bielsko', 'rekord', 'bks', 'rychlińskiego', 'czechowice']):
-                                    return True
-                            return False
-
-
-                        # Tworzymy kolumnę pomocniczą
-                        df_m['is_home_calc'] = df_m.apply(check_is_home, axis=1)
-
-                        # Wybieramy tylko mecze domowe
-                        df_home = df_m[df_m['is_home_calc']].copy()
+                        # Wybieramy tylko mecze domowe (is_home z load_data: kolumna 'dom' i miejsce rozgrywania)
+                        df_home = df_m[df_m['is_home']].copy()
 
                         # --- CZYSZCZENIE DANYCH LICZBOWYCH ---
                         # Zamiana na liczby, błędy na 0
@@ -1995,7 +2997,7 @@ elif opcja == "Centrum Meczowe":
                             )
 
                             # Sprawdzamy czy mamy bibliotekę Plotly (ładne wykresy)
-                            if HAS_PLOTLY:
+                            if load_plotly() is not None:
                                 import plotly.express as px
 
                                 if chart_mode == "Średnia na mecz":
@@ -2223,26 +3225,18 @@ elif opcja == "Trenerzy":
         df = load_data("trenerzy.csv")
 
         if df is not None:
-            def parse_date_safe(val):
-                s = str(val).strip().lower()
-                if s in ['-', 'nan', '', 'obecnie']: return pd.NaT
-                try:
-                    return pd.to_datetime(s, dayfirst=True)
-                except:
-                    return pd.NaT
-
-            if 'początek' in df.columns:
-                df['początek_dt'] = df['początek'].apply(parse_date_safe)
+            # Wiersze trenerzy.csv i kadencje mają tę samą kolejność (tenure_id = numer wiersza)
+            tenures = load_coach_tenures()
+            coach_matches = load_coach_matches()
+            df = df.assign(początek_dt=tenures['start'].to_numpy())
+
+            # Mecze i punkty kadencji liczone z wyników w mecze.csv (ręczne kolumny tylko bez pliku meczów)
+            if coach_matches is not None:
+                per_tenure = coach_results(coach_matches, 'tenure_id').reindex(tenures['tenure_id'], fill_value=0)
+                df = df.assign(mecze=per_tenure['mecze'].to_numpy(), punkty=per_tenure['punkty'].to_numpy())
             else:
-                df['początek_dt'] = pd.NaT
-
-            if 'koniec' in df.columns:
-                df['koniec_dt'] = df['koniec'].apply(parse_date_safe)
-            else:
-                df['koniec_dt'] = pd.NaT
-
-            for col in ['mecze', 'punkty']:
-                if col in df.columns: df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
+                for col in ['mecze', 'punkty']:
+                    if col in df.columns: df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
 
             df = prepare_flags(df)
 
@@ -2273,8 +3267,9 @@ elif opcja == "Trenerzy":
             with t2:
                 st.subheader("📊 Tabela Wszechczasów")
                 if 'punkty' in df.columns and 'mecze' in df.columns:
-                    agg = df.groupby(['imię i nazwisko', 'Narodowość', 'Flaga'], as_index=False)[
-                        ['mecze', 'punkty']].sum()
+                    agg = df.assign(coach_id=tenures['coach_id'].to_numpy()).groupby('coach_id', as_index=False).agg(
+                        {'imię i nazwisko': 'first', 'Narodowość': 'first', 'Flaga': 'first', 'mecze': 'sum',
+                         'punkty': 'sum'}).drop(columns='coach_id')
                     agg['Śr. Pkt'] = (agg['punkty'] / agg['mecze']).fillna(0)
 
                     sort_mode = st.radio("Sortuj według:", ["Punkty (Suma)", "Mecze (Liczba)",
@@ -2307,31 +3302,12 @@ elif opcja == "Trenerzy":
 
                 if sel_compare:
                     comp_data = []
-                    mecze_df = load_data("mecze.csv")
+                    mecze_df = coach_matches
                     if mecze_df is not None:
-                        col_m_date = next((c for c in mecze_df.columns if 'data' in c and 'sort' not in c), None)
-                        if col_m_date:
-                            mecze_df['dt_temp'] = pd.to_datetime(mecze_df[col_m_date], dayfirst=True, errors='coerce')
+                        if 'dt' in mecze_df.columns:
                             for coach in sel_compare:
-                                coach_rows = df[df['imię i nazwisko'] == coach]
-                                mask = pd.Series([False] * len(mecze_df))
-                                for _, c_row in coach_rows.iterrows():
-                                    start = c_row['początek_dt']
-                                    end = c_row['koniec_dt']
-                                    if pd.isna(start): continue
-                                    if pd.isna(end): end = pd.Timestamp.now() + pd.Timedelta(days=365)
-                                    mask |= (mecze_df['dt_temp'] >= start) & (mecze_df['dt_temp'] <= end)
-
-                                cm = mecze_df[mask]
-                                w, d, l, gf, ga, pts_sum = 0, 0, 0, 0, 0, 0
-                                if not cm.empty:
-                                    for _, row_match in cm.iterrows():
-                                        res = parse_result(row_match.get('wynik'))
-                                        if res:
-                                            gf += res[0]; ga += res[1]
-                                            if res[0] > res[1]: w += 1; pts_sum += 3
-                                            elif res[0] == res[1]: d += 1; pts_sum += 1
-                                            else: l += 1
+                                cm = mecze_df[mecze_df['coach_id'] == coach_id(coach)]
+                                w, d, l, gf, ga, pts_sum = match_balance(cm)
 
                                 total_m = w + d + l
                                 avg_pts = pts_sum / total_m if total_m > 0 else 0
@@ -2357,7 +3333,8 @@ elif opcja == "Trenerzy":
                                     }
                                 )
 
-                                if HAS_PLOTLY:
+                                go = load_plotly()
+                                if go is not None:
                                     fig = go.Figure()
                                     fig.add_trace(go.Bar(x=res_df.index, y=res_df['Średnia Pkt'], name='Średnia Pkt', marker_color='#2ecc71'))
                                     fig.add_trace(go.Bar(x=res_df.index, y=res_df['% Zwycięstw'] / 33, name='Index Wygranych', marker_color='#3498db', opacity=0.5))
@@ -1,11 +1,26 @@
 import streamlit as st
-import pandas as pd
 import datetime
+import csv
+import gzip
+import hashlib
+import io
+import json
 import re
 import os
 import time
-import calendar
-from streamlit_autorefresh import st_autorefresh
+import contextlib
+import shutil
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from login_page import STARTUP_TIMES, login, logout, startup_step
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
 
 # --- 1. KONFIGURACJA STRONY ---
 st.set_page_config(
@@ -14,8 +29,6 @@ st.set_page_config(
     page_icon="⚽"
 )
 
-# Odświeżanie co 5 minut (300 000 ms), aby nie rozłączało
-st_autorefresh(interval=300000, key="data_refresh_key")
 # ==========================================
 # [NOWOŚĆ] GLOBALNE STYLE CSS (DARK MODE FIX)
 # ==========================================
@@ -89,8 +102,6 @@ def apply_custom_css():
     """, unsafe_allow_html=True)
 
 
-apply_custom_css()  # <--- Uruchomienie stylów
-
 # --- 2. ZARZĄDZANIE SESJĄ I NAWIGACJA (Router) ---
 if 'uploader_key' not in st.session_state: st.session_state['uploader_key'] = 0
 if 'logged_in' not in st.session_state: st.session_state['logged_in'] = False
@@ -107,21 +118,6 @@ def navigate_to_player(name):
     st.rerun()
 
 
-# --- 3. LOGOWANIE ---
-USERS = {
-    "Djero": "TSP1995",
-    "KKowalski": "Tsp2025",
-    "PPorebski": "TSP2025",
-    "MCzerniak": "TSP2025",
-    "SJaszczurowski": "TSP2025",
-    "guest": "123456789",
-    "JFilip": "KochamPodbeskidzie",
-    "DJakubiec": "GodziszkaToMy",
-    "DStanclik": "TSP2026",
-    "Gabrielba": "TSP2026",
-    "MSeredyniecki": "TSP2026"
-}
-
 # --- KONFIGURACJA GLOBALNA ---
 IGNORED_SEASONS = ["1995/96", "1996/97", "1995/1996", "1996/1997"]
 
@@ -130,44 +126,41 @@ def filter_seasons(df, col_name='Sezon'):
     """Usuwa z DataFrame rekordy z ignorowanych sezonów."""
     if df is None or col_name not in df.columns:
         return df
-    return df[~df[col_name].isin(IGNORED_SEASONS)].copy()
-
-
-def login():
-    st.title("🔒 Panel Logowania TSP")
-    col1, col2, col3 = st.columns([1, 2, 1])
-    with col2:
-        u = st.text_input("Użytkownik")
-        p = st.text_input("Hasło", type="password")
-        if st.button("Zaloguj", use_container_width=True):
-            if u in USERS and USERS[u] == p:
-                st.session_state['logged_in'] = True
-                st.session_state['username'] = u
-                st.rerun()
-            else:
-                st.error("Błąd logowania")
-
-
-def logout():
-    st.session_state['logged_in'] = False
-    st.session_state['username'] = ""
-    st.rerun()
+    return df[~df[col_name].isin(IGNORED_SEASONS)]
 
 
+# Ekran logowania (login_page) nie potrzebuje pandas, plotly ani stylów - to wszystko ładujemy dopiero niżej
 if not st.session_state['logged_in']:
     login()
     st.stop()
 
 # --- GŁÓWNA APLIKACJA ---
+with startup_step("import pandas + numpy"):
+    import pandas as pd
+    import numpy as np
+with startup_step("import calendar"):
+    import calendar
+
+# Ramki z loaderów są współdzielone przez wszystkie sesje (st.cache_resource, bez kopii na przebieg).
+# Copy-on-Write sprawia, że zapis do ramki pochodnej nie przecieka do oryginału; w pandas >= 3.0
+# jest zawsze włączony. Samej ramki z loadera nie wolno zmieniać - nowe kolumny przez assign()/copy().
+if int(pd.__version__.split('.')[0]) < 3:
+    pd.set_option('mode.copy_on_write', True)
+
+with startup_step("style CSS"):
+    apply_custom_css()
+
 st.title("⚽ Baza Danych TSP - Centrum Wiedzy")
 
-try:
-    import plotly.express as px
-    import plotly.graph_objects as go
 
-    HAS_PLOTLY = True
-except:
-    HAS_PLOTLY = False
+def load_plotly():
+    """plotly.graph_objects albo None (brak pakietu). Import dopiero przy pierwszym wykresie, nie przy starcie."""
+    try:
+        with startup_step("import plotly (pierwszy wykres)"):
+            import plotly.graph_objects as go
+        return go
+    except ImportError:
+        return None
 
 # --- MAPOWANIE KRAJÓW (BEZ ZMIAN) ---
 COUNTRY_TO_ISO = {
@@ -198,6 +191,7 @@ def render_player_profile(player_name):
     """Wyświetla profil zawodnika z historią podzieloną na sezony."""
 
     # --- 1. ŁADOWANIE DANYCH ---
+    preload_data(HELPER_DATA['render_player_profile'])
     df_uv = load_data("pilkarze.csv")
     df_long = load_data("pilkarze.csv")
     df_strzelcy = load_data("strzelcy.csv")
@@ -214,15 +208,16 @@ def render_player_profile(player_name):
     sort_col = 'suma' if 'suma' in df_uv.columns else ('mecze' if 'mecze' in df_uv.columns else None)
     if sort_col:
         df_uv[sort_col] = pd.to_numeric(df_uv[sort_col], errors='coerce').fillna(0)
-        df_uv_sorted = df_uv.sort_values(sort_col, ascending=False).drop_duplicates(subset=['imię i nazwisko'])
+        df_uv_sorted = df_uv.sort_values(sort_col, ascending=False).drop_duplicates(subset=['player_id'])
     else:
-        df_uv_sorted = df_uv.drop_duplicates(subset=['imię i nazwisko'])
+        df_uv_sorted = df_uv.drop_duplicates(subset=['player_id'])
 
-    if player_name not in df_uv_sorted['imię i nazwisko'].values:
+    pid = player_id(player_name)
+    if pid not in df_uv_sorted['player_id'].values:
         st.warning(f"Nie znaleziono profilu: {player_name}")
         return
 
-    row = df_uv_sorted[df_uv_sorted['imię i nazwisko'] == player_name].iloc[0]
+    row = df_uv_sorted[df_uv_sorted['player_id'] == pid].iloc[0]
 
     # --- A. WIEK ---
     col_b = next((c for c in row.index if c in ['data urodzenia', 'urodzony', 'data_ur']), None)
@@ -251,7 +246,7 @@ def render_player_profile(player_name):
     last_txt = "-"
     p_hist = pd.DataFrame()
     if df_det_goals is not None:
-        p_hist = df_det_goals[df_det_goals['Zawodnik_Clean'] == player_name].copy()
+        p_hist = df_det_goals[df_det_goals['player_id'] == pid].copy()
         if not p_hist.empty and 'Data_Sort' in p_hist.columns:
             p_hist = p_hist.sort_values('Data_Sort', ascending=True)
 
@@ -290,7 +285,7 @@ def render_player_profile(player_name):
     st.markdown("---")
 
     # --- E. WYKRES ---
-    p_stats = df_long[df_long['imię i nazwisko'] == player_name].copy()
+    p_stats = df_long[df_long['player_id'] == pid].copy()
     if 'sezon' in p_stats.columns: p_stats = p_stats.sort_values('sezon')
 
     gole_l = []
@@ -301,7 +296,8 @@ def render_player_profile(player_name):
         gole_l = [0] * len(p_stats)
     p_stats['Gole_Calc'] = gole_l
 
-    if 'sezon' in p_stats.columns and HAS_PLOTLY:
+    go = load_plotly()
+    if 'sezon' in p_stats.columns and go is not None:
         try:
             p_stats['liczba'] = pd.to_numeric(p_stats.get('liczba', p_stats.get('mecze', 0)), errors='coerce').fillna(0)
             if not p_stats.empty and p_stats['liczba'].sum() > 0:
@@ -316,8 +312,8 @@ def render_player_profile(player_name):
 
     # --- F. TABELA GOLI ---
     if df_det_goals is not None and 'Gole' in df_det_goals.columns:
-        df_det_goals['Gole'] = pd.to_numeric(df_det_goals['Gole'], errors='coerce').fillna(0).astype(int)
-        goals_df = df_det_goals[(df_det_goals['Zawodnik_Clean'] == player_name) & (df_det_goals['Gole'] > 0)].copy()
+        df_det_goals = df_det_goals.assign(Gole=pd.to_numeric(df_det_goals['Gole'], errors='coerce').fillna(0).astype(int))
+        goals_df = df_det_goals[(df_det_goals['player_id'] == pid) & (df_det_goals['Gole'] > 0)].copy()
         if not goals_df.empty:
             if 'Data_Sort' in goals_df.columns: goals_df = goals_df.sort_values('Data_Sort', ascending=False)
             st.markdown(f"**⚽ Mecze ze zdobytą bramką (Łącznie: {goals_df['Gole'].sum()})**")
@@ -378,44 +374,47 @@ def render_player_profile(player_name):
             # Sortujemy sezony tak, żeby "2024/25" było wyżej niż "2010/11"
             # Ponieważ p_hist jest już posortowane po dacie malejąco, unique() powinno zachować kolejność
 
-            for sezon in unique_seasons:
-                with st.expander(f"📂 Sezon {sezon}", expanded=True):
-                    # Filtrujemy dane dla sezonu
-                    season_df = p_hist[p_hist['Sezon'] == sezon].copy()
-
-                    # Interaktywna tabela
-                    event = st.dataframe(
-                        season_df[final_cols].reset_index(drop=True),
-                        use_container_width=True,
-                        hide_index=True,
-                        on_select="rerun",
-                        selection_mode="single-row",
-                        key=f"hist_pl_{player_name}_{sezon}",  # Unikalny klucz
-                        column_config={
-                            "Data_Sort": st.column_config.DateColumn("Data", format="DD.MM.YYYY"),
-                            "Gole": st.column_config.NumberColumn("Gole", format="%d ⚽"),
-                            "Wpuszczone": st.column_config.NumberColumn("Wpuszczone", format="%d ❌"),
-                            "Minuty": st.column_config.NumberColumn("Minuty", format="%d'"),
-                            "Żółte": st.column_config.NumberColumn("Żółte", format="%d 🟨"),
-                            "Czerwone": st.column_config.NumberColumn("Czerwone", format="%d 🟥")
-                        }
-                    )
+            # Kliknięcie w mecz przerysowuje tylko tabelę swojego sezonu (fragment), nie cały profil
+            @st.fragment
+            def season_matches_table(sezon, season_df):
+                # Interaktywna tabela
+                event = st.dataframe(
+                    season_df[final_cols].reset_index(drop=True),
+                    use_container_width=True,
+                    hide_index=True,
+                    on_select="rerun",
+                    selection_mode="single-row",
+                    key=f"hist_pl_{player_name}_{sezon}",  # Unikalny klucz
+                    column_config={
+                        "Data_Sort": st.column_config.DateColumn("Data", format="DD.MM.YYYY"),
+                        "Gole": st.column_config.NumberColumn("Gole", format="%d ⚽"),
+                        "Wpuszczone": st.column_config.NumberColumn("Wpuszczone", format="%d ❌"),
+                        "Minuty": st.column_config.NumberColumn("Minuty", format="%d'"),
+                        "Żółte": st.column_config.NumberColumn("Żółte", format="%d 🟨"),
+                        "Czerwone": st.column_config.NumberColumn("Czerwone", format="%d 🟥")
+                    }
+                )
 
-                    # Obsługa kliknięcia wewnątrz sezonu
-                    if event.selection.rows:
-                        idx = event.selection.rows[0]
-                        selected_match = season_df.iloc[idx]
-                        match_label = selected_match['Mecz_Label']
+                # Obsługa kliknięcia wewnątrz sezonu
+                if event.selection.rows:
+                    idx = event.selection.rows[0]
+                    selected_match = season_df.iloc[idx]
+                    match_label = selected_match['Mecz_Label']
 
-                        st.markdown("---")
-                        st.markdown(f"#### 🔎 Raport meczowy")
+                    st.markdown("---")
+                    st.markdown(f"#### 🔎 Raport meczowy")
 
-                        full_match_squad = df_det_goals[df_det_goals['Mecz_Label'] == match_label].copy()
-                        if not full_match_squad.empty:
-                            full_match_squad = full_match_squad.sort_values('File_Order')
-                            render_match_report_logic(match_label, full_match_squad)
-                        else:
-                            st.warning("Brak danych składu.")
+                    full_match_squad = get_match_rows(df_det_goals, selected_match['match_id'],
+                                                      load_match_index("wystepy.csv")).copy()
+                    if not full_match_squad.empty:
+                        render_match_report_logic(match_label, full_match_squad)
+                    else:
+                        st.warning("Brak danych składu.")
+
+            for sezon in unique_seasons:
+                with st.expander(f"📂 Sezon {sezon}", expanded=True):
+                    # Filtrujemy dane dla sezonu
+                    season_matches_table(sezon, p_hist[p_hist['Sezon'] == sezon].copy())
         else:
             # Fallback jeśli nie ma kolumny Sezon (np. stary format pliku)
             st.dataframe(p_hist[final_cols], use_container_width=True)
@@ -430,28 +429,30 @@ def render_player_profile(player_name):
     if not p_hist.empty:
         my_m = p_hist['Mecz_Label'].unique()
         mates = df_det_goals[df_det_goals['Mecz_Label'].isin(my_m)].copy()
-        mates = mates[mates['Zawodnik_Clean'] != player_name]
+        mates = mates[mates['player_id'] != pid]
 
         if not mates.empty:
-            tm = mates['Zawodnik_Clean'].value_counts().head(10)
+            tm = mates['player_id'].value_counts().head(10)
+            mate_names = mates.drop_duplicates('player_id').set_index('player_id')['Zawodnik_Clean']
 
             flags_dict = {}
             if 'Flaga' in df_uv_sorted.columns:
-                flags_dict = df_uv_sorted.set_index('imię i nazwisko')['Flaga'].to_dict()
+                flags_dict = df_uv_sorted.set_index('player_id')['Flaga'].to_dict()
 
             idx_m = 0
-            for mate_name, shared_count in tm.items():
+            for mate_id, shared_count in tm.items():
+                mate_name = mate_names[mate_id]
                 idx_m += 1
                 medal = "🥇" if idx_m == 1 else ("🥈" if idx_m == 2 else ("🥉" if idx_m == 3 else f"{idx_m}."))
 
                 expander_label = f"{medal} {mate_name} — {shared_count} meczów"
                 with st.expander(expander_label):
-                    f_url = flags_dict.get(mate_name)
+                    f_url = flags_dict.get(mate_id)
                     if f_url: st.markdown(f'<img src="{f_url}" style="height:20px;"/> <b>{mate_name}</b>',
                                           unsafe_allow_html=True)
 
                     shared_g = mates[
-                        (mates['Zawodnik_Clean'] == mate_name) &
+                        (mates['player_id'] == mate_id) &
                         (mates['Mecz_Label'].isin(my_m))
                         ].copy()
 
@@ -476,6 +477,7 @@ def render_coach_profile(coach_name):
     """Generuje pełny profil trenera z podziałem na sezony."""
 
     # 1. Ładowanie danych
+    preload_data(HELPER_DATA['render_coach_profile'])
     df_t = load_data("trenerzy.csv")
     df_m = load_data("mecze.csv")
     df_details = load_details("wystepy.csv")
@@ -495,68 +497,21 @@ def render_coach_profile(coach_name):
 
     # Pobieramy dane personalne
     base_info = coach_rows.iloc[0]
+    coach_id = player_id(coach_name)
 
-    # --- FUNKCJA POMOCNICZA DO DAT ---
-    def safe_parse_date(val):
-        """Próbuje sparsować datę na wiele sposobów."""
-        s = str(val).strip().lower()
-        if s in ['-', 'nan', '', 'obecnie', 'null']:
-            return pd.NaT
-
-        # Próba 1: DD.MM.YYYY
-        try:
-            return pd.to_datetime(s, dayfirst=True)
-        except:
-            pass
-
-        # Próba 2: YYYY-MM-DD
-        try:
-            return pd.to_datetime(s, format='%Y-%m-%d')
-        except:
-            pass
-
-        # Próba 3: Automatyczna
-        try:
-            return pd.to_datetime(s)
-        except:
-            return pd.NaT
-
-    # 3. Filtrowanie meczów (Naprawiona logika)
-    matches_mask = pd.Series([False] * len(df_m)) if df_m is not None else pd.Series([], dtype=bool)
+    # 3. Kadencje i mecze trenera (przypisanie meczów liczone raz na wersję danych)
+    tenures = load_coach_tenures()
     tenure_list = []
-
-    if df_m is not None:
-        # Znajdź kolumnę z datą w mecze.csv
-        col_m_date = next((c for c in df_m.columns if c in ['data meczu', 'data', 'dt_obj']), None)
-
-        if col_m_date:
-            # Konwertujemy daty meczów raz
-            df_m['dt_temp'] = df_m[col_m_date].apply(safe_parse_date)
-
-            for _, row in coach_rows.iterrows():
-                s_date = safe_parse_date(row.get('początek'))
-                e_date = safe_parse_date(row.get('koniec'))
-
-                # Obsługa "do teraz"
-                is_curr = False
-                if pd.isna(e_date):
-                    e_date = pd.Timestamp.today() + pd.Timedelta(days=365)  # Margines na przyszłość
-                    is_curr = True
-
-                # Formatowanie do wyświetlania
-                s_txt = s_date.strftime('%d.%m.%Y') if pd.notna(s_date) else "?"
-                e_txt = "obecnie" if is_curr else (e_date.strftime('%d.%m.%Y') if pd.notna(row.get('koniec')) else "?")
-
-                if pd.notna(s_date):
-                    tenure_list.append(f"{s_txt} — {e_txt}")
-                    # Dodajemy do maski mecze, które mieszczą się w tym zakresie
-                    # Ważne: fillna(False) dla dat, których nie udało się sparsować
-                    current_mask = (df_m['dt_temp'] >= s_date) & (df_m['dt_temp'] <= e_date)
-                    matches_mask |= current_mask
-
-    # Zastosowanie maski i sortowanie
-    coach_matches = df_m[matches_mask].sort_values('dt_temp',
-                                                   ascending=False) if not matches_mask.empty else pd.DataFrame()
+    for _, ten in tenures[tenures['coach_id'] == coach_id].iterrows():
+        if pd.notna(ten['start']):
+            e_txt = "obecnie" if pd.isna(ten['end']) else ten['end'].strftime('%d.%m.%Y')
+            tenure_list.append(f"{ten['start'].strftime('%d.%m.%Y')} — {e_txt}")
+
+    all_coach_matches = load_coach_matches() if df_m is not None else None
+    if all_coach_matches is not None:
+        coach_matches = all_coach_matches[all_coach_matches['coach_id'] == coach_id].sort_values('dt', ascending=False)
+    else:
+        coach_matches = pd.DataFrame()
 
     # --- WIDOK PROFILU ---
     st.markdown(f"## 👔 {coach_name}")
@@ -593,21 +548,9 @@ def render_coach_profile(coach_name):
 
     # --- STATYSTYKI OGÓLNE ---
     if not coach_matches.empty:
-        wins, draws, losses, gf, ga = 0, 0, 0, 0, 0
-        for _, m in coach_matches.iterrows():
-            res = parse_result(m.get('wynik'))
-            if res:
-                gf += res[0];
-                ga += res[1]
-                if res[0] > res[1]:
-                    wins += 1
-                elif res[0] == res[1]:
-                    draws += 1
-                else:
-                    losses += 1
+        wins, draws, losses, gf, ga, pts = match_balance(coach_matches)
 
         total = wins + draws + losses
-        ppg = pts = (wins * 3) + draws
         ppg_val = pts / total if total > 0 else 0
 
         k1, k2, k3, k4 = st.columns(4)
@@ -622,9 +565,8 @@ def render_coach_profile(coach_name):
 
         # Przygotowanie danych do wyświetlania
         display_df = coach_matches.copy()
-        display_df['Data'] = display_df['dt_temp']
-        display_df['Gdzie'] = display_df['dom'].apply(
-            lambda x: "🏠" if str(x).lower() in ['1', 'true', 'dom', 'tak'] else "🚌")
+        display_df['Data'] = display_df['dt']
+        display_df['Gdzie'] = np.where(display_df['is_home'], "🏠", "🚌")
 
         if 'sezon' not in display_df.columns:
             display_df['sezon'] = "Nieznany"
@@ -633,120 +575,673 @@ def render_coach_profile(coach_name):
         # Pobieramy unikalne sezony w kolejności występowania (dzięki sortowaniu po dacie są już poukładane)
         unique_seasons = display_df['sezon'].unique()
 
+        # Kliknięcie w mecz przerysowuje tylko tabelę swojego sezonu (fragment), nie cały profil
+        @st.fragment
+        def season_matches_table(sezon, season_matches):
+            # Kolumny
+            cols_needed = ['Data', 'rywal', 'wynik', 'Gdzie', 'rozgrywki']
+            final_cols = [c for c in cols_needed if c in season_matches.columns]
+
+            # Tabela interaktywna
+            event = st.dataframe(
+                season_matches[final_cols].style.apply(color_results, subset=[
+                    'wynik'] if 'wynik' in season_matches.columns else None),
+                use_container_width=True,
+                hide_index=True,
+                on_select="rerun",
+                selection_mode="single-row",
+                key=f"coach_hist_{sezon}",  # Unikalny klucz dla każdego sezonu
+                column_config={
+                    "Data": st.column_config.DateColumn("Data", format="DD.MM.YYYY"),
+                    "rywal": st.column_config.TextColumn("Rywal"),
+                    "wynik": st.column_config.TextColumn("Wynik"),
+                    "Gdzie": st.column_config.TextColumn("D/W", width="small")
+                }
+            )
+
+            # Obsługa kliknięcia w danym sezonie
+            if event.selection.rows:
+                idx = event.selection.rows[0]
+                selected_match = season_matches.iloc[idx]
+
+                sel_date = selected_match['Data'].date()
+                sel_rival = selected_match.get('rywal', 'Rywal')
+                sel_score = selected_match.get('wynik', '-')
+
+                st.markdown("---")
+                st.markdown(f"#### 🔎 Raport meczowy ({sel_date.strftime('%d.%m.%Y')})")
+
+                # Szukamy składu w wystepy.csv
+                found_squad = pd.DataFrame()
+                if df_details is not None and 'Data_Sort' in df_details.columns:
+                    found_squad = get_match_rows_by_date(df_details, sel_date, load_match_index("wystepy.csv")).copy()
+
+                if not found_squad.empty:
+                    real_label = found_squad.iloc[0]['Mecz_Label']
+                    render_match_report_logic(real_label, found_squad)
+                else:
+                    # Jeśli brak składu w występy.csv, próbujemy pokazać chociaż strzelców z mecze.csv
+                    # Wywołujemy naszą funkcję z pustym DF składu, ale z poprawnym labelem
+                    # Żeby funkcja zadziałała, musimy oszukać sprawdzenie "if empty" wewnątrz niej,
+                    # albo po prostu wyświetlić strzelców ręcznie tutaj.
+                    # Wybierzmy opcję ręczną dla bezpieczeństwa:
+
+                    st.warning("Brak szczegółowego składu (wystepy.csv). Wyświetlam dostępne dane ogólne:")
+
+                    raw_scorers = str(selected_match.get('strzelcy', '-'))
+                    if raw_scorers not in ['-', 'nan', '']:
+                        st.markdown(f"**⚽ Strzelcy:** {raw_scorers}")
+                    else:
+                        st.info("Brak danych o strzelcach.")
+
         for sezon in unique_seasons:
             with st.expander(f"📂 Sezon {sezon}", expanded=True):
                 # Filtrujemy mecze dla danego sezonu
-                season_matches = display_df[display_df['sezon'] == sezon].copy()
+                season_matches_table(sezon, display_df[display_df['sezon'] == sezon].copy())
 
-                # Kolumny
-                cols_needed = ['Data', 'rywal', 'wynik', 'Gdzie', 'rozgrywki']
-                final_cols = [c for c in cols_needed if c in season_matches.columns]
+    else:
+        st.info("Brak zarejestrowanych meczów w bazie dla tego trenera (sprawdź poprawność dat w plikach csv).")
 
-                # Tabela interaktywna
-                event = st.dataframe(
-                    season_matches[final_cols].style.map(color_results_logic, subset=[
-                        'wynik'] if 'wynik' in season_matches.columns else None),
-                    use_container_width=True,
-                    hide_index=True,
-                    on_select="rerun",
-                    selection_mode="single-row",
-                    key=f"coach_hist_{sezon}",  # Unikalny klucz dla każdego sezonu
-                    column_config={
-                        "Data": st.column_config.DateColumn("Data", format="DD.MM.YYYY"),
-                        "rywal": st.column_config.TextColumn("Rywal"),
-                        "wynik": st.column_config.TextColumn("Wynik"),
-                        "Gdzie": st.column_config.TextColumn("D/W", width="small")
-                    }
-                )
 
-                # Obsługa kliknięcia w danym sezonie
-                if event.selection.rows:
-                    idx = event.selection.rows[0]
-                    selected_match = season_matches.iloc[idx]
+# ==========================================
+# WSPÓLNE PARSOWANIE DAT (WEKTOROWO)
+# ==========================================
+PL_MONTHS = {
+    'stycznia': '01', 'lutego': '02', 'marca': '03', 'kwietnia': '04',
+    'maja': '05', 'czerwca': '06', 'lipca': '07', 'sierpnia': '08',
+    'września': '09', 'października': '10', 'listopada': '11', 'grudnia': '12',
+    'styczeń': '01', 'luty': '02', 'marzec': '03', 'kwiecień': '04',
+    'maj': '05', 'czerwiec': '06', 'lipiec': '07', 'sierpień': '08',
+    'wrzesień': '09', 'październik': '10', 'listopad': '11', 'grudzień': '12'
+}
+# Dłuższe nazwy najpierw, żeby 'maja' nie zostało złapane jako 'maj' + 'a'
+PL_MONTHS_RE = re.compile('|'.join(sorted(PL_MONTHS, key=len, reverse=True)))
+TRAILING_TIME_RE = r'\s+\d{1,2}:\d{2}(?::\d{2})?$'
+DATE_FORMATS = ['%d %m %Y', '%d.%m.%Y', '%Y-%m-%d', '%d.%m.%y', '%d-%m-%Y', '%Y.%m.%d', '%d/%m/%Y']
 
-                    sel_date = selected_match['Data'].date()
-                    sel_rival = selected_match.get('rywal', 'Rywal')
-                    sel_score = selected_match.get('wynik', '-')
 
-                    st.markdown("---")
-                    st.markdown(f"#### 🔎 Raport meczowy ({sel_date.strftime('%d.%m.%Y')})")
+def parse_pl_dates(values):
+    """
+    Parsuje całą kolumnę dat naraz: polskie nazwy miesięcy ('9 sierpnia 1997 18:00'),
+    DD.MM.YYYY, DD.MM.YY, daty ISO i doklejoną godzinę HH:mm.
+    Zwraca Series datetime64 (NaT tam, gdzie nie da się odczytać daty).
+    """
+    s = pd.Series(values).astype(str).str.strip().str.lower()
+    s = s.where(~s.isin(['nan', '', '-', 'null', 'none', 'nat']))
+
+    # Jedno przejście regexa: godzina na końcu, nazwy miesięcy, podwójne spacje
+    s = s.str.replace(TRAILING_TIME_RE, '', regex=True)
+    s = s.str.replace(PL_MONTHS_RE, lambda m: PL_MONTHS[m.group(0)], regex=True)
+    s = s.str.replace(r'\s+', ' ', regex=True)
+
+    result = pd.Series(pd.NaT, index=s.index, dtype='datetime64[ns]')
+    for fmt in DATE_FORMATS:
+        todo = result.isna() & s.notna()
+        if not todo.any():
+            break
+        result[todo] = pd.to_datetime(s[todo], format=fmt, errors='coerce')
+    return result
 
-                    # Szukamy składu w wystepy.csv
-                    found_squad = pd.DataFrame()
-                    if df_details is not None and 'Data_Sort' in df_details.columns:
-                        found_squad = df_details[df_details['Data_Sort'].dt.date == sel_date].copy()
 
-                    if not found_squad.empty:
-                        found_squad = found_squad.sort_values('File_Order')
-                        real_label = found_squad.iloc[0]['Mecz_Label']
-                        render_match_report_logic(real_label, found_squad)
-                    else:
-                        # Jeśli brak składu w występy.csv, próbujemy pokazać chociaż strzelców z mecze.csv
-                        # Wywołujemy naszą funkcję z pustym DF składu, ale z poprawnym labelem
-                        # Żeby funkcja zadziałała, musimy oszukać sprawdzenie "if empty" wewnątrz niej,
-                        # albo po prostu wyświetlić strzelców ręcznie tutaj.
-                        # Wybierzmy opcję ręczną dla bezpieczeństwa:
+# ==========================================
+# SNAPSHOTY DANYCH (KOLUMNOWY CACHE NA DYSKU)
+# ==========================================
+# Znormalizowane ramki z load_data / load_details zapisujemy do katalogu SNAPSHOT_DIR.
+# Klucz snapshotu = ścieżka pliku źródłowego + mtime + rozmiar (+ wersja logiki),
+# więc każda zmiana CSV automatycznie unieważnia stary snapshot.
+SNAPSHOT_DIR = ".tsp_cache"
+SNAPSHOT_VERSION = 8  # Podbić przy każdej zmianie logiki normalizacji w load_data / load_details
 
-                        st.warning("Brak szczegółowego składu (wystepy.csv). Wyświetlam dostępne dane ogólne:")
 
-                        raw_scorers = str(selected_match.get('strzelcy', '-'))
-                        if raw_scorers not in ['-', 'nan', '']:
-                            st.markdown(f"**⚽ Strzelcy:** {raw_scorers}")
-                        else:
-                            st.info("Brak danych o strzelcach.")
+def _snapshot_base(filename, kind):
+    """Prefiks nazwy snapshotu: plik + rodzaj + skrót ścieżki źródłowej."""
+    path_hash = hashlib.sha1(os.path.abspath(data_path(filename)).encode('utf-8')).hexdigest()[:8]
+    return f"{os.path.basename(filename)}.{kind}.{path_hash}"
 
-    else:
-        st.info("Brak zarejestrowanych meczów w bazie dla tego trenera (sprawdź poprawność dat w plikach csv).")
+
+def _snapshot_key(version):
+    """Skrót wersji pliku źródłowego ((mtime, rozmiar) z file_version + wersja logiki)."""
+    raw = f"{version[0]}|{version[1]}|{SNAPSHOT_VERSION}"
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:12]
+
+
+def load_snapshot(filename, kind, version):
+    """Zwraca ramkę ze snapshotu danej wersji pliku źródłowego (inaczej None)."""
+    try:
+        stem = os.path.join(SNAPSHOT_DIR, f"{_snapshot_base(filename, kind)}.{_snapshot_key(version)}")
+        if os.path.exists(stem + ".parquet"):
+            return pd.read_parquet(stem + ".parquet")
+        if os.path.exists(stem + ".pkl"):
+            return pd.read_pickle(stem + ".pkl")
+    except Exception:
+        pass
+    return None
+
+
+def save_snapshot(df, filename, kind, version):
+    """
+    Zapisuje snapshot wersji pliku (parquet, a dla kolumn mieszanych typów - pickle) i usuwa nieaktualne.
+    Obok zapisuje metadane (rozmiar i SHA1 pliku źródłowego) potrzebne do dopisywania przyrostowego.
+    """
+    try:
+        os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+        base = _snapshot_base(filename, kind)
+        stem = os.path.join(SNAPSHOT_DIR, f"{base}.{_snapshot_key(version)}")
+        with open(filename, 'rb') as fh:
+            raw = fh.read(version[1])  # Pliki tylko rosną na końcu - prefiks to bajty tej wersji
+        if len(raw) != version[1]:
+            return
+        meta = {'size': len(raw), 'sha1': hashlib.sha1(raw).hexdigest(), 'rows': len(df),
+                'version': SNAPSHOT_VERSION}
+        tmp = f"{stem}.{os.getpid()}.tmp"
+        try:
+            df.to_parquet(tmp)
+            target = stem + ".parquet"
+        except Exception:
+            # Kolumny typu "liczba albo '-'" (po fillna) nie mieszczą się w schemacie Arrow
+            df.to_pickle(tmp)
+            target = stem + ".pkl"
+        os.replace(tmp, target)  # Atomowo - czytelnik nigdy nie zobaczy połowy pliku
+        with open(tmp, 'w', encoding='utf-8') as fh:
+            json.dump(meta, fh)
+        os.replace(tmp, stem + ".json")
+
+        own = os.path.basename(stem) + "."
+        for old in os.listdir(SNAPSHOT_DIR):
+            if old.startswith(base + ".") and not old.startswith(own) and not old.endswith(".tmp"):
+                os.remove(os.path.join(SNAPSHOT_DIR, old))
+    except Exception:
+        pass  # Snapshot to tylko przyspieszenie - błąd zapisu nie może blokować aplikacji
+
+
+def load_tail_snapshot(filename, kind, parser, merger):
+    """
+    Dopisywanie przyrostowe: jeśli plik od ostatniego snapshotu tylko urósł (początek bez zmian,
+    stary koniec na granicy wiersza), parsuje wyłącznie dopisane bajty - parser(filename, tail=...) -
+    i skleja je ze starą ramką funkcją merger(old, new). Zwraca None, gdy trzeba parsować całość.
+    """
+    try:
+        base = _snapshot_base(filename, kind)
+        metas = [f for f in os.listdir(SNAPSHOT_DIR) if f.startswith(base + ".") and f.endswith(".json")]
+        if len(metas) != 1:
+            return None
+        stem = os.path.join(SNAPSHOT_DIR, metas[0][:-len(".json")])
+        with open(stem + ".json", encoding='utf-8') as fh:
+            meta = json.load(fh)
+
+        old_size = meta['size']
+        if meta.get('version') != SNAPSHOT_VERSION or old_size <= 0 or os.path.getsize(filename) <= old_size:
+            return None
+        with open(filename, 'rb') as fh:
+            raw = fh.read()
+        if raw[old_size - 1:old_size] != b"\n" or hashlib.sha1(raw[:old_size]).hexdigest() != meta['sha1']:
+            return None
+
+        if os.path.exists(stem + ".parquet"):
+            old = pd.read_parquet(stem + ".parquet")
+        else:
+            old = pd.read_pickle(stem + ".pkl")
+        if len(old) != meta['rows']:
+            return None
+
+        new = parser(filename, tail=raw[old_size:])
+        if new is None:
+            return None
+        return merger(old, new)
+    except Exception:
+        return None
+
+
+def load_with_snapshot(filename, kind, parser, merger=None):
+    """
+    Ładuje ramkę ze snapshotu lub parsuje CSV (parser) i zapisuje nowy snapshot.
+    Z podanym merger plik, do którego tylko dopisano wiersze, jest doczytywany przyrostowo.
+    Snapshot powstaje tylko, gdy plik nie zmienił się w trakcie parsowania (dopisanie w miejscu).
+    """
+    version = file_version(filename)
+    df = load_snapshot(filename, kind, version)
+    if df is not None:
+        return df
+    if merger is not None:
+        df = load_tail_snapshot(filename, kind, parser, merger)
+    if df is None:
+        df = parser(filename)
+    if df is not None and version is not None and file_version(filename) == version:
+        save_snapshot(df, filename, kind, version)
+    return df
+
+
+# ==========================================
+# WERSJE PLIKÓW I UNIEWAŻNIANIE CACHE
+# ==========================================
+# Wpisy cache loaderów są kluczowane wersją pliku źródłowego (mtime + rozmiar z os.stat), więc zmiana
+# jednego CSV nie rusza ramek wczytanych z innych plików. invalidate_files() od razu zwalnia wpisy
+# zmienionego pliku i wszystkiego, co z niego wyliczono (indeks meczów, rejestr zawodników, bramki).
+# Zmiany spoza panelu admina (edycja w Excelu, git pull) nie przechodzą przez invalidate_files, więc
+# track_cache_entry() przy każdym nowym wpisie usuwa wpisy tego samego loadera dla tych samych danych
+# zbudowane ze starszych wersji plików - w pamięci zostaje najwyżej bieżąca i ostatnio przypięta wersja.
+def file_version(filename):
+    """(mtime_ns, rozmiar) pliku albo None, gdy go nie ma."""
+    try:
+        stat = os.stat(filename)
+        return stat.st_mtime_ns, stat.st_size
+    except OSError:
+        return None
+
+
+@st.cache_resource
+def _cache_entries():
+    """Wspólny dla wszystkich sesji spis wpisów cache: nazwa loadera -> {argumenty: pliki źródłowe}."""
+    return {}
+
+
+def _cache_slot(args):
+    """
+    Argumenty wpisu cache rozdzielone na klucz danych (wersje plików zastąpione znacznikiem) i mtime_ns
+    tych wersji. Wersja to (mtime_ns, rozmiar[, i-węzeł]) albo None; argument może być krotką wersji.
+    """
+    def is_version(v):
+        return v is None or (isinstance(v, tuple) and len(v) in (2, 3) and all(isinstance(x, int) for x in v))
+    slot, stamps = [], []
+    for arg in args:
+        if is_version(arg):
+            versions = (arg,)
+        elif isinstance(arg, tuple) and arg and all(is_version(v) for v in arg):
+            versions = arg
+        else:
+            slot.append(arg)
+            continue
+        slot.append(('wersje', len(versions)))
+        stamps.extend(v[0] if v else -1 for v in versions)
+    return tuple(slot), stamps
+
+
+def track_cache_entry(loader_name, args, files):
+    """
+    Zapamiętuje wpis cache loadera (wołane z wnętrza funkcji z cache, czyli tylko przy liczeniu) i zwalnia
+    wpisy tych samych danych zbudowane z wersji plików nie nowszych niż bieżąca.
+    """
+    entries = _cache_entries().setdefault(loader_name, {})
+    slot, stamps = _cache_slot(args)
+    loader = globals().get(loader_name)
+    for old_args in list(entries):
+        old_slot, old_stamps = _cache_slot(old_args)
+        if old_args != args and old_slot == slot and all(o <= n for o, n in zip(old_stamps, stamps)):
+            if loader is not None:
+                loader.clear(*old_args)
+            entries.pop(old_args, None)
+    entries[args] = tuple(os.path.basename(f) for f in files)
+
+
+def invalidate_files(*filenames):
+    """Usuwa z cache wpisy zbudowane z podanych plików (inne pliki zostają w pamięci). Zwraca liczbę wpisów."""
+    changed = {os.path.basename(f) for f in filenames}
+    dropped = 0
+    for loader_name, entries in list(_cache_entries().items()):
+        loader = globals().get(loader_name)
+        for args, files in list(entries.items()):
+            if changed.intersection(files):
+                if loader is not None:
+                    loader.clear(*args)
+                entries.pop(args, None)
+                dropped += 1
+    return dropped
+
+
+# ==========================================
+# GENERACJE DANYCH (SPÓJNY ODCZYT PRZY ZAPISACH)
+# ==========================================
+# Każdy przebieg skryptu przypina jedną generację danych: dla każdego CSV twardy link do bieżącego
+# i-węzła w GENERATIONS_DIR/<i-węzeł>-<mtime>/<plik> oraz rozmiar pliku, i wszystkie loadery tego
+# przebiegu czytają przypięte pliki. Przepisanie pliku to zawsze plik tymczasowy + os.replace (nowy
+# i-węzeł); dopisanie wierszy zostaje w miejscu (koszt niezależny od rozmiaru pliku) i tylko wydłuża
+# i-węzeł, więc czytelnik bierze pierwsze `rozmiar` bajtów przypiętej wersji (read_pinned). Przebieg
+# widzi spójny zestaw plików nawet w trakcie zapisu admina. Zapisujący (również z różnych procesów)
+# wykluczają się blokadą GENERATIONS_DIR/.lock.
+# Przypięcie odświeża mtime katalogu wersji - wersja nieprzypięta przez GENERATION_TTL i niebędąca
+# bieżącym plikiem nie jest już używana przez żadną sesję i gc_generations() ją usuwa. Gdy przebieg
+# częściowy (fragment karty bezczynnej dłużej niż GENERATION_TTL) trafi na usuniętą wersję, plik jest
+# przypinany ponownie tylko wtedy, gdy nadal jest dokładnie tą wersją - inaczej pełny przebieg od nowa.
+GENERATIONS_DIR = ".tsp_data"
+GENERATION_TTL = 600  # s
+
+
+def _pin_file(filename):
+    """Przypina bieżącą wersję pliku. Zwraca (mtime_ns, rozmiar, i-węzeł) - wersję jak w file_version + i-węzeł."""
+    with open(filename, 'rb') as src:
+        stat = os.fstat(src.fileno())
+        version_dir = os.path.join(GENERATIONS_DIR, f"{stat.st_ino}-{stat.st_mtime_ns}")
+        target = os.path.join(version_dir, os.path.basename(filename))
+        if os.path.exists(target):
+            os.utime(version_dir)
+        else:
+            os.makedirs(version_dir, exist_ok=True)
+            tmp = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                os.link(filename, tmp)
+                if os.stat(tmp).st_ino != stat.st_ino:
+                    raise OSError("plik podmieniony w trakcie przypinania")
+            except OSError:
+                # Brak twardych linków albo wyścig z zapisem - kopiujemy z już otwartego i-węzła
+                if os.path.exists(tmp): os.remove(tmp)
+                with open(tmp, 'wb') as dst:
+                    dst.write(src.read(stat.st_size))
+                os.utime(tmp, ns=(stat.st_atime_ns, stat.st_mtime_ns))  # Kopia ma wersję oryginału
+            os.replace(tmp, target)
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+
+def pin_data_generation():
+    """Na początku przebiegu: przypina bieżące wersje wszystkich CSV (jedna generacja na cały przebieg)."""
+    generation = {}
+    for name in sorted(f for f in os.listdir('.') if f.endswith('.csv')):
+        try:
+            generation[name] = _pin_file(name)
+        except OSError:
+            pass  # Plik znika / brak uprawnień - loader przeczyta go wprost
+    st.session_state['data_generation'] = generation
+    st.session_state['data_files_read'] = set()
+    gc_state = _generation_gc_state()
+    if time.time() - gc_state['last'] > GENERATION_TTL:
+        gc_state['last'] = time.time()
+        gc_generations()
+    return generation
+
+
+def pinned_version(filename):
+    """Wersja pliku przypięta w tym przebiegu (a dla plików spoza generacji - bieżąca)."""
+    name = os.path.basename(filename)
+    # Każdy loader pyta tu o wersję, więc to zarazem spis plików, które pokazuje otwarty widok
+    st.session_state.setdefault('data_files_read', set()).add(name)
+    return st.session_state.get('data_generation', {}).get(name) or file_version(filename)
+
+
+def pinned_versions(filenames):
+    return tuple(pinned_version(f) for f in filenames)
+
+
+def generation_lost(filename):
+    """Bajty wersji z klucza nie są już dostępne - przebieg zaczyna się od nowa i przypina bieżące pliki."""
+    st.rerun()
+    raise RuntimeError(f"przypięta wersja pliku {os.path.basename(filename)} nie jest już dostępna")
+
+
+def generation_path(filename, version):
+    """
+    Ścieżka, pod którą leżą bajty danej wersji (przypiętej), inaczej sam plik. Gdy przypięty i-węzeł
+    urósł od przypięcia (dopisane wiersze), zwraca kopię jego pierwszych `rozmiar` bajtów.
+    """
+    if not (version and len(version) == 3):
+        return filename
+    path = os.path.join(GENERATIONS_DIR, f"{version[2]}-{version[0]}", os.path.basename(filename))
+    if not os.path.exists(path):
+        # Wersję usunął gc_generations - przypinamy ponownie tylko niezmieniony plik (nie czytamy go wprost)
+        try:
+            if file_version(filename) != version[:2] or _pin_file(filename) != version:
+                generation_lost(filename)
+        except OSError:
+            generation_lost(filename)
+    return pin_prefix(path, version) if os.path.getsize(path) > version[1] else path
+
+
+def pin_prefix(path, version):
+    """Kopia pierwszych version[1] bajtów przypiętego pliku, z mtime wersji (jak oryginał przed dopisaniem)."""
+    mtime, size, ino = version
+    version_dir = os.path.join(GENERATIONS_DIR, f"{ino}-{mtime}-{size}")
+    target = os.path.join(version_dir, os.path.basename(path))
+    if not os.path.exists(target):
+        os.makedirs(version_dir, exist_ok=True)
+        tmp = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(path, 'rb') as src, open(tmp, 'wb') as dst:
+            dst.write(src.read(size))
+        os.utime(tmp, ns=(mtime, mtime))
+        os.replace(tmp, target)
+    return target
+
+
+def read_pinned(filename, version, reader):
+    """
+    reader(ścieżka) na bajtach przypiętej wersji pliku. Jeśli w trakcie odczytu do przypiętego i-węzła
+    dopisano wiersze, odczyt jest powtarzany z kopii prefiksu - wynik zawsze odpowiada wersji z klucza.
+    """
+    path = generation_path(filename, version)
+    result = reader(path)
+    if path == filename:
+        # Plik spoza generacji - wynik pasuje do klucza tylko, jeśli w trakcie odczytu nic się nie zmieniło
+        if file_version(filename) != version:
+            generation_lost(filename)
+    elif file_version(path) != version[:2]:
+        result = reader(pin_prefix(path, version))
+    return result
+
+
+def data_path(filename):
+    """Plik danych, z którego pochodzi ścieżka (także kopia z GENERATIONS_DIR)."""
+    version_dir = os.path.dirname(os.path.abspath(filename))
+    if os.path.basename(os.path.dirname(version_dir)) == GENERATIONS_DIR:
+        return os.path.join(os.path.dirname(os.path.dirname(version_dir)), os.path.basename(filename))
+    return filename
+
+
+@st.cache_resource
+def _generation_gc_state():
+    return {'last': 0.0}
+
+
+def gc_generations():
+    """Usuwa wersje, które nie są bieżącymi plikami i których żadna sesja nie przypięła od GENERATION_TTL."""
+    if not os.path.isdir(GENERATIONS_DIR): return 0
+    current = set()
+    for name in os.listdir('.'):
+        if name.endswith('.csv'):
+            stat = os.stat(name)
+            current.add(f"{stat.st_ino}-{stat.st_mtime_ns}")
+    removed = 0
+    now = time.time()
+    for entry in os.listdir(GENERATIONS_DIR):
+        path = os.path.join(GENERATIONS_DIR, entry)
+        if entry in current or not os.path.isdir(path):
+            continue
+        try:
+            if now - os.stat(path).st_mtime > GENERATION_TTL:
+                shutil.rmtree(path)
+                removed += 1
+        except OSError:
+            pass
+    return removed
+
+
+@contextlib.contextmanager
+def data_write_lock():
+    """Wyłączność zapisu plików danych między wątkami i procesami (flock, na Windows msvcrt.locking)."""
+    os.makedirs(GENERATIONS_DIR, exist_ok=True)
+    with open(os.path.join(GENERATIONS_DIR, ".lock"), 'a+b') as fh:
+        if fcntl is not None:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+        else:
+            fh.seek(0)
+            msvcrt.locking(fh.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+            else:
+                fh.seek(0)
+                msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+# ==========================================
+# ODŚWIEŻANIE PO ZMIANIE DANYCH
+# ==========================================
+# Zamiast przeładowywać cały skrypt każdej sesji co 5 minut, co DATA_CHECK_INTERVAL odpala się tylko mały
+# fragment: porównuje (os.stat) pliki, które otwarty widok przeczytał, z wersjami przypiętymi w ostatnim
+# pełnym przebiegu i robi pełny rerun tylko wtedy, gdy któryś się zmienił. Bezczynna karta kosztuje
+# kilka wywołań stat, a regularny przebieg fragmentu podtrzymuje połączenie z serwerem.
+DATA_CHECK_INTERVAL = 60  # s
+
+
+def changed_data_files():
+    """Pliki czytane w ostatnim pełnym przebiegu, których bieżąca wersja różni się od przypiętej."""
+    generation = st.session_state.get('data_generation', {})
+    changed = []
+    for name in sorted(st.session_state.get('data_files_read', ())):
+        if name not in generation:
+            continue
+        try:
+            stat = os.stat(name)
+        except OSError:
+            continue  # Plik chwilowo podmieniany - sprawdzimy przy następnym cyklu
+        if (stat.st_mtime_ns, stat.st_size, stat.st_ino) != generation[name]:
+            changed.append(name)
+    return changed
+
+
+@st.fragment(run_every=DATA_CHECK_INTERVAL)
+def watch_data_versions():
+    """Fragment (bez elementów na stronie) - rerun całej aplikacji tylko po zmianie widocznych danych."""
+    if changed_data_files():
+        st.rerun(scope="app")
+
+
+def calc_minutes(df):
+    """
+    Liczy kolumnowo (bez apply po wierszach) minutę zdarzenia (wejście / zejście / czerwona kartka)
+    oraz rzeczywisty czas gry. Wymaga liczbowych kolumn Minuty, Wejście, Zejście, Czerwone.
+    Zwraca parę tablic: (Minuta_Zmiany_Real, Minuty).
+    """
+    status = df['Status'].astype(str).str.strip() if 'Status' in df.columns else pd.Series('', index=df.index)
+    res_s = df['Wynik'].astype(str).str.lower() if 'Wynik' in df.columns else pd.Series('', index=df.index)
+    entry = df['Wejście'].to_numpy()
+    exit_t = df['Zejście'].to_numpy()
+    curr = df['Minuty'].to_numpy()
+
+    # Dogrywka = 120 minut, zwykły = 90
+    extra_time = res_s.str.contains('pd.', regex=False) | res_s.str.contains('dogr.', regex=False)
+    full = np.where(extra_time.to_numpy(), 120, 90)
+
+    is_in = (status == 'Wszedł').to_numpy()
+    is_out = (status == 'Zszedł').to_numpy()
+    is_red = (status == 'Czerwona kartka').to_numpy() | (df['Czerwone'].to_numpy() > 0)
+    is_full = status.isin(['Cały mecz', 'Grał']).to_numpy()
+
+    ev_min = np.select(
+        [is_in, is_out, is_red],
+        [entry, exit_t, np.where(exit_t > 0, exit_t, curr)],
+        default=0
+    )
+
+    real = np.select(
+        [
+            # 1. Czerwona kartka i zejście
+            is_red & (exit_t > 0),
+            # 2. Cały mecz
+            is_full & (entry == 0) & (exit_t == 0),
+            # 3. Wejście z ławki (POPRAWKA "BYCZKA"): wejście w 90. lub doliczonym czasie
+            # (np. 90-92=-2) i tak daje przynajmniej 1 minutę do statystyk.
+            is_in & (exit_t == 0),
+        ],
+        [
+            np.where(entry > 0, exit_t - entry, exit_t),
+            full,
+            np.maximum(full - entry, 1),
+        ],
+        default=curr
+    )
+    return ev_min, real
+
+
+# ==========================================
+# TRYB KOMPAKTOWY TABELI WYSTĘPÓW
+# ==========================================
+# Tabela występów (~14 tys. wierszy) jest kopiowana z cache przy każdym wywołaniu load_details
+# w każdej sesji. Powtarzalne teksty trzymamy jako kategorie, a małe liczby jako int8/int16.
+# Zawodnik_Clean zostaje tekstem - to klucz łączenia z innymi plikami (map / merge).
+COMPACT_DETAILS = True
+DETAILS_CATEGORY_COLS = ['Sezon', 'Gospodarz', 'Gość', 'Przeciwnik', 'Zawodnik', 'Status', 'Rola', 'Mecz_Label']
+DETAILS_DOWNCAST = {
+    'Minuty': 'int16', 'Wejście': 'int16', 'Zejście': 'int16', 'Minuta_Zmiany_Real': 'int16',
+    'Gole': 'int8', 'Żółte': 'int8', 'Czerwone': 'int8', 'File_Order': 'int32',
+}
+
+
+def compact_details(df):
+    """
+    Zamienia powtarzalne kolumny tekstowe na kategorie i zawęża typy liczbowe.
+    Rozmiar przed/po (w bajtach) zapisuje w df.attrs['memory_before'] / df.attrs['memory_after'].
+    """
+    before = int(df.memory_usage(deep=True).sum())
+
+    for col in DETAILS_CATEGORY_COLS:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+
+    for col, dtype in DETAILS_DOWNCAST.items():
+        if col in df.columns and len(df):
+            # Zawężamy tylko gdy wartości mieszczą się w typie (astype nie pilnuje przepełnienia)
+            lim = np.iinfo(dtype)
+            if lim.min <= df[col].min() and df[col].max() <= lim.max:
+                df[col] = df[col].astype(dtype)
+
+    df.attrs['memory_before'] = before
+    df.attrs['memory_after'] = int(df.memory_usage(deep=True).sum())
+    return df
 
 
-@st.cache_data
 def load_details(filename="wystepy.csv"):
     if not os.path.exists(filename):
         return None
-    try:
+    return _load_details(filename, pinned_version(filename))
+
+
+@st.cache_resource
+def _load_details(filename, version):
+    track_cache_entry('_load_details', (filename, version), [filename])
+    df = read_pinned(filename, version, lambda path: load_with_snapshot(path, "details", parse_details, merge_details))
+    if df is not None and 'memory_before' in df.attrs:
+        details_memory()[os.path.basename(filename)] = (df.attrs['memory_before'], df.attrs['memory_after'])
+    return df
+
+
+@st.cache_resource
+def details_memory():
+    """Plik -> (bajty przed, bajty po) trybu kompaktowego z ostatniego wczytania; raport admina nie czyta tabeli."""
+    return {}
+
+
+def read_details_csv(filename, tail=None):
+    """Czyta wystepy.csv (UTF-8, awaryjnie windows-1250). Z tail czyta tylko te bajty, z nagłówkiem pliku."""
+    for enc in ['utf-8', 'windows-1250']:
         try:
-            df = pd.read_csv(filename, sep=';', encoding='utf-8')
-        except:
-            df = pd.read_csv(filename, sep=';', encoding='windows-1250')
+            if tail is None:
+                return pd.read_csv(filename, sep=';', encoding=enc)
+            header = pd.read_csv(filename, sep=';', encoding=enc, nrows=0).columns
+            return pd.read_csv(io.BytesIO(tail), sep=';', encoding=enc, header=None, names=list(header))
+        except UnicodeDecodeError:
+            continue
+    raise ValueError(f"Nie można odczytać {filename}")
+
+
+def parse_details(filename, tail=None):
+    """
+    Parsuje wystepy.csv do pełnej, znormalizowanej ramki występów.
+    Z tail (bajty dopisane na końcu pliku) normalizuje tylko nowe wiersze - File_Order liczony od 0.
+    """
+    try:
+        df = read_details_csv(filename, tail)
 
         df['File_Order'] = df.index
 
         # --- 1. NAPRAWA DAT (CLEAN & PARSE) ---
         if 'Data' in df.columns:
-            def clean_and_parse_date(date_str):
-                s = str(date_str).strip().lower()
-                if s in ['nan', '', '-', 'null']: return pd.NaT
-                if ':' in s and len(s.split()) > 1:
-                    s = " ".join(s.split()[:-1])
-
-                months_map = {
-                    'stycznia': '01', 'lutego': '02', 'marca': '03', 'kwietnia': '04',
-                    'maja': '05', 'czerwca': '06', 'lipca': '07', 'sierpnia': '08',
-                    'września': '09', 'października': '10', 'listopada': '11', 'grudnia': '12',
-                    'styczeń': '01', 'luty': '02', 'marzec': '03', 'kwiecień': '04',
-                    'maj': '05', 'czerwiec': '06', 'lipiec': '07', 'sierpień': '08',
-                    'wrzesień': '09', 'październik': '10', 'listopad': '11', 'grudzień': '12'
-                }
-
-                for pl, digit in months_map.items():
-                    if pl in s:
-                        s = s.replace(pl, digit)
-                        break
-                s = re.sub(r'\s+', ' ', s).strip()
-                for fmt in ['%d %m %Y', '%d.%m.%Y', '%Y-%m-%d']:
-                    try:
-                        return pd.to_datetime(s, format=fmt)
-                    except:
-                        continue
-                return pd.NaT
-
-            df['Data_Sort'] = df['Data'].apply(clean_and_parse_date)
+            df['Data_Sort'] = parse_pl_dates(df['Data'])
             df['Data_Sort'] = df['Data_Sort'].fillna(pd.Timestamp('1900-01-01'))
             df = df.sort_values(['Data_Sort', 'File_Order'], ascending=[False, True])
 
         # --- 2. RESZTA LOGIKI ---
         if 'Zawodnik' in df.columns:
-            df['Zawodnik_Clean'] = df['Zawodnik'].astype(str).str.strip()
+            df['Zawodnik_Clean'] = clean_player_names(df['Zawodnik']).to_numpy()
+            df['player_id'] = player_ids(df['Zawodnik_Clean'])
 
         if 'Data' in df.columns:
             def make_label(row):
@@ -771,45 +1266,280 @@ def load_details(filename="wystepy.csv"):
                 df[col] = 0
 
         # --- LOGIKA MINUT (POPRAWIONA) ---
-        def calc_mins(row):
-            status = str(row.get('Status', '')).strip()
-            entry, exit_t, curr = row['Wejście'], row['Zejście'], row['Minuty']
-            res_s = str(row.get('Wynik', '')).lower()
+        df['Minuta_Zmiany_Real'], df['Minuty'] = calc_minutes(df)
 
-            # Dogrywka = 120 minut, zwykły = 90
-            full = 120 if ('pd.' in res_s or 'dogr.' in res_s) else 90
+        # --- 3. ID MECZU (KAŻDY MECZ = CIĄGŁY BLOK WIERSZY) ---
+        if 'Mecz_Label' in df.columns and 'Data_Sort' in df.columns:
+            df = assign_match_ids(df)
 
-            ev_min = 0
-            if status == 'Wszedł':
-                ev_min = entry
-            elif status == 'Zszedł':
-                ev_min = exit_t
-            elif status == 'Czerwona kartka' or row['Czerwone'] > 0:
-                ev_min = exit_t if exit_t > 0 else curr
+        if COMPACT_DETAILS:
+            df = compact_details(df)
+        return df
+    except Exception as e:
+        return None
 
-            real = curr
 
-            # 1. Czerwona kartka i zejście
-            if (status == 'Czerwona kartka' or row['Czerwone'] > 0) and exit_t > 0:
-                real = (exit_t - entry) if entry > 0 else exit_t
+def merge_details(old, new):
+    """Dokleja nowe wiersze występów (z parse_details(tail=...)) do ramki i przywraca kolejność Data_Sort / File_Order."""
+    offset = len(old)
+    new.index = new.index + offset
+    new['File_Order'] = new['File_Order'] + offset
+
+    # Wspólny (posortowany) słownik kategorii - inaczej concat zamieniłby kolumny z powrotem na tekst
+    for col in DETAILS_CATEGORY_COLS:
+        if col in old.columns and col in new.columns and \
+                isinstance(old[col].dtype, pd.CategoricalDtype) and isinstance(new[col].dtype, pd.CategoricalDtype):
+            cats = old[col].cat.categories.union(new[col].cat.categories)
+            old[col] = old[col].cat.set_categories(cats)
+            new[col] = new[col].cat.set_categories(cats)
+
+    df = pd.concat([old, new])
+    if 'match_id' in df.columns:
+        df = assign_match_ids(df)  # Nowy mecz może trafić na dzień, który już ma mecze
+    elif 'Data_Sort' in df.columns:
+        df = df.sort_values(['Data_Sort', 'File_Order'], ascending=[False, True])
+
+    if 'memory_before' in old.attrs:
+        df.attrs['memory_before'] = old.attrs['memory_before'] + new.attrs.get('memory_before', 0)
+        df.attrs['memory_after'] = int(df.memory_usage(deep=True).sum())
+    return df
 
-            # 2. Cały mecz
-            elif status in ['Cały mecz', 'Grał'] and entry == 0 and exit_t == 0:
-                real = full
 
-            # 3. Wejście z ławki (POPRAWKA "BYCZKA")
-            elif status == 'Wszedł' and exit_t == 0:
-                calc = full - entry
-                # Jeśli wszedł w 90 minucie (90-90=0) lub w doliczonym (np. 90-92=-2),
-                # to i tak liczymy mu przynajmniej 1 minutę do statystyk.
-                real = calc if calc > 0 else 1
+# ==========================================
+# ID MECZU I INDEKS WIERSZY MECZU
+# ==========================================
+# match_id = RRRRMMDD * 1000 + n, gdzie n to numer meczu danego dnia (wg pierwszego wiersza w pliku).
+# Dopisanie nowego meczu nie zmienia ID istniejących. Tabela występów jest posortowana tak,
+# że wiersze jednego meczu tworzą ciągły blok, a load_match_index trzyma match_id -> (start, stop).
+def assign_match_ids(df):
+    """Nadaje kolumnę match_id i sortuje: data malejąco, mecze dnia i wiersze w kolejności z pliku."""
+    first_row = df.groupby('Mecz_Label', observed=True, sort=False)['File_Order'].transform('min')
+    ds = df['Data_Sort']
+    day = (ds.dt.year * 10000 + ds.dt.month * 100 + ds.dt.day).astype('int64')
+    n = first_row.groupby(day).rank(method='dense').astype('int64') - 1
+    df['match_id'] = day * 1000 + n
 
-            return pd.Series([ev_min, real])
+    df['_first_row'] = first_row
+    df = df.sort_values(['Data_Sort', '_first_row', 'File_Order'], ascending=[False, True, True])
+    return df.drop(columns='_first_row')
 
-        df[['Minuta_Zmiany_Real', 'Minuty']] = df.apply(calc_mins, axis=1)
-        return df
-    except Exception as e:
-        return None
+
+def build_match_index(df):
+    """Słownik match_id -> (start, stop) pozycji iloc w tabeli występów (bloki są ciągłe)."""
+    if df is None or df.empty or 'match_id' not in df.columns:
+        return {}
+    ids = df['match_id'].to_numpy()
+    starts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]])
+    stops = np.r_[starts[1:], len(ids)]
+    return dict(zip(ids[starts].tolist(), zip(starts.tolist(), stops.tolist())))
+
+
+def load_match_index(filename="wystepy.csv"):
+    return _load_match_index(filename, pinned_version(filename))
+
+
+@st.cache_resource
+def _load_match_index(filename, version):
+    track_cache_entry('_load_match_index', (filename, version), [filename])
+    return build_match_index(load_details(filename))
+
+
+def get_match_rows(df, match_id, match_index):
+    """
+    Wiersze jednego meczu jako wycinek iloc (koszt = rozmiar składu). Gdy ramka nie jest
+    tą z load_details (przefiltrowana / przesortowana), wraca do zwykłego filtra po match_id.
+    """
+    span = match_index.get(match_id)
+    if span is not None and span[1] <= len(df):
+        start, stop = span
+        ids = df['match_id']
+        # Blok musi zaczynać i kończyć się tym meczem, a sąsiednie wiersze należeć do innych
+        if ids.iat[start] == match_id and ids.iat[stop - 1] == match_id and \
+                (start == 0 or ids.iat[start - 1] != match_id) and (stop == len(df) or ids.iat[stop] != match_id):
+            return df.iloc[start:stop]
+    return df[df['match_id'] == match_id]
+
+
+def get_match_rows_by_date(df, date, match_index):
+    """Wiersze wszystkich meczów rozegranych danego dnia (w kolejności z pliku)."""
+    day = date.year * 10000 + date.month * 100 + date.day
+    parts = []
+    n = 0
+    while day * 1000 + n in match_index:
+        parts.append(get_match_rows(df, day * 1000 + n, match_index))
+        n += 1
+    if not parts:
+        return df.iloc[0:0]
+    if len(parts) == 1:
+        return parts[0]  # Wewnątrz meczu wiersze są już w kolejności z pliku
+    return pd.concat(parts).sort_values('File_Order')
+
+
+# ==========================================
+# ZMIANY (PARY WCHODZĄCY - SCHODZĄCY)
+# ==========================================
+# Pary zmian liczone raz dla całej tabeli występów (na wersję pliku): wejścia i zejścia posortowane
+# po (match_id, minuta) i sparowane jednym przejściem dwóch wskaźników. Skład meczu w raporcie
+# i w kalendarzu tylko odczytuje gotowe pary swojego meczu.
+SUB_PAIR_TOLERANCE = 5  # Maks. różnica minuty wejścia i zejścia w jednej parze (nieścisłości w pliku)
+SUBSTITUTION_COLS = ['match_id', 'player_in', 'player_out', 'minute']
+
+
+def _sub_events(df, status, minute_col):
+    """Wejścia albo zejścia: match_id, minuta, nazwisko - w kolejności (mecz, minuta, wiersz w pliku)."""
+    rows = df[df['Status'] == status]
+    events = pd.DataFrame({
+        'match_id': rows['match_id'].to_numpy(),
+        'minute': rows[minute_col].to_numpy(),
+        'order': rows['File_Order'].to_numpy(),
+        'name': rows['Zawodnik_Clean'].to_numpy(),
+    })
+    return events.sort_values(['match_id', 'minute', 'order'], kind='stable')
+
+
+def build_substitutions(df):
+    """
+    Tabela zmian: match_id, player_in, player_out, minute (minuta wejścia). W meczu wcześniejsze
+    wejście łączy się z najwcześniejszym wolnym zejściem odległym o najwyżej SUB_PAIR_TOLERANCE minut;
+    zdarzenie bez takiej pary zostaje pominięte.
+    """
+    if df is None or df.empty or 'match_id' not in df.columns:
+        return pd.DataFrame(columns=SUBSTITUTION_COLS)
+    ins = _sub_events(df, 'Wszedł', 'Wejście')
+    outs = _sub_events(df, 'Zszedł', 'Zejście')
+    in_match, in_min = ins['match_id'].tolist(), ins['minute'].tolist()
+    out_match, out_min = outs['match_id'].tolist(), outs['minute'].tolist()
+
+    pair_in, pair_out = [], []
+    i = j = 0
+    while i < len(in_match) and j < len(out_match):
+        if in_match[i] != out_match[j]:
+            # Zdarzenia meczu, w którym druga strona już się skończyła - bez pary
+            if in_match[i] < out_match[j]:
+                i += 1
+            else:
+                j += 1
+        elif abs(in_min[i] - out_min[j]) <= SUB_PAIR_TOLERANCE:
+            pair_in.append(i)
+            pair_out.append(j)
+            i += 1
+            j += 1
+        elif out_min[j] < in_min[i]:
+            j += 1
+        else:
+            i += 1
+
+    return pd.DataFrame({
+        'match_id': ins['match_id'].to_numpy()[pair_in],
+        'player_in': ins['name'].to_numpy()[pair_in],
+        'player_out': outs['name'].to_numpy()[pair_out],
+        'minute': ins['minute'].to_numpy()[pair_in],
+    }, columns=SUBSTITUTION_COLS)
+
+
+def load_substitutions(filename="wystepy.csv"):
+    return _load_substitutions(filename, pinned_version(filename))
+
+
+@st.cache_resource
+def _load_substitutions(filename, version):
+    track_cache_entry('_load_substitutions', (filename, version), [filename])
+    return build_substitutions(load_details(filename))
+
+
+def substitution_maps(squad_df, filename="wystepy.csv"):
+    """Słowniki (wchodzący -> schodzący, schodzący -> wchodzący) dla meczów obecnych w squad_df."""
+    if squad_df.empty or 'match_id' not in squad_df.columns:
+        return {}, {}
+    subs = load_substitutions(filename)
+    pairs = subs[subs['match_id'].isin(squad_df['match_id'].unique())]
+    return dict(zip(pairs['player_in'], pairs['player_out'])), dict(zip(pairs['player_out'], pairs['player_in']))
+
+
+# ==========================================
+# REJESTR ZAWODNIKÓW (player_id)
+# ==========================================
+# Każdy zawodnik ma stały identyfikator player_id (int64) liczony z oczyszczonego nazwiska,
+# więc wszystkie pliki (pilkarze, wystepy, strzelcy, me, ...) dostają ten sam klucz bez
+# wspólnej tabeli. Literówki w pojedynczych plikach mapujemy w PLAYER_ALIASES na pisownię z pilkarze.csv.
+PLAYER_FILES = ['pilkarze.csv', 'wystepy.csv', 'strzelcy.csv', '25_26.csv', 'klub_100.csv', 'me.csv',
+                'obcokrajowcy.csv']
+PLAYER_ALIASES = {
+    'galgan': 'mariusz gałgan',
+    'cegielka': 'roman cegiełka',
+    'slezak': 'marcin ślęzak',
+    'soltysek': 'robert sołtysek',
+    'wszolek': 'robert wszołek',
+    'kus': 'piotr kuś',
+    'kuš': 'piotr kuś',
+    'b. wozniak': 'bartosz woźniak',
+    'gamcarczyk': 'krystian gańcarczyk',
+    'ziółkowski': 'dariusz ziółkowski',
+    'bernard ocholeche': 'bernanrd ocholeche',
+    'dimityr ilijew': 'dimityr iljew',
+}
+PLAYER_MARKERS_RE = r'Ⓜ️?|🤕|^\s*\(\d+\)\s*'
+
+
+def clean_player_names(values):
+    """Nazwisko bez znaczników (Ⓜ️, 🤕, prefiks '(12)') i z pojedynczymi spacjami."""
+    s = pd.Series(values, dtype=object).astype(str)
+    s = s.str.replace(PLAYER_MARKERS_RE, '', regex=True)
+    return s.str.replace(r'\s+', ' ', regex=True).str.strip()
+
+
+def _player_key_id(key):
+    if key in ('', '-', 'nan'):
+        return 0
+    return int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=7).digest(), 'big')
+
+
+def player_ids(values):
+    """
+    Wektor player_id dla kolumny nazwisk. Hash liczony tylko dla unikalnych wartości,
+    puste nazwisko daje 0.
+    """
+    codes, uniques = pd.factorize(pd.Series(values, dtype=object).astype(str))
+    keys = clean_player_names(uniques).str.lower()
+    keys = keys.map(lambda k: PLAYER_ALIASES.get(k, k))
+    ids = np.array([_player_key_id(k) for k in keys], dtype='int64')
+    return ids[codes] if len(ids) else np.zeros(len(codes), dtype='int64')
+
+
+def player_id(name):
+    return int(player_ids([name])[0])
+
+
+def load_player_registry():
+    """
+    Wspólny rejestr: player_id, nazwisko do wyświetlania (pierwsze wystąpienie wg kolejności
+    PLAYER_FILES), pliki, w których zawodnik występuje, i wszystkie znalezione pisownie.
+    """
+    return _load_player_registry(pinned_versions(PLAYER_FILES))
+
+
+@st.cache_resource
+def _load_player_registry(versions):
+    track_cache_entry('_load_player_registry', (versions,), PLAYER_FILES)
+    parts = []
+    for filename in PLAYER_FILES:
+        df = load_details(filename) if filename == 'wystepy.csv' else load_data(filename)
+        if df is None or 'player_id' not in df.columns:
+            continue
+        col = 'Zawodnik_Clean' if filename == 'wystepy.csv' else 'imię i nazwisko'
+        part = pd.DataFrame({'player_id': df['player_id'].to_numpy(),
+                             'name': clean_player_names(df[col]).to_numpy(), 'source': filename})
+        parts.append(part.drop_duplicates())
+    if not parts:
+        return pd.DataFrame(columns=['player_id', 'name', 'sources', 'spellings'])
+    all_names = pd.concat(parts, ignore_index=True)
+    all_names = all_names[all_names['player_id'] != 0]
+    reg = all_names.groupby('player_id', sort=False).agg(
+        name=('name', 'first'),
+        sources=('source', lambda s: sorted(set(s))),
+        spellings=('name', lambda s: sorted(set(s))),
+    )
+    return reg.reset_index()
 
 
 def get_flag_url(name):
@@ -859,51 +1589,188 @@ def prepare_flags(df, col='narodowość'):
 
     if target_col in df.columns:
         # Do tabeli głównej bierzemy URL pierwszej flagi
-        df['Flaga'] = df[target_col].apply(get_flag_url)
+        df = df.assign(Flaga=df[target_col].apply(get_flag_url))
         # Ujednolicamy nazwę kolumny
         df = df.rename(columns={target_col: 'Narodowość'})
     else:
-        df['Flaga'] = None
-        df['Narodowość'] = '-'
+        df = df.assign(Flaga=None, Narodowość='-')
+    return df
+
+
+# ==========================================
+# REJESTR SCHEMATÓW PLIKÓW CSV
+# ==========================================
+# Każdy znany plik bazy ma zadeklarowany separator, kodowanie, kolumny liczbowe
+# i "dziwactwa" nagłówka. Dzięki temu czytamy go raz, szybkim parserem C z jawnym dtype=.
+# Nazwy kolumn podajemy już znormalizowane (strip + małe litery, po zmianie nazw).
+# Pliki spoza rejestru (lub niezgodne z nim) czytamy starą ścieżką ze zgadywaniem separatora.
+SEASON_COLS = [f"{y}/{str(y + 1)[-2:]}" for y in range(1995, 2026)]
+
+CSV_SCHEMAS = {
+    'mecze.csv': {
+        'sep': ',', 'encoding': 'utf-8',
+    },
+    'pilkarze.csv': {
+        'sep': ',', 'encoding': 'utf-8',
+        'ints': ['wiek', 'suma', 'liczba'],
+    },
+    'strzelcy.csv': {
+        'sep': ',', 'encoding': 'utf-8',
+        'ints': ['gole'],
+    },
+    '25_26.csv': {
+        'sep': ',', 'encoding': 'utf-8',
+        'ints': ['numer', 'wiek', 'mecze', 'minuty', 'gole', 'asysty', 'żółte kartki', 'czerwone kartki',
+                 'kanadyjka', 'gole samobójcze', 'asysta 2. stopnia', 'sprokurowany karny', 'wywalczony karny',
+                 'karny', 'niestrzelony karny', 'główka', 'lewa', 'prawa', 'czyste konta', 'obronione karne'],
+    },
+    'trenerzy.csv': {
+        'sep': ',', 'encoding': 'utf-8',
+        'ints': ['wiek', 'suma dni', 'mecze', 'wygrane', 'remisy', 'przegrane', 'punkty'],
+        'floats': ['śr. pkt /mecz'],
+    },
+    'klub_100.csv': {
+        'sep': ',', 'encoding': 'utf-8',
+        'rename': {'20007/08': '2007/08'},  # Literówka w nagłówku pliku
+        'drop': ['lp.'],
+        'ints': ['wiek', 'suma'] + SEASON_COLS,
+    },
+    'me.csv': {
+        'sep': ',', 'encoding': 'utf-8',
+        'drop': ['lp.'],
+        'ints': ['wiek', 'mecze', 'gole'],
+    },
+    'obcokrajowcy.csv': {
+        'sep': ',', 'encoding': 'utf-8',
+        # Pierwszy wiersz to same przecinki, drugi to stary nagłówek niepasujący do danych
+        # (inna kolejność kolumn i sezonów). Właściwy nagłówek jest w trzecim wierszu.
+        'skiprows': 2,
+        'rename': {'': 'lp.'},  # Kolumna numeru bez nazwy
+        'drop': ['lp.'],
+        'ints': ['wiek', 'suma'] + SEASON_COLS,
+    },
+    'frekwencja.csv': {
+        'sep': ',', 'encoding': 'utf-8',
+    },
+    'rywale.csv': {
+        'sep': ',', 'encoding': 'utf-8',
+        'ints': ['mecze', 'wygrane', 'remisy', 'porażki', 'punkty'],
+    },
+    'transfery.csv': {
+        'sep': ',', 'encoding': 'utf-8',
+    },
+    'wyniki.csv': {
+        'sep': ',', 'encoding': 'utf-8',
+        'ints': ['częstotliwość'],
+        'floats': ['różnica'],
+    },
+}
+
+
+def read_with_schema(filename, schema, tail=None):
+    """
+    Czyta plik zgodnie z wpisem z CSV_SCHEMAS (parser C, jawne typy kolumn).
+    Kolumny całkowite: puste -> 0, tekstowe: puste -> '-', zmiennoprzecinkowe zostają z NaN.
+    Z tail (bajty dopisane na końcu pliku) czyta tylko je, z nazwami kolumn z nagłówka pliku.
+    """
+    sep, enc, skip = schema['sep'], schema['encoding'], schema.get('skiprows', 0)
+    rename = schema.get('rename', {})
+    ints, floats = set(schema.get('ints', [])), set(schema.get('floats', []))
+
+    # Nagłówek czytamy sami (jedna linia), żeby od razu nadać kolumnom znormalizowane nazwy
+    # i przypisać im typy - parser C dostaje gotowe names= i dtype=
+    with open(filename, encoding=enc) as fh:
+        for _ in range(skip): fh.readline()
+        header = next(csv.reader([fh.readline()], delimiter=sep))
+    names = [c.strip().lower() for c in header]
+    names = [rename.get(c, c) for c in names]
+    drop = set(schema.get('drop', []))
+    dtypes = {c: ('float64' if c in ints or c in floats else str) for c in names}
+
+    if tail is None:
+        df = pd.read_csv(filename, sep=sep, encoding=enc, skiprows=skip, header=0, names=names,
+                         dtype=dtypes, usecols=lambda c: c not in drop)
+    else:
+        df = pd.read_csv(io.BytesIO(tail), sep=sep, encoding=enc, header=None, names=names,
+                         dtype=dtypes, usecols=lambda c: c not in drop)
+
+    int_cols = [c for c in df.columns if c in ints]
+    text_cols = [c for c in df.columns if c not in ints and c not in floats]
+    df[int_cols] = df[int_cols].fillna(0).astype(int)
+    df[text_cols] = df[text_cols].fillna("-")
+    return df
+
+
+def read_sniffed(filename):
+    """Stara ścieżka dla plików spoza rejestru: zgadywanie separatora i kolumn liczbowych po nazwie."""
+    try:
+        df = pd.read_csv(filename, sep=None, engine='python', encoding='utf-8')
+    except:
+        df = pd.read_csv(filename, sep=None, engine='python', encoding='windows-1250')
+
+    df = df.fillna("-")
+    df.columns = [c.strip().lower() for c in df.columns]
+    df = df.loc[:, ~df.columns.duplicated()]
+
+    cols_drop = [c for c in df.columns if 'lp' in c]
+    if cols_drop: df = df.drop(columns=cols_drop)
+
+    # 1. PEŁNA LISTA KOLUMN LICZBOWYCH (DO NAPRAWY BŁĘDÓW)
+    # Dodano wszystkie kolumny statystyczne, które mogą powodować błędy
+    int_candidates = [
+        'wiek', 'suma', 'liczba', 'mecze', 'gole', 'punkty', 'minuty', 'numer',
+        'asysty', 'żółte kartki', 'czerwone kartki', 'kanadyjka',
+        'gole samobójcze', 'asysta 2. stopnia', 'sprokurowany karny', 'wywalczony karny',
+        'karny', 'niestrzelony karny', 'główka', 'lewa', 'prawa', 'czyste konta',
+        'obronione karne', 'wpuszczone gole', 'obronione rzuty karne'
+    ]
+
+    for col in df.columns:
+        # Sprawdzamy czy nazwa kolumny pasuje do listy kandydatów
+        if col in int_candidates or 'kartki' in col or 'gole' in col or 'karny' in col:
+            # Najpierw konwersja do liczb (zamienia puste i błędy na NaN)
+            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
+            # Potem rzutowanie na liczbę całkowitą (usuwa ".0")
+            df[col] = df[col].astype(int)
     return df
 
 
-@st.cache_data
 def load_data(filename):
     if not os.path.exists(filename): return None
-    try:
-        try:
-            df = pd.read_csv(filename, sep=None, engine='python', encoding='utf-8')
-        except:
-            df = pd.read_csv(filename, sep=None, engine='python', encoding='windows-1250')
-
-        df = df.fillna("-")
-        df.columns = [c.strip().lower() for c in df.columns]
-        df = df.loc[:, ~df.columns.duplicated()]
-
-        cols_drop = [c for c in df.columns if 'lp' in c]
-        if cols_drop: df = df.drop(columns=cols_drop)
-
-        # 1. PEŁNA LISTA KOLUMN LICZBOWYCH (DO NAPRAWY BŁĘDÓW)
-        # Dodano wszystkie kolumny statystyczne, które mogą powodować błędy
-        int_candidates = [
-            'wiek', 'suma', 'liczba', 'mecze', 'gole', 'punkty', 'minuty', 'numer',
-            'asysty', 'żółte kartki', 'czerwone kartki', 'kanadyjka',
-            'gole samobójcze', 'asysta 2. stopnia', 'sprokurowany karny', 'wywalczony karny',
-            'karny', 'niestrzelony karny', 'główka', 'lewa', 'prawa', 'czyste konta',
-            'obronione karne', 'wpuszczone gole', 'obronione rzuty karne'
-        ]
+    return _load_data(filename, pinned_version(filename))
+
+
+@st.cache_resource
+def _load_data(filename, version):
+    track_cache_entry('_load_data', (filename, version), [filename])
+    return read_pinned(filename, version, lambda path: load_with_snapshot(path, "data", parse_data, merge_data))
 
-        for col in df.columns:
-            # Sprawdzamy czy nazwa kolumny pasuje do listy kandydatów
-            if col in int_candidates or 'kartki' in col or 'gole' in col or 'karny' in col:
-                # Najpierw konwersja do liczb (zamienia puste i błędy na NaN)
-                df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
-                # Potem rzutowanie na liczbę całkowitą (usuwa ".0")
-                df[col] = df[col].astype(int)
+
+def parse_data(filename, tail=None):
+    """
+    Parsuje dowolny plik CSV bazy do znormalizowanej ramki (małe litery w nazwach kolumn itd.).
+    Z tail parsuje tylko dopisane bajty - możliwe wyłącznie dla plików z rejestru CSV_SCHEMAS.
+    """
+    try:
+        schema = CSV_SCHEMAS.get(os.path.basename(filename))
+        df = None
+        if schema:
+            try:
+                df = read_with_schema(filename, schema, tail)
+            except Exception:
+                df = None  # Plik zmienił format - wracamy do zgadywania
+        if df is None:
+            if tail is not None:
+                return None  # Typy kolumn zgadywane z kawałka pliku mogłyby się nie zgadzać
+            df = read_sniffed(filename)
 
         # Specyficzne dla mecze.csv
         if 'mecze.csv' in filename:
+            # Data meczu parsowana raz przy ładowaniu (moduły korzystają z gotowego 'dt')
+            col_date = next((c for c in df.columns if c in ['data meczu', 'data']), None)
+            if col_date:
+                df['dt'] = parse_pl_dates(df[col_date])
+
             col_att = next((c for c in df.columns if c in ['frekwencja', 'widzów']), None)
             if col_att:
                 if col_att != 'widzów': df.rename(columns={col_att: 'widzów'}, inplace=True)
@@ -913,18 +1780,28 @@ def load_data(filename):
 
             place_col = next((c for c in df.columns if c in ['miejsce rozgrywania', 'miejsce', 'stadion']), None)
             if place_col:
-                def is_h(val):
-                    s = str(val).lower()
-                    kw = ['bielsko', 'rychlińskiego', 'startowa', 'rekord', 'bks', 'czechowice', 'dom', 'gospodarz']
-                    return '1' if any(k in s for k in kw) else '0'
+                is_h = df[place_col].astype(str).str.lower().str.contains('|'.join(HOME_PLACE_KEYWORDS), regex=True)
+                df['dom'] = np.where(is_h, '1', '0')
 
-                df['dom'] = df[place_col].apply(is_h)
+            df = enrich_matches(df)
+
+        # Pliki z zawodnikami dostają wspólny klucz z rejestru
+        if os.path.basename(filename) in PLAYER_FILES and 'imię i nazwisko' in df.columns:
+            df['player_id'] = player_ids(df['imię i nazwisko'])
 
         return df
     except Exception as e:
         return None
 
 
+def merge_data(old, new):
+    """Dokleja nowe wiersze (z parse_data(tail=...)) na końcu ramki - kolejność jak w pliku."""
+    df = pd.concat([old, new], ignore_index=True)
+    if 'match_id' in df.columns and 'dt' in df.columns:
+        df['match_id'] = match_ids_from_dates(df['dt'])  # Numer meczu dnia liczony w całym pliku
+    return df
+
+
 def prepare_flags(df, col='narodowość'):
     target_col = col
     if target_col not in df.columns:
@@ -932,7 +1809,7 @@ def prepare_flags(df, col='narodowość'):
         if poss: target_col = poss[0]
 
     if target_col in df.columns:
-        df['flaga'] = df[target_col].apply(get_flag_url)
+        df = df.assign(flaga=df[target_col].apply(get_flag_url))
         df = df.rename(columns={target_col: 'Narodowość', 'flaga': 'Flaga'})
         cols = list(df.columns)
         if 'Narodowość' in cols and 'Flaga' in cols:
@@ -942,26 +1819,73 @@ def prepare_flags(df, col='narodowość'):
     return df
 
 
-def parse_result(val):
-    if not isinstance(val, str): return None
+# ==========================================
+# WZBOGACONA TABELA MECZÓW (mecze.csv)
+# ==========================================
+# Wynik, rezultat (W/D/L), punkty i miejsce meczu liczone raz przy ładowaniu - bilanse w modułach
+# to sumy gotowych kolumn zamiast parsowania 'wynik' w pętlach iterrows().
+HOME_PLACE_KEYWORDS = ['bielsko', 'rychlińskiego', 'startowa', 'rekord', 'bks', 'czechowice', 'dom', 'gospodarz']
+HOME_FLAG_VALUES = ['1', '1.0', 'true', 'tak', 't', 'd', 'dom', 'gospodarz', 'u siebie']
+PENALTIES_RE = r'\(?k\.?(\d+)[:\-](\d+)\)?'
+SCORE_RE = r'(\d+)[:\-](\d+)'
+OUTCOME_POINTS = {'W': 3, 'D': 1, 'L': 0}
+
 
-    clean_val = val.lower().replace(" ", "")
+def parse_results(values):
+    """
+    Parsuje kolumnę wyników: bramki (bez karnych, bez 'pd.') i osobno karne.
+    Kolumny Int64, <NA> gdy wyniku nie ma.
+    """
+    clean = pd.Series(values, dtype='string').str.lower().str.replace(' ', '', regex=False)
+    pens = clean.str.extract(PENALTIES_RE)
+    rest = clean.str.replace(PENALTIES_RE, '', regex=True)
+    rest = rest.str.replace('pd.', '', regex=False).str.replace('dogr.', '', regex=False)
+    rest = rest.str.replace(r'\(.*?\)', '', regex=True)
+    goals = rest.str.extract(SCORE_RE)
+    return pd.DataFrame({
+        'goals_for': goals[0].astype('Int64'), 'goals_against': goals[1].astype('Int64'),
+        'penalties_for': pens[0].astype('Int64'), 'penalties_against': pens[1].astype('Int64'),
+    }, index=clean.index)
+
+
+def result_outcomes(res):
+    """W/D/L dla wyników z parse_results (karne rozstrzygają), None gdy brak wyniku."""
+    t = res['penalties_for'].fillna(res['goals_for'])
+    o = res['penalties_against'].fillna(res['goals_against'])
+    conds = [(t > o).fillna(False).to_numpy(bool), (t == o).fillna(False).to_numpy(bool),
+             (t < o).fillna(False).to_numpy(bool)]
+    return np.select(conds, ['W', 'D', 'L'], default=None)
+
+
+def enrich_matches(df):
+    """Dodaje kolumny goals_for/against, penalties_for/against, outcome, points i is_home."""
+    res = parse_results(df['wynik'] if 'wynik' in df.columns else [None] * len(df))
+    for col in res.columns:
+        df[col] = res[col].array
+    df['outcome'] = result_outcomes(res)
+    if 'dt' in df.columns:
+        df['match_id'] = match_ids_from_dates(df['dt'])
+    df['points'] = df['outcome'].map(OUTCOME_POINTS).fillna(0).astype(int)
+    if 'dom' in df.columns:
+        df['is_home'] = df['dom'].astype(str).str.lower().str.strip().isin(HOME_FLAG_VALUES)
+    else:
+        df['is_home'] = False
+    return df
 
-    # 1. SZUKANIE KARNYCH (Priorytet najwyższy)
-    pen_match = re.search(r'\(?k\.?(\d+)[:\-](\d+)\)?', clean_val)
-    if pen_match:
-        return int(pen_match.group(1)), int(pen_match.group(2))
 
-    # 2. CZYSZCZENIE "pd." (Po dogrywce)
-    clean_val = clean_val.replace("pd.", "").replace("dogr.", "")
-    clean_val = re.sub(r'\(.*?\)', '', clean_val)
+def match_ids_from_dates(dt):
+    """match_id meczów z mecze.csv (jak assign_match_ids): RRRRMMDD * 1000 + numer meczu danego dnia w pliku."""
+    day = dt.dt.year * 10000 + dt.dt.month * 100 + dt.dt.day
+    return (day * 1000 + day.groupby(day).cumcount()).astype('Int64')
 
-    # 3. SZUKANIE STANDARDOWEGO WYNIKU
-    score_match = re.search(r'(\d+)[:\-](\d+)', clean_val)
-    if score_match:
-        return int(score_match.group(1)), int(score_match.group(2))
 
-    return None
+def match_balance(df):
+    """Bilans meczów z wzbogaconej tabeli: (zwycięstwa, remisy, porażki, strzelone, stracone, punkty)."""
+    counts = df['outcome'].value_counts()
+    played = df['outcome'].notna()
+    return (int(counts.get('W', 0)), int(counts.get('D', 0)), int(counts.get('L', 0)),
+            int(df.loc[played, 'goals_for'].sum()), int(df.loc[played, 'goals_against'].sum()),
+            int(df['points'].sum()))
 
 
 def render_match_report_logic(match_label, squad_df):
@@ -1003,46 +1927,27 @@ def render_match_report_logic(match_label, squad_df):
     if not target_date:
         try:
             date_part = match_label.split('|')[0].strip()
-            # Próba parsowania polskiej daty
-            months = {'stycznia': '01', 'lutego': '02', 'marca': '03', 'kwietnia': '04', 'maja': '05', 'czerwca': '06',
-                      'lipca': '07', 'sierpnia': '08', 'września': '09', 'października': '10', 'listopada': '11',
-                      'grudnia': '12'}
-            for k, v in months.items(): date_part = date_part.lower().replace(k, v)
-            target_date = pd.to_datetime(date_part, dayfirst=True).date()
+            parsed = parse_pl_dates([date_part]).iloc[0]
+            if pd.notna(parsed): target_date = parsed.date()
         except:
             pass
 
-    # Helper do parsowania dat w CSV (mecze/trenerzy)
-    def aggressive_date_parse(val):
-        if pd.isna(val) or str(val).strip() in ['', '-', 'nan']: return None
-        s = str(val).strip()
-        for fmt in ['%d.%m.%Y', '%Y-%m-%d', '%d-%m-%Y', '%Y.%m.%d']:
-            try:
-                return pd.to_datetime(s, format=fmt).date()
-            except:
-                continue
-        try:
-            return pd.to_datetime(s).date()
-        except:
-            return None
+    if target_date:
+        preload_data(HELPER_DATA['render_match_report_logic'])
 
     # ==========================
     # A. DANE Z MECZE.CSV (Strzelcy)
     # ==========================
     scorers_html = ""
-    df_matches = load_data("mecze.csv")
+    coach_name = None
+    df_matches = load_coach_matches()  # mecze.csv z przypisanym trenerem
 
     if df_matches is not None and target_date:
-        col_d = next((c for c in df_matches.columns if c in ['data meczu', 'data', 'dt_obj']), None)
-
-        if col_d:
-            # Tworzymy kolumnę z czystą datą
-            df_matches['clean_date'] = df_matches[col_d].apply(aggressive_date_parse)
-
+        if 'dt' in df_matches.columns:
             # Strategia 1: Szukamy idealnie po dacie (+/- 1 dzień tolerancji na błędy)
-            s_win = target_date - datetime.timedelta(days=1)
-            e_win = target_date + datetime.timedelta(days=1)
-            match_row = df_matches[(df_matches['clean_date'] >= s_win) & (df_matches['clean_date'] <= e_win)]
+            s_win = pd.Timestamp(target_date) - pd.Timedelta(days=1)
+            e_win = pd.Timestamp(target_date) + pd.Timedelta(days=1)
+            match_row = df_matches[(df_matches['dt'] >= s_win) & (df_matches['dt'] <= e_win)]
 
             # Strategia 2: Jeśli znaleziono więcej niż 1 mecz, filtrujemy po Rywalu
             if len(match_row) > 1 and rival_raw:
@@ -1054,60 +1959,22 @@ def render_match_report_logic(match_label, squad_df):
                     match_row = match_row[
                         match_row['rywal'].apply(lambda x: r_target in norm(x) or norm(x) in r_target)]
 
-            # Generowanie HTML strzelców
-            if not match_row.empty:
-                raw_scorers = str(match_row.iloc[0].get('strzelcy', '-'))
-                if raw_scorers not in ['-', 'nan', '', 'NaN']:
-                    scorers_list = []
-                    for part in raw_scorers.split(','):
-                        part = part.strip()
-                        if not part: continue
-
-                        style = "font-weight:bold; color: inherit;"
-                        icon = "⚽"
-
-                        # Obsługa samobójów i karnych
-                        if any(x in part.lower() for x in ['(s)', 'sam.', 's.']):
-                            style = "color: #dc3545; font-weight:bold;"
-                            icon = "🔴"
-                            part = re.sub(r'\(s\)|s\.|sam\.', '(sam.)', part, flags=re.IGNORECASE)
-                        elif any(x in part.lower() for x in ['(k)', 'k.', 'karny']):
-                            style = "color: #28a745; font-weight:bold;"
-                            icon = "🥅"
-                            part = re.sub(r'\(k\)|k\.|karny', '(k)', part, flags=re.IGNORECASE)
-
-                        scorers_list.append(f"<span style='{style}'>{icon} {part}</span>")
-
-                    if scorers_list:
-                        scorers_html = f"<div style='margin-top:10px; padding-top:10px; border-top:1px dashed #ccc; font-size:0.9em; line-height:1.6;'>{' &nbsp;•&nbsp; '.join(scorers_list)}</div>"
-
-    # ==========================
-    # B. DANE Z TRENERZY.CSV
-    # ==========================
-    coach_name = None
-    df_coaches = load_data("trenerzy.csv")
-
-    if df_coaches is not None and target_date:
-        col_start = next((c for c in df_coaches.columns if c in ['początek', 'start']), None)
-        col_end = next((c for c in df_coaches.columns if c in ['koniec', 'end']), None)
-
-        if col_start:
-            for _, c_row in df_coaches.iterrows():
-                try:
-                    s_date = aggressive_date_parse(c_row[col_start])
-                    if not s_date: continue
+            if not match_row.empty and pd.notna(match_row.iloc[0]['coach']):
+                coach_name = match_row.iloc[0]['coach']
 
-                    if col_end and pd.notna(c_row[col_end]):
-                        e_date = aggressive_date_parse(c_row[col_end])
-                        if not e_date: e_date = datetime.date.today() + datetime.timedelta(days=365)
-                    else:
-                        e_date = datetime.date.today() + datetime.timedelta(days=365)
+            # Generowanie HTML strzelców (z tabeli bramek)
+            if not match_row.empty and pd.notna(match_row.iloc[0].get('match_id')):
+                df_goals = load_goal_events()
+                events = df_goals[df_goals['match_id'] == match_row.iloc[0]['match_id']]
+                if not events.empty:
+                    scorers_html = f"<div style='margin-top:10px; padding-top:10px; border-top:1px dashed #ccc; font-size:0.9em; line-height:1.6;'>{goal_events_html(events, ' &nbsp;•&nbsp; ')}</div>"
 
-                    if s_date <= target_date <= e_date:
-                        coach_name = c_row['imię i nazwisko']
-                        break
-                except:
-                    continue
+    # ==========================
+    # B. TRENER (KADENCJE Z TRENERZY.CSV)
+    # ==========================
+    # Zwykle przychodzi razem z meczem z sekcji A; bez meczu w mecze.csv szukamy kadencji po dacie
+    if not coach_name and target_date:
+        coach_name = coach_on_date(target_date, load_coach_tenures())
 
     # ==========================
     # C. WYŚWIETLANIE NAGŁÓWKA
@@ -1147,25 +2014,7 @@ def render_match_report_logic(match_label, squad_df):
         st.warning("Brak szczegółowego składu.")
         return
 
-    map_in_to_out = {}
-    map_out_to_in = {}
-
-    sort_c = 'Wejście' if 'Wejście' in squad_df.columns else 'Minuty'
-    in_rows = squad_df[squad_df['Status'] == 'Wszedł'].sort_values(sort_c)
-    out_rows = squad_df[squad_df['Status'] == 'Zszedł'].sort_values(sort_c)
-    used_out = []
-
-    for _, row_in in in_rows.iterrows():
-        t_in = row_in.get('Wejście', 0)
-        cands = out_rows[~out_rows.index.isin(used_out)].copy()
-        cands['diff'] = (cands.get('Zejście', 999) - t_in).abs()
-        cands = cands[cands['diff'] <= 5].sort_values('diff')
-
-        if not cands.empty:
-            best = cands.iloc[0]
-            map_in_to_out[row_in['Zawodnik_Clean']] = best['Zawodnik_Clean']
-            map_out_to_in[best['Zawodnik_Clean']] = row_in['Zawodnik_Clean']
-            used_out.append(best.name)
+    map_in_to_out, map_out_to_in = substitution_maps(squad_df)
 
     def render_row(row, is_sub=False):
         c1, c2, c3 = st.columns([1, 4, 3])
@@ -1232,205 +2081,557 @@ def render_match_report_logic(match_label, squad_df):
             st.caption("💤 Ławka")
             for _, r in unused.iterrows(): st.text(f"{r['Zawodnik_Clean']}")
 
-def color_results_logic(val):
-    if not isinstance(val, str): return ''
-    res = parse_result(val)
-    style = ''
-    if res:
-        t, o = res
-        if t > o:
-            style = 'color: #28a745; font-weight: bold;'
-        elif t < o:
-            style = 'color: #dc3545; font-weight: bold;'
-        else:
-            style = 'color: #fd7e14; font-weight: bold;'
+RESULT_STYLES = {'W': 'color: #28a745; font-weight: bold;', 'L': 'color: #dc3545; font-weight: bold;',
+                 'D': 'color: #fd7e14; font-weight: bold;'}
+
 
-    if any(x in val.lower() for x in ['pd', 'k.', 'wo']):
-        style += ' font-style: italic; background-color: #f0f0f040;'
-    return style
+def color_results(col):
+    """Style całej kolumny wyników naraz (do Styler.apply): kolor wg W/D/L, kursywa dla pd./karnych/walkowerów."""
+    outcomes = pd.Series(result_outcomes(parse_results(col.to_numpy())), index=col.index)
+    style = outcomes.map(RESULT_STYLES).fillna('')
+    special = col.astype('string').str.lower().str.contains(r'pd|k\.|wo', regex=True).fillna(False).astype(bool)
+    style[special] += ' font-style: italic; background-color: #f0f0f040;'
+    is_text = col.map(lambda v: isinstance(v, str)).astype(bool)
+    return style.where(is_text, '')
 
 
-def extract_scorers_list(scorers_str):
+# ==========================================
+# TABELA BRAMEK (strzelcy z mecze.csv)
+# ==========================================
+# Kolumna 'strzelcy' jest rozbijana raz, przy ładowaniu, na tabelę zdarzeń: jeden wiersz = jeden gol.
+# Obsługiwane zapisy: "Lazar 27, 43" (kolejne minuty tego samego strzelca), "Biernat 90 (k)",
+# "Nowak 80 (s)" (samobój rywala), "Sitek 90+2", "Pajkos74", samo nazwisko bez minuty.
+SCORER_OWN_RE = re.compile(r"\(\s*s\s*\)|\(\s*sam\.?\s*\)|\bsam\.|(?<!\w)s\.", re.IGNORECASE)
+SCORER_PEN_RE = re.compile(r"\(\s*k\s*\)|\(\s*karny\s*\)|\bkarny\b|(?<!\w)k\.", re.IGNORECASE)
+SCORER_MINUTE_RE = re.compile(r"(\d{1,3})(?:\s*\+\s*(\d{1,2}))?'?")
+SCORER_NAME_RE = re.compile(r"[^\W\d_]{2,}")
+SCORER_JUNK_RE = re.compile(r"[()]|\s+")
+GOAL_EVENT_COLS = ['match_id', 'goal_no', 'scorer', 'player_id', 'minute', 'added_time', 'is_penalty',
+                   'is_own_goal']
+
+
+def tokenize_scorers(text):
     """
-    Zwraca listę słowników dla przycisków strzelców.
-    Obsługuje format: "Zawodnik 20, 40" oraz "Zawodnik 20, Inny 50".
+    Rozbija tekst strzelców na listę goli: (strzelec, minuta, doliczony czas, karny, samobój).
+    Minuty bez nazwiska (również te stojące przed nazwiskiem, np. "24 Więzik 83") należą do poprzedniego strzelca.
     """
-    if not isinstance(scorers_str, str) or pd.isna(scorers_str) or scorers_str.strip() in ['-', '']:
+    if not isinstance(text, str) or text.strip().lower() in ('', '-', 'nan'):
         return []
+    goals = []
+    last_name = ''
+    for part in text.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        is_own = bool(SCORER_OWN_RE.search(part))
+        is_pen = not is_own and bool(SCORER_PEN_RE.search(part))
+        body = SCORER_PEN_RE.sub(' ', SCORER_OWN_RE.sub(' ', part))
+
+        name_m = SCORER_NAME_RE.search(body)
+        name_start = name_m.start() if name_m else len(body)
+        name = SCORER_JUNK_RE.sub(' ', SCORER_MINUTE_RE.sub(' ', body)).strip(" .'") if name_m else ''
+
+        minutes = [(int(m.group(1)), int(m.group(2)) if m.group(2) else None, m.start() < name_start)
+                   for m in SCORER_MINUTE_RE.finditer(body)]
+        for minute, added, leading in minutes:
+            if leading and name:
+                goals.append((last_name, minute, added, False, False))
+        if name:
+            last_name = name
+            own_minutes = [(m, a) for m, a, leading in minutes if not leading] or [(None, None)]
+        else:
+            own_minutes = [(m, a) for m, a, _ in minutes]
+        for minute, added in own_minutes:
+            goals.append((last_name, minute, added, is_pen, is_own))
+    return goals
 
-    parts = scorers_str.split(',')
-    result = []
-    last_valid_name = None
 
-    for part in parts:
-        part = part.strip()
-        if not part: continue
+def build_goal_events(df_m, df_det=None, registry=None):
+    """
+    Tabela goli dla wszystkich meczów z mecze.csv. player_id wskazuje zawodnika z rejestru
+    (pełne nazwisko, albo samo nazwisko jednoznaczne w składzie meczu / w rejestrze), 0 = nieustalony lub samobój.
+    """
+    rows = []
+    if df_m is not None and 'strzelcy' in df_m.columns and 'match_id' in df_m.columns:
+        for mid, text in zip(df_m['match_id'], df_m['strzelcy']):
+            if pd.isna(mid):
+                continue
+            for n, goal in enumerate(tokenize_scorers(text)):
+                rows.append((int(mid), n) + goal)
+    ev = pd.DataFrame(rows, columns=['match_id', 'goal_no', 'scorer', 'minute', 'added_time', 'is_penalty',
+                                     'is_own_goal'])
+    ev['minute'] = ev['minute'].astype('Int64')
+    ev['added_time'] = ev['added_time'].astype('Int64')
+    ev['is_penalty'] = ev['is_penalty'].astype(bool)
+    ev['is_own_goal'] = ev['is_own_goal'].astype(bool)
+    if ev.empty:
+        ev['player_id'] = pd.Series(dtype='int64')
+        return ev[GOAL_EVENT_COLS]
+
+    # 1. Pełne nazwisko znane w rejestrze
+    ids = player_ids(ev['scorer'])
+    known = registry['player_id'].to_numpy() if registry is not None and not registry.empty else np.array([], 'int64')
+    ev['player_id'] = np.where(np.isin(ids, known), ids, 0)
+
+    # 2. Samo nazwisko (lub przydomek) - najpierw wśród grających w tym meczu (dowolny człon nazwiska),
+    #    potem nazwisko w całym rejestrze; tylko dopasowania jednoznaczne
+    keys = pd.DataFrame({'match_id': ev['match_id'], 'surname': ev['scorer'].str.lower().str.split().str[-1]})
+    if df_det is not None and 'match_id' in df_det.columns:
+        squad = pd.DataFrame({'match_id': df_det['match_id'].to_numpy(),
+                              'player_id': pd.array(df_det['player_id'].to_numpy(), dtype='Int64'),
+                              'surname': df_det['Zawodnik_Clean'].str.lower().str.split().to_numpy()})
+        squad = squad.drop_duplicates(['match_id', 'player_id']).explode('surname')
+        squad = squad.drop_duplicates().drop_duplicates(['match_id', 'surname'], keep=False)
+        hit = keys.merge(squad, on=['match_id', 'surname'], how='left')['player_id'].fillna(0).to_numpy('int64')
+        ev['player_id'] = np.where(ev['player_id'] != 0, ev['player_id'], hit)
+    if registry is not None and not registry.empty:
+        by_surname = pd.DataFrame({'surname': registry['name'].str.lower().str.split().str[-1],
+                                   'player_id': pd.array(registry['player_id'].to_numpy(), dtype='Int64')})
+        by_surname = by_surname.drop_duplicates('surname', keep=False)
+        hit = keys[['surname']].merge(by_surname, on='surname', how='left')['player_id'].fillna(0).to_numpy('int64')
+        ev['player_id'] = np.where(ev['player_id'] != 0, ev['player_id'], hit)
+    ev['player_id'] = ev['player_id'].where(~ev['is_own_goal'], 0).astype('int64')
+    return ev[GOAL_EVENT_COLS]
+
+
+GOAL_EVENT_SOURCES = ['wystepy.csv'] + PLAYER_FILES
+
+
+def load_goal_events(filename="mecze.csv"):
+    return _load_goal_events(filename, pinned_versions([filename] + GOAL_EVENT_SOURCES))
+
+
+@st.cache_resource
+def _load_goal_events(filename, versions):
+    track_cache_entry('_load_goal_events', (filename, versions), [filename] + GOAL_EVENT_SOURCES)
+    return build_goal_events(load_data(filename), load_details("wystepy.csv"), load_player_registry())
+
+
+def goal_event_label(ev):
+    """Tekst jednego gola, np. "Lazar 27'", "Sitek 90+2' (k)", "Nowak 80' (sam.)"."""
+    txt = ev['scorer']
+    if pd.notna(ev['minute']):
+        txt += f" {ev['minute']}" + (f"+{ev['added_time']}" if pd.notna(ev['added_time']) else "") + "'"
+    if ev['is_penalty']: txt += " (k)"
+    if ev['is_own_goal']: txt += " (sam.)"
+    return txt.strip()
+
+
+def goal_events_html(events, sep=" | "):
+    """HTML strzelców meczu: zielone karne, czerwone samobóje."""
+    parts = []
+    for _, ev in events.iterrows():
+        if ev['is_own_goal']:
+            style, icon = "color: #dc3545; font-weight:bold;", "🔴"
+        elif ev['is_penalty']:
+            style, icon = "color: #28a745; font-weight:bold;", "🥅"
+        else:
+            style, icon = "font-weight:bold; color: inherit;", "⚽"
+        parts.append(f"<span style='{style}'>{icon} {goal_event_label(ev)}</span>")
+    return sep.join(parts)
 
-        icon = "⚽"
-        is_own = False
 
-        # Rozpoznawanie (sam.) i (k)
-        if any(x in part.lower() for x in ['(s)', 's.', 'sam.']):
-            icon = "🔴"
-            is_own = True
-        elif any(x in part.lower() for x in ['(k)', 'k.', 'karny']):
-            icon = "⚽🥅"
+# ==========================================
+# KADENCJE TRENERÓW (PRZYPISANIE MECZÓW)
+# ==========================================
+# Trener każdego meczu z mecze.csv jest ustalany jednym złączeniem przedziałów (start <= data meczu
+# <= koniec), liczonym raz na wersję danych. Profile, porównywarka i rankingi to potem filtry / groupby
+# po coach_id. Gdy w dniu meczu trwa kilka kadencji (tymczasowy trener w trakcie kadencji, zmiana
+# w dniu meczu), mecz należy do rozpoczętej najpóźniej, a przy tym samym dniu początku - do późniejszego
+# wpisu w trenerzy.csv. Po końcu krótkiej kadencji wewnątrz dłuższej mecze wracają do tej dłuższej.
+COACH_MATCH_FILES = ['mecze.csv', 'trenerzy.csv']
+TENURE_COLS = ['tenure_id', 'coach_id', 'coach', 'start', 'end', 'tenure_no']
 
-        # Czysta nazwa do linkowania profilu
-        clean_name_candidate = re.sub(r'\(.*?\)', '', part)
-        clean_name_candidate = re.sub(r'\d+', '', clean_name_candidate)
-        clean_name_candidate = clean_name_candidate.replace("s.", "").replace("k.", "").replace("'", "").strip()
 
-        # Czy to nazwisko czy tylko minuta?
-        has_letters = bool(re.search(r'[a-zA-ZąćęłńóśźżĄĆĘŁŃÓŚŹŻ]{2,}', clean_name_candidate))
+def build_coach_tenures(df_t):
+    """
+    Kadencje z trenerzy.csv w kolejności pliku: tenure_id (numer wiersza), coach_id (hash nazwiska,
+    jak player_id), start/end (end = NaT - kadencja trwa) i tenure_no - która to kadencja trenera.
+    """
+    if df_t is None or df_t.empty or 'imię i nazwisko' not in df_t.columns:
+        return pd.DataFrame(columns=TENURE_COLS)
+    col_start = next((c for c in df_t.columns if c in ['początek', 'start']), None)
+    col_end = next((c for c in df_t.columns if c in ['koniec', 'end']), None)
+    no_dates = [None] * len(df_t)
+    ten = pd.DataFrame({
+        'tenure_id': np.arange(len(df_t)),
+        'coach_id': player_ids(df_t['imię i nazwisko']),
+        'coach': df_t['imię i nazwisko'].astype(str).str.strip().to_numpy(),
+        'start': parse_pl_dates(df_t[col_start] if col_start else no_dates).to_numpy(),
+        'end': parse_pl_dates(df_t[col_end] if col_end else no_dates).to_numpy(),
+    })
+    ten['tenure_no'] = ten.sort_values(['start', 'tenure_id']).groupby('coach_id').cumcount() + 1
+    return ten[TENURE_COLS]
+
+
+def tenure_ids_on(dates, tenures):
+    """
+    tenure_id kadencji trwającej w każdej z dat (koniec pusty = trwa do dziś), spośród kilku trwających
+    rozpoczętej najpóźniej; -1, gdy żadna. Maska data x kadencja - kadencji jest kilkadziesiąt.
+    """
+    dates = np.asarray(dates, dtype='datetime64[ns]')
+    out = np.full(len(dates), -1, dtype='int64')
+    ten = tenures.dropna(subset=['start']).sort_values(['start', 'tenure_id'])
+    if ten.empty or not len(dates):
+        return out
+    start = ten['start'].to_numpy('datetime64[ns]')
+    end = ten['end'].to_numpy('datetime64[ns]')
+    day = dates[:, None]
+    active = (start <= day) & (np.isnat(end) | (day <= end))  # Data NaT nie pasuje do żadnej kadencji
+    hit = active.any(axis=1)
+    latest = active.shape[1] - 1 - active[:, ::-1].argmax(axis=1)  # Ostatnia trwająca w kolejności startu
+    out[hit] = ten['tenure_id'].to_numpy('int64')[latest[hit]]
+    return out
+
+
+def build_coach_matches(df_m, tenures):
+    """
+    Tabela meczów (indeks jak w df_m) z kolumnami kadencji: tenure_id, coach_id, coach, tenure_no
+    i tenure_match_no (numer meczu w kadencji, od 1). Mecz bez trenera: tenure_id -1, coach_id 0.
+    """
+    if 'dt' in df_m.columns:
+        tenure_id = tenure_ids_on(df_m['dt'].astype('datetime64[ns]').to_numpy(), tenures)
+    else:
+        tenure_id = np.full(len(df_m), -1, dtype='int64')
+
+    # Int64, bo NaN dla meczów bez trenera zamieniłby 56-bitowe coach_id na float
+    info = tenures.astype({'coach_id': 'Int64', 'tenure_no': 'Int64'}).set_index('tenure_id').reindex(tenure_id)
+    out = df_m.assign(tenure_id=tenure_id,
+                      coach_id=info['coach_id'].fillna(0).to_numpy('int64'),
+                      coach=info['coach'].to_numpy(),
+                      tenure_no=info['tenure_no'].array)
+    order = out.sort_values('dt', kind='stable') if 'dt' in out.columns else out
+    match_no = order.groupby('tenure_id').cumcount() + 1
+    out['tenure_match_no'] = match_no.astype('Int64').where(out['tenure_id'] >= 0)
+    return out
+
+
+def coach_on_date(date, tenures):
+    """Trener prowadzący drużynę danego dnia (ta sama reguła co w build_coach_matches), None gdy brak."""
+    tid = tenure_ids_on([pd.Timestamp(date)], tenures)[0]
+    if tid < 0:
+        return None
+    return tenures.loc[tenures['tenure_id'] == tid, 'coach'].iloc[0]
 
-        display_text = part
-        link_name = ""
 
-        if has_letters:
-            last_valid_name = clean_name_candidate
-            link_name = clean_name_candidate
-            display_text = f"{icon} {part}"
-        else:
-            # Sytuacja: "43" po "Lazar 27"
-            if last_valid_name:
-                link_name = last_valid_name
-                # Doklejamy nazwisko do wyświetlania, np. "⚽ Lazar 43'"
-                # Czyścimy part z ewentualnych śmieci, zostawiając liczbę i flagi
-                display_text = f"{icon} {last_valid_name} {part}"
-            else:
-                display_text = f"{icon} {part}"
+def load_coach_tenures(filename="trenerzy.csv"):
+    return _load_coach_tenures(filename, pinned_version(filename))
 
-        result.append({'display': display_text, 'link_name': link_name, 'is_own': is_own})
 
-    return result
+@st.cache_resource
+def _load_coach_tenures(filename, version):
+    track_cache_entry('_load_coach_tenures', (filename, version), [filename])
+    return build_coach_tenures(load_data(filename))
 
 
-def parse_scorers(scorers_str):
-    if not isinstance(scorers_str, str) or pd.isna(scorers_str) or scorers_str == '-': return {}
-    parts = scorers_str.split(',')
-    stats = {}
-    current_scorer = None
-    for part in parts:
-        part = part.strip()
-        if not part: continue
-        is_own = bool(re.search(r'\(s\)|s\.|sam\.', part.lower()))
-        clean_check = re.sub(r'\(k\)|k\.|\(s\)|s\.|sam\.', '', part.lower())
-        has_letters = bool(re.search(r'[a-z]{2,}', clean_check))
-
-        if has_letters:
-            name = re.sub(r'\d+', '', part)
-            name = re.sub(r'\(k\)|k\.|\(s\)|s\.|sam\.', '', name, flags=re.IGNORECASE)
-            name = name.replace('(', '').replace(')', '').replace('.', '').strip()
-            if name:
-                current_scorer = name
-                target = 'Bramka samobójcza' if is_own else current_scorer
-                stats[target] = stats.get(target, 0) + 1
-        else:
-            if current_scorer:
-                target = 'Bramka samobójcza' if is_own else current_scorer
-                stats[target] = stats.get(target, 0) + 1
-    return stats
+def load_coach_matches():
+    """mecze.csv z przypisanym trenerem i kadencją (None, gdy brak pliku z meczami)."""
+    return _load_coach_matches(pinned_versions(COACH_MATCH_FILES))
+
 
+@st.cache_resource
+def _load_coach_matches(versions):
+    track_cache_entry('_load_coach_matches', (versions,), COACH_MATCH_FILES)
+    df_m = load_data("mecze.csv")
+    if df_m is None:
+        return None
+    return build_coach_matches(df_m, load_coach_tenures())
 
-def format_scorers_html(scorers_str):
-    """Formatuje tekst strzelców dodając ikony dla karnych i samobójów."""
-    if not isinstance(scorers_str, str) or pd.isna(scorers_str) or scorers_str.strip() in ['-', '']:
-        return "<span style='color: gray; font-style: italic;'>Brak bramek / Brak danych</span>"
 
-    parts = scorers_str.split(',')
-    html_parts = []
+def coach_results(coach_matches, by):
+    """Mecze i punkty policzone z wyników (tylko rozegrane mecze) w grupach kolumny by."""
+    played = coach_matches[coach_matches['outcome'].notna() & (coach_matches['tenure_id'] >= 0)]
+    return played.groupby(by).agg(mecze=('outcome', 'size'), punkty=('points', 'sum'))
 
-    for part in parts:
-        part = part.strip()
-        if not part: continue
 
-        # Logika ikon i stylów
-        icon = "⚽"  # Domyślna piłka
-        style = ""
-        suffix = ""
+# ==========================================
+# SERIE (RUN-LENGTH NA TABELI MECZÓW)
+# ==========================================
+# Serie liczone z kodowania run-length rozegranych meczów (w kolejności dat): jedna wektorowa
+# operacja na rodzaj serii zamiast pętli po wierszach. Z parametrem by każda grupa (dom/wyjazd,
+# rozgrywki, sezon, trener, rywal) ma własne serie. Wynik jest w cache na wersję danych; gdy nowa
+# wersja tylko dopisuje późniejsze wyniki, tabela jest aktualizowana przyrostowo (extend_streaks).
+# Warunkiem jest niezmieniony prefiks: te same mecze, wyniki i wartości grupy by (poprawka miejsca
+# meczu, zmiana nazwy rywala czy przepięcie trenera starego meczu liczy tabelę od nowa).
+STREAK_KINDS = {'W': ['W'], 'WD': ['W', 'D'], 'L': ['L'], 'LD': ['L', 'D']}
+STREAK_COLS = ['kind', 'longest', 'longest_start', 'longest_end', 'breaker', 'current', 'current_start']
+STREAK_ID_COLS = ['longest_start', 'longest_end', 'breaker', 'current_start']
 
-        # Samobóje (priorytet sprawdzania)
-        if any(x in part.lower() for x in ['(s)', 's.', 'sam.']):
-            icon = "🔴"
-            suffix = " (sam.)"
-            part = re.sub(r'\(s\)|s\.|sam\.', '', part, flags=re.IGNORECASE).strip()
-            style = "color: #dc3545;"  # Czerwony kolor
 
-        # Karne
-        elif any(x in part.lower() for x in ['(k)', 'k.', 'karny']):
-            icon = "⚽🥅"  # Piłka + Bramka
-            part = re.sub(r'\(k\)|k\.|karny', '', part, flags=re.IGNORECASE).strip()
-            style = "font-weight: bold; color: #28a745;"  # Zielony pogrubiony
+def streak_keys(by):
+    return [by] if isinstance(by, str) else list(by or [])
 
-        html_parts.append(f"<span style='{style}'>{icon} {part}{suffix}</span>")
 
-    return " | ".join(html_parts)
+def played_in_order(df, by=None):
+    """Rozegrane mecze z datą, posortowane (stabilnie) po grupie i dacie - kolejność, w której liczymy serie."""
+    played = df[df['outcome'].notna() & df['dt'].notna()]
+    return played.sort_values(streak_keys(by) + ['dt'], kind='stable')
 
 
-def get_minutes_map(scorers_str):
+def match_streaks(df, by=None):
+    """
+    Najdłuższa i bieżąca seria każdego rodzaju z STREAK_KINDS (osobno w grupach by).
+    Wiersz na (grupa, rodzaj): długości oraz match_id początku, końca i meczu, który przerwał
+    najdłuższą serię (<NA>, gdy trwa do dziś). Przy równej długości wygrywa seria wcześniejsza.
     """
-    Tworzy mapę: nazwisko -> sformatowany tekst minut (np. 15', 88' (k)).
-    Naprawia błąd braku przypisania kolejnych goli (np. 'Lazar 27, 43').
+    keys = streak_keys(by)
+    played = played_in_order(df, by)
+    n = len(played)
+    outcomes = played['outcome'].to_numpy(object)
+    ids = played['match_id'].to_numpy('int64')
+    group = played.groupby(keys, sort=False).ngroup().to_numpy() if keys else np.zeros(n, dtype='int64')
+    group_start = np.r_[True, group[1:] != group[:-1]] if n else np.zeros(0, dtype=bool)
+    group_end = np.r_[group_start[1:], True] if n else np.zeros(0, dtype=bool)
+    groups = played[keys].assign(group=group)[group_start].reset_index(drop=True) if n else \
+        pd.DataFrame(columns=keys + ['group'])
+
+    parts = []
+    for kind, targets in STREAK_KINDS.items():
+        hit = np.isin(outcomes, targets)
+        # Seria zaczyna się na trafieniu po chybieniu (lub na początku grupy), kończy przed chybieniem
+        starts = np.flatnonzero(hit & (group_start | ~np.r_[False, hit[:-1]]))
+        ends = np.flatnonzero(hit & (group_end | ~np.r_[hit[1:], False]))
+        runs = pd.DataFrame({'group': group[starts], 'start': starts, 'end': ends, 'length': ends - starts + 1})
+
+        longest = runs.sort_values(['group', 'length', 'start'], ascending=[True, False, True], kind='stable')
+        longest = longest.drop_duplicates('group').set_index('group')
+        current = runs[group_end[ends]].set_index('group')
+        broken = longest['end'][~group_end[longest['end']]]
+
+        part = groups.assign(kind=kind)
+        part['longest'] = part['group'].map(longest['length']).fillna(0).astype('int64')
+        part['longest_start'] = part['group'].map(pd.Series(ids[longest['start']], index=longest.index))
+        part['longest_end'] = part['group'].map(pd.Series(ids[longest['end']], index=longest.index))
+        part['breaker'] = part['group'].map(pd.Series(ids[broken.to_numpy() + 1], index=broken.index))
+        part['current'] = part['group'].map(current['length']).fillna(0).astype('int64')
+        part['current_start'] = part['group'].map(pd.Series(ids[current['start']], index=current.index))
+        parts.append(part)
+
+    table = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=keys + ['group'] + STREAK_COLS)
+    table = table.astype({c: 'Int64' for c in STREAK_ID_COLS})
+    return table[keys + STREAK_COLS].reset_index(drop=True)
+
+
+def extend_streaks(streaks, new_matches, by=None):
     """
-    if not isinstance(scorers_str, str) or pd.isna(scorers_str): return {}
+    Dopisuje do tabeli z match_streaks mecze rozegrane po wszystkich już policzonych: bieżąca seria
+    rośnie (i ewentualnie staje się najdłuższą) albo się kończy. Koszt zależy od liczby nowych meczów.
+    """
+    keys = streak_keys(by)
+    table = streaks.set_index(keys + ['kind'])
+    rows = {idx: dict(row) for idx, row in table.iterrows()}
+    for _, match in played_in_order(new_matches).iterrows():
+        group_key = tuple(match[k] for k in keys)
+        mid = int(match['match_id'])
+        for kind, targets in STREAK_KINDS.items():
+            idx = group_key + (kind,) if keys else kind
+            row = rows.setdefault(idx, {'longest': 0, 'longest_start': pd.NA, 'longest_end': pd.NA,
+                                        'breaker': pd.NA, 'current': 0, 'current_start': pd.NA})
+            if match['outcome'] in targets:
+                if row['current'] == 0:
+                    row['current_start'] = mid
+                row['current'] += 1
+                if row['current'] > row['longest']:
+                    row.update(longest=row['current'], longest_start=row['current_start'], longest_end=mid,
+                               breaker=pd.NA)
+            else:
+                if row['current'] and row['longest_start'] == row['current_start']:
+                    row['breaker'] = mid  # Przerwana właśnie seria była najdłuższa
+                row.update(current=0, current_start=pd.NA)
+    out = pd.DataFrame.from_dict(rows, orient='index')
+    out.index = pd.MultiIndex.from_tuples(out.index, names=keys + ['kind']) if keys else out.index.rename('kind')
+    out = out.reset_index().astype({'longest': 'int64', 'current': 'int64'})
+    out = out.astype({c: 'Int64' for c in STREAK_ID_COLS})
+    return out[keys + STREAK_COLS]
 
-    mapping = {}
-    parts = scorers_str.split(',')
 
-    # Zmienna do zapamiętywania ostatniego zidentyfikowanego strzelca
-    last_valid_name = None
+@st.cache_resource
+def _streak_state():
+    """Ostatnio policzone serie dla każdego by: kolejność rozegranych meczów, ich grupy i gotowa tabela."""
+    return {}
 
-    for part in parts:
-        part = part.strip()
-        if not part: continue
 
-        # Wykrywanie flag
-        is_pen = any(x in part.lower() for x in ['(k)', 'k.', 'karny'])
-        is_own = any(x in part.lower() for x in ['(s)', 's.', 'sam.'])
+def load_match_streaks(by=None):
+    """Serie z mecze.csv (bez IGNORED_SEASONS); by jak w match_streaks, np. 'is_home', 'sezon', 'coach_id', 'rywal'."""
+    return _load_match_streaks(pinned_versions(COACH_MATCH_FILES), by)
 
-        # Wyciąganie minut (wszystko co w nawiasie i jest cyfrą)
-        mins_match = re.search(r'(\d+)', part)  # Szukamy po prostu liczb
-        minutes_txt = mins_match.group(1) if mins_match else ""
 
-        # Wyciąganie nazwiska (usuwamy cyfry, flagi i nawiasy)
-        name_candidate = re.sub(r'\d+', '', part)
-        name_candidate = re.sub(r'[\(\)]', '', name_candidate)  # usuń nawiasy
-        name_candidate = re.sub(r'(k\.|s\.|sam\.|karny)', '', name_candidate, flags=re.IGNORECASE).strip()
-        name_candidate = name_candidate.replace("'", "").strip()
+@st.cache_resource
+def _load_match_streaks(versions, by):
+    track_cache_entry('_load_match_streaks', (versions, by), COACH_MATCH_FILES)
+    matches = load_coach_matches()
+    if matches is None:
+        return None
+    matches = filter_seasons(matches, 'sezon')
+    played = played_in_order(matches)
+    ids = played['match_id'].to_numpy('int64')
+    outcomes = played['outcome'].to_numpy(object)
+    groups = played[streak_keys(by)].astype(object).reset_index(drop=True)
+
+    prev = _streak_state().get(by)
+    n = len(prev['ids']) if prev else 0
+    if (prev and 0 < n <= len(ids) and (ids[:n] == prev['ids']).all() and (outcomes[:n] == prev['outcomes']).all()
+            and groups.iloc[:n].equals(prev['groups'])):
+        table = extend_streaks(prev['table'], played.iloc[n:], by)  # Dopisane tylko późniejsze wyniki
+    else:
+        table = match_streaks(matches, by)
+    _streak_state()[by] = {'ids': ids, 'outcomes': outcomes, 'groups': groups, 'table': table}
+    return table
 
-        # Sprawdzamy czy to nowe nazwisko (musi mieć min. 2 litery)
-        has_letters = bool(re.search(r'[a-zA-ZąćęłńóśźżĄĆĘŁŃÓŚŹŻ]{2,}', name_candidate))
 
-        final_key_name = None
+# ==========================================
+# KALENDARZ (INDEKS ZDARZEŃ PO DNIU ROKU)
+# ==========================================
+# Urodziny zawodników i trenerów oraz mecze z mecze.csv zbierane raz na wersję plików w słownik
+# (miesiąc, dzień) -> lista zdarzeń. Zdarzenie trzyma tylko dane niezależne od oglądanego roku;
+# wiek, ikona (archiwum / nadchodzący / dziś) i etykieta powstają przy rysowaniu dnia, więc tydzień
+# albo miesiąc kalendarza to 7-31 odczytów ze słownika.
+CALENDAR_FILES = ["pilkarze.csv", "25_26.csv", "trenerzy.csv", "mecze.csv"]
+BIRTH_DATE_COLS = ['data urodzenia', 'urodzony', 'data_ur']
+BIRTH_DATE_FIXES = {"Maciej Górski": "1990-03-01"}  # Fragment nazwiska -> poprawna data (błąd w pilkarze.csv)
+CALENDAR_DAY_NAMES = ["Pon", "Wt", "Śr", "Czw", "Pt", "Sob", "Ndz"]
+CALENDAR_MONTH_NAMES = ["Styczeń", "Luty", "Marzec", "Kwiecień", "Maj", "Czerwiec", "Lipiec", "Sierpień", "Wrzesień",
+                        "Październik", "Listopad", "Grudzień"]
+CALENDAR_TODAY_STYLE = "background-color: rgba(40, 167, 69, 0.15); font-weight: bold"  # Jak .cal-card.today
+
+# kind: 'birthday' / 'coach_birthday' / 'match'; name: osoba albo rywal; date: data urodzenia / meczu;
+# in_squad: zawodnik obecnej kadry; match: szczegóły meczu dla widoku meczu (None dla urodzin)
+CalendarEvent = namedtuple('CalendarEvent', ['kind', 'name', 'date', 'in_squad', 'match'])
+
+
+def _birth_dates(df):
+    col = next((c for c in df.columns if c in BIRTH_DATE_COLS), None)
+    if col is None:
+        return None
+    return pd.to_datetime(df[col], dayfirst=True, errors='coerce', format='mixed')
+
+
+def build_calendar_events(df_p, df_curr, df_t, df_m):
+    """Słownik (miesiąc, dzień) -> [CalendarEvent]: najpierw urodziny zawodników, potem trenerów, potem mecze."""
+    events = {}
+
+    def add(ts, event):
+        events.setdefault((ts.month, ts.day), []).append(event)
+
+    if df_p is not None and 'imię i nazwisko' in df_p.columns:
+        players = df_p.drop_duplicates(subset=['player_id'], keep='first')
+        bdates = _birth_dates(players)
+        if bdates is not None:
+            names = players['imię i nazwisko'].astype(str)
+            for part, fixed in BIRTH_DATE_FIXES.items():
+                bdates = bdates.mask(names.str.contains(part, regex=False), pd.Timestamp(fixed))
+            squad_ids = set(df_curr['player_id'].tolist()) \
+                if df_curr is not None and 'player_id' in df_curr.columns else set()
+            known = bdates.notna()
+            for name, pid, ts in zip(players['imię i nazwisko'][known], players['player_id'][known], bdates[known]):
+                add(ts, CalendarEvent('birthday', name, ts.date(), pid in squad_ids, None))
+
+    if df_t is not None and 'imię i nazwisko' in df_t.columns:
+        id_name = df_t['imię i nazwisko'].astype(str).str.lower().str.strip()
+        coaches = df_t[~id_name.duplicated(keep='first')]
+        bdates = _birth_dates(coaches)
+        if bdates is not None:
+            known = bdates.notna()
+            for name, ts in zip(coaches['imię i nazwisko'][known], bdates[known]):
+                add(ts, CalendarEvent('coach_birthday', name, ts.date(), False, None))
+
+    if df_m is not None and 'dt' in df_m.columns:
+        for row in df_m.dropna(subset=['dt']).to_dict('records'):
+            d = row['dt']
+            raw_score = str(row.get('wynik', '')).strip()
+            if raw_score.lower() == 'nan': raw_score = ''
+            rywal = row.get('rywal', 'Rywal')
+            match_details = {'Rywal': rywal, 'Data_Txt': d.strftime('%d.%m.%Y'), 'Data_Obj': d,
+                             'Wynik': raw_score, 'Strzelcy': row.get('strzelcy', '-'),
+                             'Widzów': row.get('widzów', '-'), 'Dom': '1' if row.get('is_home', False) else '0',
+                             'match_id': row.get('match_id')}
+            add(d, CalendarEvent('match', rywal, d.date(), False, match_details))
+    return events
+
+
+def calendar_day_events(events, month, day, target_year, today, show_history_matches):
+    """
+    Zdarzenia dnia widziane z roku target_year, posortowane po priorytecie: słowniki z kluczami
+    type, label, sort oraz name (urodziny) albo match_data i is_history (mecze). Bez show_history_matches
+    pomijane są mecze z innych lat; urodziny osób urodzonych po target_year zawsze.
+    """
+    day_events = []
+    for ev in events.get((month, day), ()):
+        if ev.kind == 'match':
+            is_history = ev.date.year != target_year
+            if is_history and not show_history_matches:
+                continue
+            raw_score = ev.match['Wynik']
+            if is_history:
+                score_part = f" {raw_score}" if raw_score else ""
+                label, sort_prio = f"⚫ {ev.name}{score_part} ({ev.date.year})", 5
+            elif ev.date > today and ev.date.year == today.year:
+                label, sort_prio = f"🔜 {ev.name} ", 0
+            elif ev.date == today:
+                label, sort_prio = f"🔥 {ev.name} {raw_score if raw_score else 'DZIŚ'}", 0
+            else:
+                label, sort_prio = f"⚽ {ev.name} {raw_score}", 3
+            day_events.append({'type': 'match', 'label': label, 'match_data': ev.match,
+                               'sort': sort_prio, 'is_history': is_history})
+        else:
+            age = target_year - ev.date.year
+            if age < 0:
+                continue
+            if ev.kind == 'birthday':
+                prefix, sort_prio = ("🟢🎂", 1) if ev.in_squad else ("🎂", 2)
+            else:
+                prefix, sort_prio = "👔🎂", 2
+            day_events.append({'type': ev.kind, 'label': f"{prefix} {ev.name} ({age})", 'name': ev.name,
+                               'sort': sort_prio})
+    day_events.sort(key=lambda x: x['sort'])
+    return day_events
 
-        if has_letters:
-            last_valid_name = name_candidate
-            final_key_name = name_candidate
-        elif last_valid_name:
-            # Jeśli nie ma liter, ale mamy zapamiętane nazwisko (sytuacja "Lazar 27, 43")
-            final_key_name = last_valid_name
 
-        # Jeśli nie mamy nazwiska ani teraz, ani wcześniej, pomijamy
-        if not final_key_name:
+def calendar_cell_text(day_num, day_events):
+    """
+    Skrót dnia do komórki tabeli miesiąca: numer dnia, ikony meczów z oglądanego roku i liczniki
+    pozostałych zdarzeń (🟢🎂 kadra, 🎂 urodziny, 👔 trenerzy, ⚫ archiwum) - długość nie rośnie z archiwum.
+    """
+    parts = [str(day_num)]
+    counts = {}
+    for ev in day_events:
+        if ev['type'] == 'match' and not ev['is_history']:
+            parts.append(ev['label'].split(' ', 1)[0])
             continue
+        if ev['type'] == 'match':
+            icon = "⚫"
+        elif ev['type'] == 'coach_birthday':
+            icon = "👔"
+        else:
+            icon = "🟢🎂" if ev['sort'] == 1 else "🎂"
+        counts[icon] = counts.get(icon, 0) + 1
+    parts += [f"{icon}{n}" for icon, n in counts.items()]
+    return " ".join(parts)
+
+
+def calendar_event_button(ev, key):
+    """Przycisk zdarzenia; kliknięcie otwiera profil zawodnika / trenera albo widok meczu."""
+    b_type = "secondary"
+    if ev['type'] == 'match' and not ev.get('is_history', False):
+        if "🔜" in ev['label'] or "🔥" in ev['label']: b_type = "primary"
+    if st.button(ev['label'], key=key, type=b_type, use_container_width=True):
+        if ev['type'] == 'match':
+            st.session_state['cal_selected_item'] = ev['match_data']
+            st.session_state['cal_view_mode'] = 'match'
+        else:
+            st.session_state['cal_selected_item'] = ev['name']
+            st.session_state['cal_view_mode'] = 'profile' if ev['type'] == 'birthday' else 'coach_profile'
+        st.rerun()
 
-        # Budowanie sformatowanego stringa
-        final_note = ""
-        if minutes_txt:
-            final_note = f"{minutes_txt}'"
 
-        if is_pen: final_note += " (k)"
-        if is_own: final_note += " (sam.)"
+def load_calendar_events():
+    return _load_calendar_events(pinned_versions(CALENDAR_FILES))
 
-        if final_note:
-            key = final_key_name.lower().strip()
-            if key in mapping:
-                mapping[key] += f", {final_note}"
-            else:
-                mapping[key] = final_note
 
-    return mapping
+@st.cache_resource
+def _load_calendar_events(versions):
+    track_cache_entry('_load_calendar_events', (versions,), CALENDAR_FILES)
+    return build_calendar_events(*(load_data(f) for f in CALENDAR_FILES))
 
 
 def get_age_and_birthday(birth_date_val):
@@ -1493,7 +2694,7 @@ def get_player_record_badges(player_name, df_w=None, df_p=None):
         if df_p is None: df_p = load_data("pilkarze.csv")
 
         # Filtrujemy dane gracza
-        p_data = df_w[df_w['Zawodnik_Clean'] == player_name].copy()
+        p_data = df_w[df_w['player_id'] == player_id(player_name)].copy()
         if p_data.empty: return []
 
         # Statystyki
@@ -1551,26 +2752,694 @@ def get_player_record_badges(player_name, df_w=None, df_p=None):
     return badges
 
 
+# ==========================================
+# ZALEŻNOŚCI DANYCH MODUŁÓW (LENIWE ŁADOWANIE)
+# ==========================================
+# Loadery są leniwe: plik jest parsowany dopiero przy pierwszym odczycie danej wersji. Mapy poniżej
+# deklarują, czego potrzebuje widok modułu lub helper - preload_data() wczytuje brakujące zestawy
+# równolegle na puli wątków, a kod modułu odczytuje je potem z cache tymi samymi wywołaniami co dotąd.
+# Zestawy pochodne (indeks meczów, rejestr, bramki, zmiany, zdarzenia kalendarza) same wołają loadery
+# plików; cache trzyma blokadę na każdy klucz, więc plik potrzebny kilku wątkom i tak jest parsowany raz.
+DATA_SOURCES = {
+    "mecze.csv": lambda: load_data("mecze.csv"),
+    "pilkarze.csv": lambda: load_data("pilkarze.csv"),
+    "25_26.csv": lambda: load_data("25_26.csv"),
+    "trenerzy.csv": lambda: load_data("trenerzy.csv"),
+    "strzelcy.csv": lambda: load_data("strzelcy.csv"),
+    "wystepy.csv": lambda: load_details("wystepy.csv"),
+    "indeks meczów": lambda: load_match_index("wystepy.csv"),
+    "rejestr zawodników": lambda: load_player_registry(),
+    "bramki": lambda: load_goal_events(),
+    "kadencje trenerów": lambda: load_coach_matches(),
+    "zmiany": lambda: load_substitutions(),
+    "zdarzenia kalendarza": lambda: load_calendar_events(),
+}
+
+HELPER_DATA = {
+    'render_player_profile': ["pilkarze.csv", "strzelcy.csv", "wystepy.csv"],
+    'render_coach_profile': ["trenerzy.csv", "mecze.csv", "wystepy.csv", "kadencje trenerów"],
+    'render_match_report_logic': ["mecze.csv", "trenerzy.csv", "bramki", "kadencje trenerów", "zmiany"],
+}
+
+# Dane głównego widoku modułu
+MODULE_DATA = {
+    "Kalendarz": CALENDAR_FILES + ["zdarzenia kalendarza"],
+    "Aktualny Sezon (25/26)": ["25_26.csv"],
+    "Składy Historyczne": ["wystepy.csv", "pilkarze.csv", "trenerzy.csv"],
+    "Centrum Zawodników": ["pilkarze.csv", "wystepy.csv"],
+    "Centrum Meczowe": ["mecze.csv", "wystepy.csv", "indeks meczów"] + HELPER_DATA['render_match_report_logic'],
+    "🏆 Rekordy & TOP": ["pilkarze.csv", "wystepy.csv", "mecze.csv", "rejestr zawodników"],
+    "Trenerzy": ["trenerzy.csv", "mecze.csv", "kadencje trenerów"],
+    "🕵️ Ciemne Karty Historii": ["wystepy.csv"],
+}
+
+# Widoki rysowane zamiast głównego: (moduł, klucz sesji, wartość; None = dowolna niepusta) -> dane.
+# Profile zawodnika i trenera ładują swoje dane same (HELPER_DATA), stąd puste listy.
+MODULE_VIEW_DATA = {
+    ("Kalendarz", 'cal_view_mode', 'profile'): [],
+    ("Kalendarz", 'cal_view_mode', 'coach_profile'): [],
+    ("Kalendarz", 'cal_view_mode', 'match'): ["bramki", "rejestr zawodników", "wystepy.csv", "indeks meczów", "zmiany"],
+    ("Aktualny Sezon (25/26)", 'cm_selected_player', None): [],
+    ("Składy Historyczne", 'cm_selected_player', None): [],
+    ("Centrum Zawodników", 'cm_selected_player', None): [],
+    ("Centrum Meczowe", 'cm_selected_player', None): [],
+    ("🏆 Rekordy & TOP", 'cm_selected_player', None): [],
+    ("Trenerzy", 'coach_view_mode', 'profile'): [],
+}
+DATA_PRELOAD_WORKERS = 4
+
+
+def module_data(module):
+    """Zestawy danych, które moduł narysuje w tym przebiegu (zależnie od otwartego widoku)."""
+    for (view_module, key, value), keys in MODULE_VIEW_DATA.items():
+        current = st.session_state.get(key)
+        if view_module == module and current and (value is None or current == value):
+            return keys
+    return MODULE_DATA.get(module, [])
+
+
+def preload_data(keys):
+    """Wczytuje zestawy danych równolegle. Pojedynczy zestaw zostaje leniwy - moduł wczyta go przy odczycie."""
+    keys = [k for k in dict.fromkeys(keys) if k in DATA_SOURCES]
+    if len(keys) < 2:
+        return
+    ctx = get_script_run_ctx()
+
+    def load(key):
+        # Wątek dostaje kontekst przebiegu - loadery czytają przypiętą generację z st.session_state
+        add_script_run_ctx(threading.current_thread(), ctx)
+        try:
+            DATA_SOURCES[key]()
+        except Exception:
+            pass  # Błąd zgłosi moduł przy własnym odczycie
+
+    with ThreadPoolExecutor(max_workers=min(DATA_PRELOAD_WORKERS, len(keys))) as pool:
+        list(pool.map(load, keys))
+
+
+# ==========================================
+# FRAGMENTY (CZĘŚCIOWE PRZEBIEGI)
+# ==========================================
+# Widżet wewnątrz @st.fragment przerysowuje tylko swój fragment - ładowanie i agregacje reszty strony
+# nie są powtarzane. Fragment dostaje gotowe dane jako argumenty (zapamiętane z ostatniego pełnego
+# przebiegu), a pełny st.rerun() zostaje tylko tam, gdzie wybór zmienia widok (np. otwiera profil).
+@st.fragment
+def player_link_table(data, names, key=None, **table_kwargs):
+    """Tabela z wyborem wiersza; kliknięcie otwiera profil zawodnika (names[i] - nazwisko z i-tego wiersza)."""
+    event = st.dataframe(data, on_select="rerun", selection_mode="single-row", key=key, **table_kwargs)
+    if event.selection.rows:
+        st.session_state['cm_selected_player'] = names[event.selection.rows[0]]
+        st.rerun()
+
+
+@st.fragment
+def month_calendar(events_index, target_year, today, show_history_matches):
+    """
+    Miesiąc kalendarza. Tryb tabeli rysuje cały miesiąc jako jedną tabelę (komórka = skrót dnia)
+    z wyborem komórki; przyciski powstają tylko dla zdarzeń wybranego dnia. Tryb przycisków to
+    dawna siatka z przyciskiem dla każdego zdarzenia każdego dnia.
+    """
+    c_month, c_render = st.columns([2, 2])
+    sel_month_name = c_month.selectbox("Miesiąc", CALENDAR_MONTH_NAMES, index=today.month - 1)
+    sel_month = CALENDAR_MONTH_NAMES.index(sel_month_name) + 1
+    render_mode = c_render.radio("Widok miesiąca:", ["Tabela", "Przyciski"], horizontal=True)
+    cal_data = calendar.monthcalendar(target_year, sel_month)
+
+    def day_events(day_num):
+        return calendar_day_events(events_index, sel_month, day_num, target_year, today, show_history_matches)
+
+    if render_mode == "Tabela":
+        grid = pd.DataFrame([[calendar_cell_text(d, day_events(d)) if d else "" for d in week] for week in cal_data],
+                            columns=CALENDAR_DAY_NAMES)
+        styles = pd.DataFrame("", index=grid.index, columns=grid.columns)
+        if sel_month == today.month and target_year == today.year:
+            for r, week in enumerate(cal_data):
+                if today.day in week:
+                    styles.iat[r, week.index(today.day)] = CALENDAR_TODAY_STYLE
+        event = st.dataframe(grid.style.apply(lambda _: styles, axis=None), hide_index=True,
+                             on_select="rerun", selection_mode="single-cell",
+                             key=f"cal_month_{target_year}_{sel_month}")
+        cells = event.selection.cells
+        day_num = cal_data[cells[0][0]][CALENDAR_DAY_NAMES.index(cells[0][1])] if cells else 0
+        if not day_num:
+            st.caption("Kliknij dzień w tabeli, aby zobaczyć jego zdarzenia.")
+            return
+        st.markdown(f"**{day_num:02d}.{sel_month:02d}.{target_year}**")
+        selected = day_events(day_num)
+        if not selected:
+            st.caption("Brak zdarzeń tego dnia.")
+        for idx, ev in enumerate(selected):
+            calendar_event_button(ev, f"ev_day_{target_year}_{sel_month}_{day_num}_{idx}")
+        return
+
+    cols_h = st.columns(7)
+    for i, d in enumerate(CALENDAR_DAY_NAMES): cols_h[i].markdown(f"**{d}**")
+
+    for week in cal_data:
+        cols_w = st.columns(7)
+        for i, day_num in enumerate(week):
+            with cols_w[i]:
+                if day_num != 0:
+                    is_today_cell = (
+                            day_num == today.day and sel_month == today.month and target_year == today.year)
+                    css_class = "cal-card today" if is_today_cell else "cal-card"
+                    st.markdown(f"<div class='{css_class}'><strong>{day_num}</strong></div>",
+                                unsafe_allow_html=True)
+
+                    for idx, ev in enumerate(day_events(day_num)):
+                        calendar_event_button(ev, f"ev_month_{target_year}_{sel_month}_{day_num}_{idx}_{ev['label']}")
+
+
+# ==========================================
+# ZAPIS CSV (DOPISYWANIE I ATOMOWA PODMIANA)
+# ==========================================
+# Dodanie wiersza dopisuje jedną linię na końcu pliku (koszt nie zależy od rozmiaru pliku, a przyrostowe
+# wczytywanie z load_with_snapshot przetwarza tylko ten wiersz). Edycje całego pliku idą przez plik
+# tymczasowy i os.replace, więc przerwany zapis nie zostawia połowy CSV. Jeden rekord = jedna linia
+# pliku (csv_cell), bo edytor i dziennik zmian adresują wiersze numerem linii.
+ADMIN_COLUMN_ALIASES = {'kraj': 'narodowość', 'narodowość': 'kraj', 'widzów': 'frekwencja', 'frekwencja': 'widzów'}
+
+
+def csv_dialect(filename):
+    """(separator, kodowanie, koniec linii) pliku - z rejestru CSV_SCHEMAS, a dla innych plików z pierwszej linii."""
+    with open(filename, 'rb') as f:
+        first = f.readline()
+    newline = '\r\n' if first.endswith(b'\r\n') else '\n'
+    schema = CSV_SCHEMAS.get(os.path.basename(filename))
+    if schema:
+        return schema['sep'], schema['encoding'], newline
+    try:
+        head, encoding = first.decode('utf-8'), 'utf-8'
+    except UnicodeDecodeError:
+        head, encoding = first.decode('windows-1250'), 'windows-1250'
+    sep = ';' if head.count(';') > head.count(',') else ','
+    return sep, encoding, newline
+
+
+def read_csv_header(filename, sep, encoding):
+    skip = CSV_SCHEMAS.get(os.path.basename(filename), {}).get('skiprows', 0)
+    with open(filename, encoding=encoding, newline='') as f:
+        for _ in range(skip):
+            f.readline()
+        return next(csv.reader([f.readline()], delimiter=sep), [])
+
+
+def csv_cell(val):
+    """
+    Wartość komórki do zapisu. Znaki końca linii zamieniamy na spację: edytor i dziennik adresują wiersze
+    numerem linii pliku, a komórka z nową linią dałaby rekord na kilku liniach i przesunęła kolejne.
+    """
+    return '' if val is None else re.sub(r'[\r\n]+', ' ', str(val))
+
+
+def admin_append_csv(filename, new_data_dict):
+    """
+    Dopisuje jeden wiersz w kolejności kolumn pliku (klucze bez względu na wielkość liter, aliasy z
+    ADMIN_COLUMN_ALIASES). Zwraca False, gdy wiersz ma kolumny, których w pliku nie ma.
+    """
+    sep, encoding, newline = csv_dialect(filename)
+    header = read_csv_header(filename, sep, encoding)
+    positions = {c.strip().lower(): i for i, c in enumerate(header)}
+    row = [''] * len(header)
+    for key, val in new_data_dict.items():
+        k = str(key).strip().lower()
+        pos = positions.get(k, positions.get(ADMIN_COLUMN_ALIASES.get(k)))
+        if pos is None:
+            return False
+        row[pos] = csv_cell(val)
+
+    buf = io.StringIO()
+    csv.writer(buf, delimiter=sep, lineterminator='').writerow(row)
+    with data_write_lock():
+        batch = journal_begin(filename, [{'op': 'insert', 'line': None, 'before': None, 'after': buf.getvalue()}])
+        append_csv_lines(filename, [buf.getvalue()], encoding, newline)
+        journal_commit(batch)
+    return True
+
+
+def append_csv_lines(filename, new_lines, encoding, newline):
+    """
+    Dopisuje linie na końcu pliku, w miejscu - koszt nie zależy od rozmiaru pliku. Przypięte generacje
+    czytelników znają rozmiar swojej wersji i czytają tylko tyle bajtów (read_pinned).
+    """
+    with open(filename, 'rb') as f:
+        needs_newline = False
+        if f.seek(0, os.SEEK_END) > 0:
+            f.seek(-1, os.SEEK_END)
+            needs_newline = f.read(1) != b'\n'
+    with open(filename, 'a', encoding=encoding, newline='') as f:
+        f.write((newline if needs_newline else '') + ''.join(line + newline for line in new_lines))
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def replace_file_atomic(filename, text, encoding):
+    """Podmienia zawartość pliku atomowo: plik tymczasowy w tym samym katalogu + os.replace."""
+    tmp = os.path.join(os.path.dirname(os.path.abspath(filename)), f".{os.path.basename(filename)}.{os.getpid()}.tmp")
+    try:
+        with open(tmp, 'w', encoding=encoding, newline='') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, filename)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def write_csv_lines(filename, lines, encoding, newline):
+    replace_file_atomic(filename, ''.join(line + newline for line in lines), encoding)
+
+
+def admin_write_csv(filename, df):
+    """Zapisuje całą ramkę atomowo, w formacie (separator, kodowanie, końce linii) pliku."""
+    sep, encoding, newline = csv_dialect(filename) if os.path.exists(filename) else (',', 'utf-8', '\n')
+    before = read_csv_lines(filename, encoding) if os.path.exists(filename) else []
+    after = df.to_csv(index=False, sep=sep, lineterminator=newline).split(newline)[:-1]
+    with data_write_lock():
+        batch = journal_begin(filename, [{'op': 'rewrite', 'line': None, 'before': journal_blob(before),
+                                          'after': journal_blob(after)}])
+        write_csv_lines(filename, after, encoding, newline)
+        journal_commit(batch)
+
+
+def admin_data_changed(*filenames):
+    """
+    Po każdym zapisie z panelu admina: zwalnia cache zmienionych plików i zamyka bieżącą sesję edytora
+    (nowy uploader_key, bez przypiętych wersji) - edytor przypnie się do nowej wersji pliku, a nie do
+    tej sprzed zapisu, względem której każdy kolejny zapis byłby odrzucany.
+    """
+    invalidate_files(*filenames)
+    st.session_state.pop('editor_versions', None)
+    st.session_state['uploader_key'] += 1
+
+
 def admin_save_csv(filename, new_data_dict):
     try:
-        df = pd.read_csv(filename)
-        new_row = pd.DataFrame([new_data_dict])
-        df = pd.concat([df, new_row], ignore_index=True)
-        df.to_csv(filename, index=False)
-        st.cache_data.clear()
+        if not admin_append_csv(filename, new_data_dict):
+            # Nowa kolumna - trzeba przepisać cały plik
+            sep, encoding, _ = csv_dialect(filename)
+            df = pd.read_csv(filename, sep=sep, encoding=encoding, dtype=str, keep_default_na=False)
+            df = pd.concat([df, pd.DataFrame([{k: csv_cell(v) for k, v in new_data_dict.items()}])], ignore_index=True)
+            admin_write_csv(filename, df)
+        admin_data_changed(filename)
         return True
     except Exception as e:
         st.error(f"Błąd zapisu: {e}");
         return False
 
 
+# ==========================================
+# EDYTOR DANYCH (FILTR, STRONY, ZAPIS RÓŻNICY)
+# ==========================================
+# Edytor nie wysyła do przeglądarki całego pliku (wystepy.csv to ~14 tys. wierszy): najpierw filtr
+# (sezon / mecz / zawodnik), potem strona po EDITOR_PAGE_SIZE wierszy. Przy zapisie bierzemy z widżetu
+# tylko różnicę (edited_rows / deleted_rows / added_rows) i podmieniamy wyłącznie dotknięte linie pliku.
+EDITOR_PAGE_SIZE = 200
+EDITOR_FILTER_COLS = {
+    'season': ['sezon'],
+    'match': ['data meczu', 'data'],
+    'opponent': ['rywal', 'przeciwnik'],
+    'player': ['zawodnik', 'imię i nazwisko'],
+}
+
+
+def editor_column_names(header):
+    """Unikalne nazwy kolumn dla edytora (puste i powtórzone nagłówki jak w pandas: 'Unnamed: 0', 'x.1')."""
+    names, seen = [], {}
+    for i, col in enumerate(header):
+        name = col if col else f"Unnamed: {i}"
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def read_csv_lines(filename, encoding):
+    """Linie pliku bez znaków końca linii (numer linii = pozycja na liście)."""
+    with open(filename, encoding=encoding, newline='') as f:
+        text = f.read()
+    lines = text.split('\n')
+    if text.endswith('\n'):
+        lines.pop()
+    return [line[:-1] if line.endswith('\r') else line for line in lines]
+
+
+def load_editor_table(filename, version):
+    """Tabela do edytora dla wersji `version` (= file_version); RuntimeError, gdy plik ma już inną wersję."""
+    if not os.path.exists(filename): return None
+    return _load_editor_table(filename, version)
+
+
+@st.cache_data
+def _load_editor_table(filename, version):
+    """
+    Surowa tabela do edytora: same napisy, bez konwersji typów; indeks 'linia' = numer linii w pliku.
+    Klucz cache to rzeczywista wersja pliku - sprawdzana pod blokadą zapisu, więc pod wersją nie trafi
+    do cache inna treść (wyjątek nie jest zapamiętywany).
+    """
+    with data_write_lock():
+        if file_version(filename) != version:
+            raise RuntimeError("plik zmienił się w trakcie wczytywania do edytora - spróbuj ponownie")
+        sep, encoding, _ = csv_dialect(filename)
+        lines = read_csv_lines(filename, encoding)
+    track_cache_entry('_load_editor_table', (filename, version), [filename])
+    skip = CSV_SCHEMAS.get(os.path.basename(filename), {}).get('skiprows', 0)
+    rows = list(csv.reader(lines, delimiter=sep))
+    columns = editor_column_names(rows[skip])
+    width = len(columns)
+    body = [(i, (r + [''] * width)[:width]) for i, r in enumerate(rows[skip + 1:], start=skip + 1) if r]
+    return pd.DataFrame([r for _, r in body], columns=columns, dtype=str,
+                        index=pd.Index([i for i, _ in body], name='linia'))
+
+
+def apply_csv_diff(filename, changed, deleted, added, expected_version=None):
+    """
+    Nanosi na plik różnicę z edytora: changed = {linia: {kolumna: wartość}}, deleted = numery linii,
+    added = lista wierszy (słowników). Pozostałe linie zostają bajt w bajt, plik jest podmieniany atomowo.
+    Zmiany idą najpierw do dziennika, całość pod blokadą zapisu.
+    """
+    with data_write_lock():
+        if expected_version is not None and file_version(filename) != expected_version:
+            raise RuntimeError("plik zmienił się od wczytania do edytora - wczytaj aktualną wersję (🔄) i nanieś zmiany ponownie")
+        sep, encoding, newline = csv_dialect(filename)
+        skip = CSV_SCHEMAS.get(os.path.basename(filename), {}).get('skiprows', 0)
+        lines = read_csv_lines(filename, encoding)
+        columns = editor_column_names(next(csv.reader([lines[skip]], delimiter=sep)))
+        positions = {c: i for i, c in enumerate(columns)}
+
+        def render(values):
+            buf = io.StringIO()
+            csv.writer(buf, delimiter=sep, lineterminator='').writerow(values)
+            return buf.getvalue()
+
+        def row_values(updates, values):
+            values = values + [''] * (len(columns) - len(values))
+            for col, val in updates.items():
+                if col in positions:
+                    values[positions[col]] = csv_cell(val)
+            return values
+
+        entries = []
+        for line_no, updates in sorted(changed.items()):
+            if line_no in deleted:
+                continue
+            values = next(csv.reader([lines[line_no]], delimiter=sep), [])
+            new_values = row_values(updates, values)
+            if new_values[:len(values)] != values or any(new_values[len(values):]):
+                entries.append({'op': 'update', 'line': line_no, 'before': lines[line_no], 'after': render(new_values)})
+        # Usuwamy od końca, żeby numery kolejnych wpisów się nie przesuwały
+        entries += [{'op': 'delete', 'line': i, 'before': lines[i], 'after': None} for i in sorted(deleted, reverse=True)]
+        inserts = [{'op': 'insert', 'line': None, 'before': None, 'after': render(row_values(row, []))} for row in added]
+        if not entries and not inserts:
+            return
+
+        batch = journal_begin(filename, entries + inserts)
+        if entries:
+            write_csv_lines(filename, journal_apply(lines, entries + inserts), encoding, newline)
+        else:
+            append_csv_lines(filename, [e['after'] for e in inserts], encoding, newline)
+        journal_commit(batch)
+
+
+def editor_filter_column(df, kind):
+    cols = {c.strip().lower(): c for c in df.columns}
+    return next((cols[c] for c in EDITOR_FILTER_COLS[kind] if c in cols), None)
+
+
+# ==========================================
+# DZIENNIK ZMIAN (WRITE-AHEAD, ODTWARZANIE, COFANIE)
+# ==========================================
+# Każda zmiana z panelu admina (dopisanie, edytor, szybkie dodawanie) trafia najpierw do JOURNAL_FILE,
+# dopiero potem do CSV. Wpis = jedna operacja na linii pliku (insert / update / delete, albo rewrite
+# całego pliku przy nowej kolumnie) z wartością przed i po. Wpisy jednego zapisu mają wspólny 'batch',
+# a na końcu rekord 'commit' - paczka bez commitu (przerwany zapis) jest pomijana.
+# Wpisy nakłada się po kolei, więc odwrotnością paczki są odwrócone wpisy w odwrotnej kolejności.
+# Rewrite nie trzyma w dzienniku całych plików - przed i po to identyfikatory blobów (gzip, nazwa = sha256
+# treści) w JOURNAL_DIR/bloby, więc ten sam stan pliku jest zapisany raz. Gdy dziennik przekroczy
+# JOURNAL_MAX_BYTES, compact_journal() robi kopię wszystkich CSV (JOURNAL_DIR/kopie/<ostatnia paczka>) i
+# zostawia w dzienniku JOURNAL_KEEP ostatnich paczek. Kopia + późniejsze paczki z dziennika odtwarzają plik
+# (restore_from_backup), np. nadpisany poza aplikacją. Widok panelu czyta tylko koniec dziennika.
+JOURNAL_FILE = '.dziennik_zmian.jsonl'
+JOURNAL_DIR = '.dziennik_zmian'
+JOURNAL_MAX_BYTES = 4_000_000
+JOURNAL_KEEP = 50  # Paczek zostawianych przy kompaktowaniu (tyle zmian wstecz da się cofnąć)
+JOURNAL_VIEW_BYTES = 256_000  # Koniec dziennika czytany przez widok panelu
+JOURNAL_START_TAG = 'start'  # Kopia sprzed pierwszej paczki w dzienniku
+
+
+def journal_append(records):
+    with open(JOURNAL_FILE, 'a', encoding='utf-8') as f:
+        f.write(''.join(json.dumps(r, ensure_ascii=False) + '\n' for r in records))
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def journal_blob(lines):
+    """Zapisuje (raz) linie pliku jako blob i zwraca jego identyfikator do wpisu rewrite."""
+    data = json.dumps(lines, ensure_ascii=False).encode('utf-8')
+    blob_id = hashlib.sha256(data).hexdigest()
+    path = os.path.join(JOURNAL_DIR, 'bloby', f"{blob_id}.gz")
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(gzip.compress(data))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    return blob_id
+
+
+def journal_lines(value):
+    """Linie pliku z wpisu rewrite: identyfikator blobu (albo lista linii - wpisy sprzed blobów)."""
+    if isinstance(value, list):
+        return value
+    with open(os.path.join(JOURNAL_DIR, 'bloby', f"{value}.gz"), 'rb') as f:
+        return json.loads(gzip.decompress(f.read()))
+
+
+def journal_begin(filename, entries, undo_of=None):
+    """Zapisuje wpisy paczki (przed zmianą pliku). Zwraca identyfikator paczki do journal_commit."""
+    if os.path.exists(JOURNAL_FILE) and os.path.getsize(JOURNAL_FILE) > JOURNAL_MAX_BYTES:
+        compact_journal()
+    batch = f"{time.time_ns():x}"
+    meta = {'batch': batch, 'ts': datetime.datetime.now().isoformat(timespec='seconds'),
+            'user': st.session_state.get('username', ''), 'file': os.path.basename(filename)}
+    if undo_of:
+        meta['undo_of'] = undo_of
+    journal_append([dict(meta, **e) for e in entries])
+    return batch
+
+
+def journal_commit(batch):
+    journal_append([{'batch': batch, 'op': 'commit'}])
+
+
+def journal_records(batches):
+    """Paczki z read_journal z powrotem jako rekordy dziennika (wpisy + commit)."""
+    records = []
+    for b in batches:
+        meta = {k: b[k] for k in ('batch', 'ts', 'user', 'file')}
+        if b['undo_of']:
+            meta['undo_of'] = b['undo_of']
+        records += [dict(meta, **e) for e in b['entries']] + [{'batch': b['batch'], 'op': 'commit'}]
+    return records
+
+
+def read_journal(tail_bytes=None):
+    """
+    Zatwierdzone paczki w kolejności zapisu: [{'batch', 'ts', 'user', 'file', 'undo_of', 'entries'}].
+    Z tail_bytes czyta tylko koniec pliku (do podglądu) - pierwsza paczka w oknie może być urwana, więc
+    jest pomijana.
+    """
+    if not os.path.exists(JOURNAL_FILE): return []
+    batches, committed = {}, []
+    skip_first = tail_bytes is not None and os.path.getsize(JOURNAL_FILE) > tail_bytes
+    with open(JOURNAL_FILE, 'rb') as f:
+        if skip_first:
+            f.seek(-tail_bytes, os.SEEK_END)
+            f.readline()  # Urwana linia na początku okna
+        first_batch = None
+        for line in f:
+            try:
+                rec = json.loads(line.decode('utf-8'))
+            except ValueError:
+                continue  # Urwany ostatni wpis
+            first_batch = first_batch or rec['batch']
+            if rec['op'] == 'commit':
+                if rec['batch'] in batches and not (skip_first and rec['batch'] == first_batch):
+                    committed.append(batches[rec['batch']])
+                continue
+            b = batches.setdefault(rec['batch'], {'batch': rec['batch'], 'ts': rec['ts'], 'user': rec['user'],
+                                                  'file': rec['file'], 'undo_of': rec.get('undo_of'), 'entries': []})
+            b['entries'].append({k: rec[k] for k in ('op', 'line', 'before', 'after')})
+    return committed
+
+
+def journal_apply(lines, entries, check_rewrite=True):
+    """
+    Nakłada wpisy po kolei. Każdy wpis sprawdza, czy zastaje linię w stanie 'before'. Rewrite niesie cały
+    plik, więc przy odtwarzaniu (check_rewrite=False) jego 'after' obowiązuje bez względu na 'before' -
+    np. paczka odtworzenia z kopii ma w 'before' stan spoza dziennika.
+    """
+    lines = list(lines)
+    for e in entries:
+        if e['op'] == 'rewrite':
+            if check_rewrite and lines != journal_lines(e['before']):
+                raise RuntimeError("plik różni się od stanu zapisanego w dzienniku")
+            lines = list(journal_lines(e['after']))
+            continue
+        pos = e['line']
+        if e['op'] == 'insert':
+            lines.insert(len(lines) if pos is None else pos, e['after'])
+            continue
+        pos = len(lines) - 1 if pos is None else pos
+        if not 0 <= pos < len(lines) or lines[pos] != e['before']:
+            raise RuntimeError(f"linia {pos} różni się od stanu zapisanego w dzienniku")
+        if e['op'] == 'update':
+            lines[pos] = e['after']
+        else:
+            del lines[pos]
+    return lines
+
+
+def journal_inverse(entries):
+    swap = {'insert': 'delete', 'delete': 'insert', 'update': 'update', 'rewrite': 'rewrite'}
+    return [dict(e, op=swap[e['op']], before=e['after'], after=e['before']) for e in reversed(entries)]
+
+
+def replay_journal(filename, base_lines, after_batch=None):
+    """
+    Odtwarza zmiany pliku na kopii bazowej: nakłada wszystkie zatwierdzone paczki tego pliku - łącznie
+    z cofnięciami - zapisane po paczce after_batch (None = od początku dziennika).
+    """
+    name = os.path.basename(filename)
+    batches = read_journal()
+    if after_batch is not None:
+        ids = [b['batch'] for b in batches]
+        if after_batch not in ids:
+            raise RuntimeError("paczki, od której zaczyna się kopia, nie ma już w dzienniku")
+        batches = batches[ids.index(after_batch) + 1:]
+    lines = list(base_lines)
+    for b in batches:
+        if b['file'] == name:
+            lines = journal_apply(lines, b['entries'], check_rewrite=False)
+    return lines
+
+
+def backup_data_files():
+    """
+    Kopia wszystkich CSV z chwili ostatniej zatwierdzonej paczki (pod blokadą zapisu, więc stan pasuje
+    do dziennika). Zwraca znacznik kopii: identyfikator tej paczki albo JOURNAL_START_TAG.
+    """
+    batches = read_journal()
+    tag = batches[-1]['batch'] if batches else JOURNAL_START_TAG
+    target = os.path.join(JOURNAL_DIR, 'kopie', tag)
+    if not os.path.isdir(target):
+        tmp = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+        os.makedirs(tmp, exist_ok=True)
+        for name in os.listdir('.'):
+            if name.endswith('.csv'):
+                shutil.copy2(name, os.path.join(tmp, name))
+        os.replace(tmp, target)
+    return tag
+
+
+def list_backups():
+    """Znaczniki kopii od najnowszej."""
+    root = os.path.join(JOURNAL_DIR, 'kopie')
+    if not os.path.isdir(root): return []
+    tags = [t for t in os.listdir(root) if not t.endswith('.tmp')]
+    return sorted(tags, key=lambda t: os.path.getmtime(os.path.join(root, t)), reverse=True)
+
+
+def compact_journal():
+    """
+    Kopia CSV + dziennik skrócony do JOURNAL_KEEP ostatnich paczek. Usuwa kopie, których paczki nie ma
+    już w dzienniku (nie da się ich odtworzyć), i bloby nieużywane przez pozostałe wpisy.
+    Wołane pod blokadą zapisu.
+    """
+    tag = backup_data_files()
+    kept = read_journal()[-JOURNAL_KEEP:]
+    tmp = f"{JOURNAL_FILE}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(''.join(json.dumps(r, ensure_ascii=False) + '\n' for r in journal_records(kept)))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, JOURNAL_FILE)
+
+    kept_ids = {b['batch'] for b in kept}
+    for old in list_backups():
+        if old != tag and old not in kept_ids:
+            shutil.rmtree(os.path.join(JOURNAL_DIR, 'kopie', old), ignore_errors=True)
+    used = {e[k] for b in kept for e in b['entries'] if e['op'] == 'rewrite' for k in ('before', 'after')
+            if isinstance(e[k], str)}
+    blob_dir = os.path.join(JOURNAL_DIR, 'bloby')
+    for name in os.listdir(blob_dir) if os.path.isdir(blob_dir) else []:
+        if name.split('.')[0] not in used:
+            os.remove(os.path.join(blob_dir, name))
+
+
+def restore_from_backup(tag, filename):
+    """
+    Odtwarza plik z kopii `tag` i zapisanych po niej paczek dziennika (np. po nadpisaniu pliku poza
+    aplikacją). Samo odtworzenie też jest paczką, więc da się je cofnąć. False, gdy plik już jest w tym stanie.
+    """
+    base_path = os.path.join(JOURNAL_DIR, 'kopie', tag, os.path.basename(filename))
+    with data_write_lock():
+        sep, encoding, newline = csv_dialect(base_path)
+        base = read_csv_lines(base_path, encoding)
+        lines = replay_journal(filename, base, after_batch=None if tag == JOURNAL_START_TAG else tag)
+        current = read_csv_lines(filename, encoding) if os.path.exists(filename) else []
+        if lines == current:
+            return False
+        batch = journal_begin(filename, [{'op': 'rewrite', 'line': None, 'before': journal_blob(current),
+                                          'after': journal_blob(lines)}])
+        write_csv_lines(filename, lines, encoding, newline)
+        journal_commit(batch)
+    return True
+
+
+def undo_last_changes(n):
+    """Cofa n ostatnich (jeszcze niecofniętych) zmian. Cofnięcie też jest paczką w dzienniku. Zwraca pliki."""
+    with data_write_lock():
+        batches = read_journal()
+        undone = {b['undo_of'] for b in batches if b['undo_of']}
+        todo = [b for b in reversed(batches) if not b['undo_of'] and b['batch'] not in undone][:n]
+        touched = []
+        for b in todo:
+            sep, encoding, newline = csv_dialect(b['file'])
+            entries = journal_inverse(b['entries'])
+            lines = journal_apply(read_csv_lines(b['file'], encoding), entries)
+            batch = journal_begin(b['file'], entries, undo_of=b['batch'])
+            write_csv_lines(b['file'], lines, encoding, newline)
+            journal_commit(batch)
+            touched.append(b['file'])
+        return touched
+
+
+def journal_summary(b):
+    ops = [e['op'] for e in b['entries']]
+    if 'rewrite' in ops:
+        return "przebudowa pliku"
+    return f"+{ops.count('insert')} ~{ops.count('update')} -{ops.count('delete')}"
+
+
 def get_match_icon(val):
     if pd.isna(val): return "🚌"
     s = str(val).lower().strip()
-    if s in ['1', 'true', 'tak', 'dom', 'gospodarz', 'd', 'u siebie']: return "🏠"
+    if s in HOME_FLAG_VALUES: return "🏠"
     return "🚌"
 
 
+# Jedna generacja danych na cały przebieg - równoległy zapis admina nie rozspójni odczytów
+with startup_step("przypięcie generacji danych"):
+    pin_data_generation()
+
 # --- MENU ---
 st.sidebar.header("Nawigacja")
 
@@ -1590,60 +3459,114 @@ if st.session_state.get('username') != 'guest':
     menu_options.append("🕵️ Ciemne Karty Historii")
 
 opcja = st.sidebar.radio("Moduł:", menu_options)
+with startup_step("wczytanie danych modułu"):
+    preload_data(module_data(opcja))
+watch_data_versions()
 
 st.sidebar.divider()
 
 # --- PANEL ADMINA (Djero) ---
 if st.session_state.get('username') == 'Djero':
     st.sidebar.markdown("### 🛠️ Panel Admina (Djero)")
+
+    # Ile pamięci oszczędza tryb kompaktowy tabeli występów - z ostatniego wczytania, bez wczytywania jej
+    # tutaj (nie jest to dana otwartego widoku, więc nie trafia do data_files_read)
+    if "wystepy.csv" in details_memory():
+        mem_b, mem_a = details_memory()["wystepy.csv"]
+        st.sidebar.caption(f"🗜️ Występy w pamięci: {mem_a / 1e6:.1f} MB zamiast {mem_b / 1e6:.1f} MB "
+                           f"(-{(1 - mem_a / mem_b) * 100:.0f}%)")
+
+    with st.sidebar.expander("⏱️ CZAS STARTU"):
+        st.caption("Sekundy na krok: pierwszy przebieg w tym procesie (zimny start) i ostatni przebieg. "
+                   "Dane modułu zależą od otwartego modułu i stanu cache.")
+        st.dataframe(pd.DataFrame([{'Krok': name, 'Zimny start': t['first'], 'Ostatnio': t['last']}
+                                   for name, t in STARTUP_TIMES.items()]),
+                     hide_index=True, use_container_width=True,
+                     column_config={"Zimny start": st.column_config.NumberColumn(format="%.3f"),
+                                    "Ostatnio": st.column_config.NumberColumn(format="%.3f")})
     all_files = [f for f in os.listdir('.') if f.endswith('.csv')]
 
     with st.sidebar.expander("📝 EDYTOR DANYCH"):
-        st.info("💡 Kliknij w pusty wiersz na dole tabeli, aby dodać nowy rekord.")
+        st.info("💡 Zawęź dane filtrem - edytor wczytuje tylko pasujące wiersze, stronami. "
+                "Kliknij w pusty wiersz na dole tabeli, aby dodać nowy rekord.")
         selected_file = st.selectbox("Wybierz plik do edycji:", all_files)
 
         if selected_file:
             try:
-                try:
-                    df_editor = pd.read_csv(selected_file, encoding='utf-8')
-                except:
-                    df_editor = pd.read_csv(selected_file, encoding='windows-1250')
-
-                # --- AUTO-NAPRAWA DLA MECZE.CSV ---
-                is_changed = False
-                if selected_file == "mecze.csv":
-                    for col in df_editor.columns:
-                        if col.lower().strip() == 'frekwencja':
-                            df_editor.rename(columns={col: 'Widzów'}, inplace=True)
-                            is_changed = True
-                            break
-
-                    synonyms_dom = ['dom', 'gospodarz', 'u siebie', 'gdzie']
-                    cols_lower = [c.lower().strip() for c in df_editor.columns]
-                    if not any(x in cols_lower for x in synonyms_dom):
-                        df_editor['Dom'] = "-"
-                        is_changed = True
-
-                edited_df = st.data_editor(
-                    df_editor,
-                    num_rows="dynamic",
-                    key=f"editor_{selected_file}_{st.session_state['uploader_key']}",
-                    height=400
-                )
-
-                save_label = "💾 Zapisz zmiany"
-                if is_changed: save_label += " (Auto-korekta kolumn)"
-
-                if st.button(save_label, use_container_width=True):
-                    try:
-                        edited_df.to_csv(selected_file, index=False)
-                        st.success(f"✅ Zapisano {selected_file}!")
-                        st.cache_data.clear()
-                        st.session_state['uploader_key'] += 1
-                        time.sleep(1)
+                # Wersja pliku z chwili otwarcia edytora - zapis na nowszym pliku byłby nadpisaniem cudzych zmian
+                ed_versions = st.session_state.setdefault('editor_versions', {})
+                ed_session = (selected_file, st.session_state['uploader_key'])
+                cur_version = file_version(selected_file)
+                ed_version = ed_versions.setdefault(ed_session, cur_version)
+                if ed_version != cur_version:
+                    # Plik zmienił się poza tą sesją edytora (inna sesja, zapis spoza aplikacji) - każdy zapis
+                    # byłby odrzucony, więc zamiast tabeli jawne wczytanie aktualnej wersji
+                    st.warning("⚠️ Plik zmienił się od otwarcia edytora. Wczytaj aktualną wersję - "
+                               "niezapisane zmiany z tego widoku trzeba będzie nanieść ponownie.")
+                    if st.button("🔄 Wczytaj aktualną wersję", use_container_width=True):
+                        admin_data_changed()
                         st.rerun()
-                    except Exception as e:
-                        st.error(f"Błąd zapisu: {e}")
+                else:
+                    df_full = load_editor_table(selected_file, ed_version)
+
+                    mask = pd.Series(True, index=df_full.index)
+                    ed_filters = []
+                    season_col = editor_filter_column(df_full, 'season')
+                    if season_col:
+                        seasons = sorted(df_full[season_col].unique(), reverse=True)
+                        ed_season = st.selectbox("Sezon:", ["Wszystkie"] + seasons, key=f"ed_season_{selected_file}")
+                        if ed_season != "Wszystkie":
+                            mask &= df_full[season_col] == ed_season
+                        ed_filters.append(ed_season)
+                    match_col = editor_filter_column(df_full, 'match')
+                    if match_col:
+                        opp_col = editor_filter_column(df_full, 'opponent')
+                        match_labels = df_full[match_col] + " - " + df_full[opp_col] if opp_col else df_full[match_col]
+                        match_opts = list(dict.fromkeys(match_labels[mask]))
+                        ed_match = st.selectbox("Mecz:", ["Wszystkie"] + match_opts, key=f"ed_match_{selected_file}")
+                        if ed_match != "Wszystkie":
+                            mask &= match_labels == ed_match
+                        ed_filters.append(ed_match)
+                    player_col = editor_filter_column(df_full, 'player')
+                    if player_col:
+                        ed_player = st.text_input("Zawodnik (fragment nazwiska):", key=f"ed_player_{selected_file}")
+                        if ed_player:
+                            mask &= df_full[player_col].str.contains(ed_player, case=False, regex=False)
+                        ed_filters.append(ed_player)
+
+                    df_sel = df_full[mask]
+                    n_pages = max(1, -(-len(df_sel) // EDITOR_PAGE_SIZE))
+                    page = 1
+                    if n_pages > 1:
+                        page = st.number_input(f"Strona (z {n_pages}):", min_value=1, max_value=n_pages, value=1,
+                                               key=f"ed_page_{selected_file}")
+                    df_page = df_sel.iloc[(page - 1) * EDITOR_PAGE_SIZE: page * EDITOR_PAGE_SIZE]
+                    st.caption(f"Wiersze: {len(df_page)} z {len(df_sel)} pasujących ({len(df_full)} w pliku)")
+
+                    # Klucz zależy od filtra i strony - różnica z widżetu odnosi się do pozycji na tej stronie
+                    filter_tag = hashlib.md5(repr((ed_filters, page)).encode('utf-8')).hexdigest()[:8]
+                    editor_key = f"editor_{selected_file}_{st.session_state['uploader_key']}_{filter_tag}"
+                    st.data_editor(df_page, num_rows="dynamic", key=editor_key, height=400)
+
+                    if st.button("💾 Zapisz zmiany", use_container_width=True):
+                        try:
+                            delta = st.session_state.get(editor_key, {})
+                            page_lines = df_page.index
+                            changed = {int(page_lines[int(i)]): upd for i, upd in delta.get('edited_rows', {}).items()}
+                            deleted = {int(page_lines[int(i)]) for i in delta.get('deleted_rows', [])}
+                            added = [row for row in delta.get('added_rows', []) if row]
+                            if changed or deleted or added:
+                                apply_csv_diff(selected_file, changed, deleted, added, expected_version=ed_version)
+                                admin_data_changed(selected_file)
+                                st.success(f"✅ Zapisano {selected_file}: zmienione {len(changed)}, "
+                                           f"usunięte {len(deleted)}, dodane {len(added)}")
+                            else:
+                                st.info("Brak zmian do zapisania.")
+                                admin_data_changed()
+                            time.sleep(1)
+                            st.rerun()
+                        except Exception as e:
+                            st.error(f"Błąd zapisu: {e}")
 
             except Exception as e:
                 st.error(f"Błąd pliku: {e}")
@@ -1658,7 +3581,7 @@ if st.session_state.get('username') == 'Djero':
                 a_data = st.date_input("Data urodzenia", min_value=datetime.date(1970, 1, 1))
                 if st.form_submit_button("Zapisz Piłkarza"):
                     if a_imie and os.path.exists("pilkarze.csv"):
-                        admin_save_csv("pilkarze.csv", {"imię i nazwisko": a_imie, "kraj": a_kraj, "pozycja": a_poz,
+                        admin_save_csv("pilkarze.csv", {"imię i nazwisko": a_imie, "narodowość": a_kraj, "pozycja": a_poz,
                                                         "data urodzenia": str(a_data), "SUMA": 0})
                         st.success(f"Dodano: {a_imie}");
                         time.sleep(1);
@@ -1670,14 +3593,64 @@ if st.session_state.get('username') == 'Djero':
                 a_wynik = st.text_input("Wynik (np. 2:1)")
                 a_data_m = st.date_input("Data meczu")
                 a_dom = st.selectbox("Gdzie?", ["Dom", "Wyjazd"])
-                dom_val = "1" if a_dom == "Dom" else "0"
+                # Dom / wyjazd load_data wylicza z miejsca rozgrywania (HOME_PLACE_KEYWORDS)
+                place_val = "Bielsko-Biała" if a_dom == "Dom" else "-"
                 if st.form_submit_button("Zapisz Mecz"):
                     if os.path.exists("mecze.csv"):
                         admin_save_csv("mecze.csv", {"sezon": a_sezon, "rywal": a_rywal, "wynik": a_wynik,
-                                                     "data meczu": str(a_data_m), "Dom": dom_val, "Widzów": 0})
+                                                     "data meczu": str(a_data_m), "miejsce rozgrywania": place_val,
+                                                     "frekwencja": 0})
                         st.success("Dodano mecz!");
                         time.sleep(1);
                         st.rerun()
+    with st.sidebar.expander("🕘 DZIENNIK ZMIAN"):
+        journal = read_journal(tail_bytes=JOURNAL_VIEW_BYTES)
+        undone = {b['undo_of'] for b in journal if b['undo_of']}
+        if not journal:
+            st.caption("Brak zapisanych zmian.")
+        else:
+            st.dataframe(pd.DataFrame([{
+                'Czas': b['ts'].replace('T', ' '), 'Kto': b['user'], 'Plik': b['file'],
+                'Zmiana': ("↩️ cofnięcie" if b['undo_of'] else journal_summary(b)) + (" (cofnięta)" if b['batch'] in undone else "")
+            } for b in reversed(journal[-20:])]), hide_index=True, use_container_width=True)
+            n_undo = st.number_input("Cofnij ostatnie zmiany (ile):", min_value=1, max_value=20, value=1)
+            if st.button("↩️ Cofnij", use_container_width=True):
+                try:
+                    touched = undo_last_changes(int(n_undo))
+                    if touched:
+                        admin_data_changed(*touched)
+                        st.success(f"Cofnięto zmian: {len(touched)}")
+                        time.sleep(1)
+                        st.rerun()
+                    else:
+                        st.info("Nie ma nic do cofnięcia.")
+                except Exception as e:
+                    st.error(f"Nie udało się cofnąć: {e}")
+
+        st.markdown("**Kopie zapasowe**")
+        st.caption("Kopia wszystkich plików powstaje też sama przy kompaktowaniu dziennika. Odtworzenie = kopia "
+                   "+ późniejsze zmiany z dziennika (np. gdy plik nadpisano poza aplikacją).")
+        if st.button("💾 Utwórz kopię teraz", use_container_width=True):
+            with data_write_lock():
+                backup_data_files()
+            st.rerun()
+        backups = list_backups()
+        if backups:
+            bk_tag = st.selectbox("Kopia:", backups, format_func=lambda t: datetime.datetime.fromtimestamp(
+                os.path.getmtime(os.path.join(JOURNAL_DIR, 'kopie', t))).strftime('%Y-%m-%d %H:%M:%S'))
+            bk_files = sorted(os.listdir(os.path.join(JOURNAL_DIR, 'kopie', bk_tag)))
+            bk_file = st.selectbox("Plik do odtworzenia:", bk_files)
+            if st.button("♻️ Odtwórz z kopii i dziennika", use_container_width=True):
+                try:
+                    if restore_from_backup(bk_tag, bk_file):
+                        admin_data_changed(bk_file)
+                        st.success(f"Odtworzono {bk_file}")
+                        time.sleep(1)
+                        st.rerun()
+                    else:
+                        st.info("Plik jest już w stanie z kopii i dziennika.")
+                except Exception as e:
+                    st.error(f"Nie udało się odtworzyć: {e}")
     st.sidebar.divider()
     # [NOWOŚĆ] SYMULACJA DATY
     with st.sidebar.expander("🕒 SYMULACJA CZASU"):
@@ -1739,17 +3712,21 @@ elif opcja == "Kalendarz":
         scorers_str = m_data.get('Strzelcy', '-')
         if scorers_str and scorers_str != '-' and str(scorers_str).lower() != 'nan':
             st.markdown("### 🥅 Strzelcy")
-            scorers_list = extract_scorers_list(scorers_str)
-            if scorers_list:
+            df_goals = load_goal_events()
+            events = df_goals[df_goals['match_id'] == m_data.get('match_id')]
+            if not events.empty:
+                reg_names = load_player_registry().set_index('player_id')['name']
                 cols_sc = st.columns(4)
-                for idx, item in enumerate(scorers_list):
-                    col_idx = idx % 4
-                    with cols_sc[col_idx]:
-                        if item['is_own']:
-                            st.error(item['display'])
+                for idx, (_, ev) in enumerate(events.iterrows()):
+                    icon = "🔴" if ev['is_own_goal'] else ("⚽🥅" if ev['is_penalty'] else "⚽")
+                    display = f"{icon} {goal_event_label(ev)}"
+                    link_name = reg_names.get(ev['player_id'], ev['scorer'])
+                    with cols_sc[idx % 4]:
+                        if ev['is_own_goal']:
+                            st.error(display)
                         else:
-                            if st.button(item['display'], key=f"cal_match_sc_{idx}_{item['link_name']}"):
-                                st.session_state['cal_selected_item'] = item['link_name']
+                            if st.button(display, key=f"cal_match_sc_{idx}_{link_name}"):
+                                st.session_state['cal_selected_item'] = link_name
                                 st.session_state['cal_view_mode'] = 'profile'
                                 st.rerun()
             else:
@@ -1766,30 +3743,13 @@ elif opcja == "Kalendarz":
 
             if 'Data_Sort' in df_det.columns:
                 # Filtrujemy po dacie (ignorujemy godzinę)
-                squad = df_det[df_det['Data_Sort'].dt.date == match_date].copy()
+                squad = get_match_rows_by_date(df_det, match_date, load_match_index("wystepy.csv")).copy()
 
                 if not squad.empty:
-                    found_squad = True
-                    squad = squad.sort_values('File_Order')  # Zachowaj kolejność z pliku
-
-                    # --- LOGIKA ZMIAN (Kopiuj-Wklej z Centrum Meczowego) ---
-                    map_in_to_out = {}
-                    map_out_to_in = {}
-                    in_rows = squad[squad['Status'] == 'Wszedł'].sort_values('Minuta_Zmiany_Real')
-                    out_rows = squad[squad['Status'].isin(['Zszedł'])].sort_values('Minuta_Zmiany_Real')
-                    used_out = []
-
-                    for _, ri in in_rows.iterrows():
-                        m = ri['Minuta_Zmiany_Real']
-                        cands = out_rows[~out_rows.index.isin(used_out)].copy()
-                        cands['d'] = (cands['Minuta_Zmiany_Real'] - m).abs()
-                        cands = cands[cands['d'] <= 3].sort_values('d')
-                        if not cands.empty:
-                            best = cands.iloc[0]
-                            map_in_to_out[ri['Zawodnik_Clean']] = best['Zawodnik_Clean']
-                            map_out_to_in[best['Zawodnik_Clean']] = ri['Zawodnik_Clean']
-                            used_out.append(best.name)
+                    found_squad = True  # Wiersze są w kolejności z pliku
 
+                    # --- ZMIANY (gotowe pary, te same co w Centrum Meczowym) ---
+                    map_in_to_out, map_out_to_in = substitution_maps(squad)
 
                     # --- FUNKCJA RENDERUJĄCA ---
                     def render_cal_row(row, is_bench=False):
@@ -1897,24 +3857,17 @@ elif opcja == "Kalendarz":
             with c_mode2:
                 st.write("")
 
-        # Ładowanie danych
-        df_m = load_data("mecze.csv")
-        df_p = load_data("pilkarze.csv")
-        df_curr = load_data("25_26.csv")
-        df_t = load_data("trenerzy.csv")
+        # Zdarzenia wszystkich dni (cache na wersję plików) - widok odczytuje tylko pokazywane dni
+        events_index = load_calendar_events()
 
         # --- ALERT DNIA MECZOWEGO ---
         match_today_alert = None
-        if df_m is not None:
-            col_date_m = next((c for c in df_m.columns if 'data' in c and 'sort' not in c), None)
-            if col_date_m:
-                df_m['dt_obj'] = pd.to_datetime(df_m[col_date_m], dayfirst=True, errors='coerce')
-                matches_today = df_m[df_m['dt_obj'].dt.date == today]
-                if not matches_today.empty:
-                    row_t = matches_today.iloc[0]
-                    rival = row_t.get('rywal', 'Rywal')
-                    place = "🏠 u siebie" if str(row_t.get('dom', '0')) in ['1', 'True', 'dom'] else "🚌 wyjazd"
-                    match_today_alert = f"{rival} ({place})"
+        matches_today = [ev for ev in events_index.get((today.month, today.day), ())
+                         if ev.kind == 'match' and ev.date == today]
+        if matches_today:
+            m_today = matches_today[0].match
+            place = "🏠 u siebie" if m_today['Dom'] == '1' else "🚌 wyjazd"
+            match_today_alert = f"{m_today['Rywal']} ({place})"
 
         if match_today_alert:
             st.markdown(f"""
@@ -1925,202 +3878,33 @@ elif opcja == "Kalendarz":
             </div>
             """, unsafe_allow_html=True)
 
-        # --- BUDOWANIE MAPY ZDARZEŃ ---
-        events_map = {}
-
-        # A. Urodziny Piłkarzy
-        if df_p is not None:
-            df_p['id_name'] = df_p['imię i nazwisko'].astype(str).str.lower().str.strip()
-            df_unique = df_p.drop_duplicates(subset=['id_name'], keep='first')
-            col_b = next((c for c in df_unique.columns if c in ['data urodzenia', 'urodzony', 'data_ur']), None)
-            current_squad_names = [str(x).lower().strip() for x in
-                                   df_curr['imię i nazwisko'].unique()] if df_curr is not None else []
-
-            if col_b:
-                for _, row in df_unique.iterrows():
-                    try:
-                        name = row['imię i nazwisko']
-                        # Fix dla Macieja Górskiego
-                        if "Maciej Górski" in str(name):
-                            bdate = pd.to_datetime("1990-03-01")
-                        else:
-                            bdate = pd.to_datetime(row[col_b], dayfirst=True, errors='coerce')
-
-                        if pd.isna(bdate): continue
-                        key = (bdate.month, bdate.day)
-                        is_curr = row['id_name'] in current_squad_names
-                        prefix = "🟢🎂" if is_curr else "🎂"
-                        age = target_year - bdate.year
-                        if age >= 0:
-                            events_map.setdefault(key, []).append(
-                                {'type': 'birthday', 'label': f"{prefix} {name} ({age})", 'name': name,
-                                 'sort': 1 if is_curr else 2})
-                    except:
-                        pass
-
-        # B. Urodziny Trenerów
-        if df_t is not None:
-            df_t['id_name'] = df_t['imię i nazwisko'].astype(str).str.lower().str.strip()
-            df_t_unique = df_t.drop_duplicates(subset=['id_name'], keep='first')
-            col_bt = next((c for c in df_t_unique.columns if c in ['data urodzenia', 'urodzony', 'data_ur']), None)
-            if col_bt:
-                for _, row in df_t_unique.iterrows():
-                    try:
-                        bdate = pd.to_datetime(row[col_bt], dayfirst=True, errors='coerce')
-                        if pd.isna(bdate): continue
-                        key = (bdate.month, bdate.day)
-                        name = row.get('imię i nazwisko', 'Trener')
-                        age = target_year - bdate.year
-                        if age >= 0:
-                            events_map.setdefault(key, []).append(
-                                {'type': 'coach_birthday', 'label': f"👔🎂 {name} ({age})", 'name': name, 'sort': 2})
-                    except:
-                        pass
-
-        # C. Mecze
-        if df_m is not None and 'dt_obj' in df_m.columns:
-            for _, row in df_m.dropna(subset=['dt_obj']).iterrows():
-                d = row['dt_obj']
-                d_date = d.date()
-                key = (d.month, d.day)
-
-                should_add = False
-                is_history_event = False
-
-                if show_history_matches:
-                    if d.year == target_year:
-                        should_add = True;
-                        is_history_event = False
-                    else:
-                        should_add = True;
-                        is_history_event = True
-                else:
-                    if d.year == target_year: should_add = True; is_history_event = False
-
-                if should_add:
-                    raw_score = str(row.get('wynik', '')).strip()
-                    if raw_score.lower() == 'nan': raw_score = ''
-                    rywal = row.get('rywal', 'Rywal')
-
-                    if is_history_event:
-                        icon = "⚫"
-                        sort_prio = 5
-                        score_part = f" {raw_score}" if raw_score else ""
-                        label_str = f"{icon} {rywal}{score_part} ({d.year})"
-                    else:
-                        if d_date > today and d.year == today.year:
-                            icon = "🔜";
-                            info = "";
-                            sort_prio = 0
-                        elif d_date == today:
-                            icon = "🔥";
-                            info = raw_score if raw_score else "DZIŚ";
-                            sort_prio = 0
-                        else:
-                            icon = "⚽";
-                            info = raw_score;
-                            sort_prio = 3
-                        label_str = f"{icon} {rywal} {info}"
-
-                    match_details = {'Rywal': rywal, 'Data_Txt': d.strftime('%d.%m.%Y'), 'Data_Obj': d,
-                                     'Wynik': f"{raw_score}", 'Strzelcy': row.get('strzelcy', '-'),
-                                     'Widzów': row.get('widzów', '-'), 'Dom': row.get('dom', '0')}
-
-                    events_map.setdefault(key, []).append({
-                        'type': 'match', 'label': label_str, 'match_data': match_details,
-                        'sort': sort_prio, 'is_history': is_history_event
-                    })
-
         # --- WIDOK 1: TYGODNIOWY ---
         st.subheader(f"Ten tydzień ({today.strftime('%B')})")
         start_of_week = today - datetime.timedelta(days=today.weekday())
         cols = st.columns(7)
-        days_pl = ["Pon", "Wt", "Śr", "Czw", "Pt", "Sob", "Ndz"]
 
         for i, col in enumerate(cols):
             curr_day = start_of_week + datetime.timedelta(days=i)
             is_today = (curr_day == today)
-            lookup_key = (curr_day.month, curr_day.day)
-            day_events = events_map.get(lookup_key, [])
-            day_events.sort(key=lambda x: (x.get('sort', 5)))
+            day_events = calendar_day_events(events_index, curr_day.month, curr_day.day, target_year, today,
+                                             show_history_matches)
 
             with col:
                 css_class = "cal-card today" if is_today else "cal-card"
                 st.markdown(
-                    f"<div class='{css_class}'><small>{days_pl[i]}</small><br><strong>{curr_day.strftime('%d.%m')}</strong></div>",
+                    f"<div class='{css_class}'><small>{CALENDAR_DAY_NAMES[i]}</small><br><strong>{curr_day.strftime('%d.%m')}</strong></div>",
                     unsafe_allow_html=True)
                 if not day_events: st.markdown(
                     "<div style='text-align: center; opacity: 0.3; font-size: 10px;'>Brak</div>",
                     unsafe_allow_html=True)
 
                 for idx, ev in enumerate(day_events):
-                    btn_key = f"ev_w_{i}_{idx}_{ev['label']}"
-                    if ev['type'] == 'birthday':
-                        if st.button(ev['label'], key=btn_key, use_container_width=True):
-                            st.session_state['cal_selected_item'] = ev['name']
-                            st.session_state['cal_view_mode'] = 'profile'
-                            st.rerun()
-                    elif ev['type'] == 'coach_birthday':
-                        if st.button(ev['label'], key=btn_key, use_container_width=True):
-                            st.session_state['cal_selected_item'] = ev['name']
-                            st.session_state['cal_view_mode'] = 'coach_profile'
-                            st.rerun()
-                    elif ev['type'] == 'match':
-                        b_type = "secondary"
-                        if not ev.get('is_history', False):
-                            if "🔜" in ev['label'] or "🔥" in ev['label']: b_type = "primary"
-                        if st.button(ev['label'], key=btn_key, type=b_type, use_container_width=True):
-                            st.session_state['cal_selected_item'] = ev['match_data']
-                            st.session_state['cal_view_mode'] = 'match'
-                            st.rerun()
+                    calendar_event_button(ev, f"ev_w_{i}_{idx}_{ev['label']}")
         st.divider()
 
-        # --- WIDOK 2: MIESIĘCZNY ---
+        # --- WIDOK 2: MIESIĘCZNY (fragment - zmiana miesiąca / dnia nie przelicza reszty strony) ---
         with st.expander(f"📅 Pełny Kalendarz - {target_year} (Widok Miesięczny)", expanded=False):
-            c_m2 = st.container()
-            pl_months = ["Styczeń", "Luty", "Marzec", "Kwiecień", "Maj", "Czerwiec", "Lipiec", "Sierpień", "Wrzesień",
-                         "Październik", "Listopad", "Grudzień"]
-            sel_month_name = c_m2.selectbox("Miesiąc", pl_months, index=today.month - 1)
-            sel_month = pl_months.index(sel_month_name) + 1
-
-            cols_h = st.columns(7)
-            for i, d in enumerate(days_pl): cols_h[i].markdown(f"**{d}**")
-
-            cal_data = calendar.monthcalendar(target_year, sel_month)
-            for week in cal_data:
-                cols_w = st.columns(7)
-                for i, day_num in enumerate(week):
-                    with cols_w[i]:
-                        if day_num != 0:
-                            is_today_cell = (
-                                    day_num == today.day and sel_month == today.month and target_year == today.year)
-                            css_class = "cal-card today" if is_today_cell else "cal-card"
-                            st.markdown(f"<div class='{css_class}'><strong>{day_num}</strong></div>",
-                                        unsafe_allow_html=True)
-
-                            valid_events = events_map.get((sel_month, day_num), [])
-                            valid_events.sort(key=lambda x: (x.get('sort', 5)))
-
-                            for idx, ev in enumerate(valid_events):
-                                btn_key = f"ev_month_{target_year}_{sel_month}_{day_num}_{idx}_{ev['label']}"
-                                if ev['type'] == 'match':
-                                    b_type = "secondary"
-                                    if not ev.get('is_history', False):
-                                        if "🔜" in ev['label'] or "🔥" in ev['label']: b_type = "primary"
-                                    if st.button(ev['label'], key=btn_key, type=b_type, use_container_width=True):
-                                        st.session_state['cal_selected_item'] = ev['match_data']
-                                        st.session_state['cal_view_mode'] = 'match'
-                                        st.rerun()
-                                elif ev['type'] == 'birthday':
-                                    if st.button(ev['label'], key=btn_key, use_container_width=True):
-                                        st.session_state['cal_selected_item'] = ev['name']
-                                        st.session_state['cal_view_mode'] = 'profile'
-                                        st.rerun()
-                                elif ev['type'] == 'coach_birthday':
-                                    if st.button(ev['label'], key=btn_key, use_container_width=True):
-                                        st.session_state['cal_selected_item'] = ev['name']
-                                        st.session_state['cal_view_mode'] = 'coach_profile'
-                                        st.rerun()
+            month_calendar(events_index, target_year, today, show_history_matches)
 
     st.caption("Legenda: 🔥 Dzień Meczowy | 🔜 Nadchodzące | 🟢 Kadra | ⚫ Archiwum (inne lata)")
 
@@ -2139,7 +3923,8 @@ elif opcja == "Aktualny Sezon (25/26)":
     else:
         df = load_data("25_26.csv")
         if df is not None:
-            # Przygotowanie danych
+            # Przygotowanie danych (na własnej kopii - ramka z load_data jest współdzielona)
+            df = df.copy()
             if 'status' in df.columns:
                 df['is_youth'] = df['status'].astype(str).str.contains(r'\(M\)', case=False, regex=True)
                 df.loc[df['is_youth'], 'imię i nazwisko'] = "Ⓜ️ " + df.loc[df['is_youth'], 'imię i nazwisko']
@@ -2206,21 +3991,14 @@ elif opcja == "Aktualny Sezon (25/26)":
                     axis=0
                 )
 
-                event = st.dataframe(
-                    styled_df,
+                clean_names = [str(raw_name).replace("Ⓜ️ ", "").strip() for raw_name in data_frame['imię i nazwisko']]
+                player_link_table(
+                    styled_df, clean_names,
+                    key=f"tab_kadra_{key_suffix}",
                     use_container_width=True,
                     hide_index=True,
-                    column_config=col_config,
-                    on_select="rerun",
-                    selection_mode="single-row",
-                    key=f"tab_kadra_{key_suffix}"
+                    column_config=col_config
                 )
-                if event.selection.rows:
-                    idx = event.selection.rows[0]
-                    raw_name = data_frame.iloc[idx]['imię i nazwisko']
-                    clean_name = str(raw_name).replace("Ⓜ️ ", "").strip()
-                    st.session_state['cm_selected_player'] = clean_name
-                    st.rerun()
 
 
             # RENDEROWANIE
@@ -2301,7 +4079,7 @@ elif opcja == "Składy Historyczne":
                 return ", ".join(ranges)
 
 
-            tenure_map = df_det[['Zawodnik_Clean', 'Sezon']].drop_duplicates().groupby('Zawodnik_Clean')['Sezon'].apply(
+            tenure_map = df_det[['player_id', 'Sezon']].drop_duplicates().groupby('player_id')['Sezon'].apply(
                 format_tenure_smart_func).to_dict()
 
             # Dane z występów (wszyscy, nawet 0 minut, ale obecni w protokole)
@@ -2333,8 +4111,9 @@ elif opcja == "Składy Historyczne":
                 pass
 
             # --- AGREGACJA DANYCH ---
-            agg = season_data.groupby('Zawodnik_Clean').agg({
-                'Minuty': 'sum', 'Mecz_Label': 'nunique', 'Gole': 'sum', 'Żółte': 'sum', 'Czerwone': 'sum'
+            agg = season_data.groupby('player_id').agg({
+                'Zawodnik_Clean': 'first', 'Minuty': 'sum', 'Mecz_Label': 'nunique', 'Gole': 'sum', 'Żółte': 'sum',
+                'Czerwone': 'sum'
             }).reset_index()
 
 
@@ -2352,19 +4131,18 @@ elif opcja == "Składy Historyczne":
 
             if col_sezon_bio:
                 # Tworzymy kolumny znormalizowane do porównania
-                df_bio['season_norm'] = df_bio[col_sezon_bio].apply(norm_season_id)
+                df_bio = df_bio.assign(season_norm=df_bio[col_sezon_bio].apply(norm_season_id))
                 target_season_norm = norm_season_id(sel_season)
 
                 # Filtrujemy po znormalizowanym sezonie
-                csv_squad = df_bio[df_bio['season_norm'] == target_season_norm]['imię i nazwisko'].unique()
-                current_agg_names = set(agg['Zawodnik_Clean'].unique())
+                csv_squad = df_bio[df_bio['season_norm'] == target_season_norm].drop_duplicates('player_id')
+                current_agg_ids = set(agg['player_id'].tolist())
 
                 extras = []
-                for name in csv_squad:
-                    clean_n = str(name).strip()
-                    if clean_n not in current_agg_names:
+                for pid, name in zip(csv_squad['player_id'], csv_squad['imię i nazwisko']):
+                    if pid not in current_agg_ids:
                         extras.append({
-                            'Zawodnik_Clean': clean_n,
+                            'player_id': pid, 'Zawodnik_Clean': str(name).strip(),
                             'Minuty': 0, 'Mecz_Label': 0, 'Gole': 0, 'Żółte': 0, 'Czerwone': 0
                         })
 
@@ -2391,18 +4169,17 @@ elif opcja == "Składy Historyczne":
                 return cs
 
 
-            clean_sheets_map = season_data.groupby('Zawodnik_Clean').apply(count_clean_sheets_season)
-            agg['Czyste_Konta'] = agg['Zawodnik_Clean'].map(clean_sheets_map).fillna(0).astype(int)
+            clean_sheets_map = season_data.groupby('player_id').apply(count_clean_sheets_season)
+            agg['Czyste_Konta'] = agg['player_id'].map(clean_sheets_map).fillna(0).astype(int)
             agg.rename(columns={'Mecz_Label': 'Mecze'}, inplace=True)
             agg['Gole'] = pd.to_numeric(agg['Gole'], errors='coerce').fillna(0).astype(int)
 
             # Łączenie z profilem (pilkarze.csv)
-            df_bio_unique = df_bio.drop_duplicates(subset=['imię i nazwisko']).copy()
-            df_bio_unique['join_key'] = df_bio_unique['imię i nazwisko'].astype(str).str.strip()
+            df_bio_unique = df_bio.drop_duplicates(subset=['player_id']).copy()
             df_bio_unique = prepare_flags(df_bio_unique)
 
-            merged = pd.merge(agg, df_bio_unique, left_on='Zawodnik_Clean', right_on='join_key', how='left')
-            merged['Lata_Gry'] = merged['Zawodnik_Clean'].map(tenure_map).fillna("-")
+            merged = pd.merge(agg, df_bio_unique, on='player_id', how='left')
+            merged['Lata_Gry'] = merged['player_id'].map(tenure_map).fillna("-")
 
             # Młodzieżowiec
             try:
@@ -2521,19 +4298,13 @@ elif opcja == "Składy Historyczne":
                         styled_pos = final_df.style.highlight_max(subset=['Minuty', 'Gole', 'Mecze'], color='#28a74530',
                                                                   axis=0)
 
-                    event_pos = st.dataframe(
+                    player_link_table(
                         styled_pos,
+                        [str(raw).replace("Ⓜ️ ", "").strip() for raw in final_df['Zawodnik_Display']],
+                        key=f"hist_table_{sel_season}_{group_key}",
                         use_container_width=True, hide_index=True,
-                        column_config=col_cfg,
-                        on_select="rerun", selection_mode="single-row",
-                        key=f"hist_table_{sel_season}_{group_key}"
+                        column_config=col_cfg
                     )
-
-                    if event_pos.selection.rows:
-                        idx = event_pos.selection.rows[0]
-                        raw = final_df.iloc[idx]['Zawodnik_Display']
-                        st.session_state['cm_selected_player'] = str(raw).replace("Ⓜ️ ", "").strip()
-                        st.rerun()
                     st.write("")
 
 elif opcja == "Centrum Zawodników":
@@ -2730,8 +4501,9 @@ elif opcja == "Centrum Zawodników":
             # --- SEKCJA 3: TABELA ---
             st.subheader(f"Lista wyników ({len(df_filtered)})")
 
-            event = st.dataframe(
+            player_link_table(
                 df_filtered[['Flaga', 'Zawodnik', 'Narodowość', 'Pozycja', 'Wiek', 'Mecze', 'Gole']],
+                df_filtered['Zawodnik'].tolist(),
                 use_container_width=True,
                 hide_index=True,
                 column_config={
@@ -2742,17 +4514,9 @@ elif opcja == "Centrum Zawodników":
                                                              max_value=int(df_display['Mecze'].max())),
                     "Gole": st.column_config.NumberColumn("Gole", format="%d ⚽")
                 },
-                on_select="rerun",
-                selection_mode="single-row",
                 height=600
             )
 
-            if event.selection.rows:
-                idx = event.selection.rows[0]
-                sel_player = df_filtered.iloc[idx]['Zawodnik']
-                st.session_state['cm_selected_player'] = sel_player
-                st.rerun()
-
         else:
             st.warning("Brak danych do wyświetlenia.")
 
@@ -2783,7 +4547,9 @@ elif opcja == "Centrum Meczowe":
         tab1, tab2, tab3 = st.tabs(["📝 Raporty Meczowe", "🆚 Analiza Rywala", "📊 Statystyki"])
 
         # --- TAB 1: RAPORTY ---
-        with tab1:
+        # Wybór sezonu/meczu i klik w tabeli rywala przerysowują tylko swoją zakładkę (fragment)
+        @st.fragment
+        def match_reports_tab(df_det_sq):
             if df_det_sq is not None:
                 c1, c2 = st.columns([1, 2])
                 seasons = sorted(df_det_sq['Sezon'].unique(), reverse=True)
@@ -2794,7 +4560,7 @@ elif opcja == "Centrum Meczowe":
                 st.session_state['cm_season_sel'] = sel_season
 
                 subset = df_det_sq[df_det_sq['Sezon'] == sel_season]
-                unique_matches = subset.groupby('Mecz_Label').first().reset_index()
+                unique_matches = subset.groupby('Mecz_Label', observed=True).first().reset_index()
                 if 'Data_Sort' in unique_matches.columns: unique_matches = unique_matches.sort_values('Data_Sort',
                                                                                                       ascending=False)
 
@@ -2807,6 +4573,7 @@ elif opcja == "Centrum Meczowe":
 
                 unique_matches['Display_Label'] = unique_matches.apply(get_display_label, axis=1)
                 display_to_id = dict(zip(unique_matches['Display_Label'], unique_matches['Mecz_Label']))
+                display_to_match_id = dict(zip(unique_matches['Display_Label'], unique_matches['match_id']))
                 options_display = list(unique_matches['Display_Label'])
 
                 sel_display = c2.selectbox("Wybierz Mecz:", options_display, key="cm_match_sel_box_tab1")
@@ -2814,38 +4581,26 @@ elif opcja == "Centrum Meczowe":
 
                 if sel_match_lbl:
                     st.divider()
-                    match_squad = subset[subset['Mecz_Label'] == sel_match_lbl].copy().sort_values('File_Order')
+                    match_squad = get_match_rows(df_det_sq, display_to_match_id[sel_display],
+                                                 load_match_index("wystepy.csv")).copy()
                     render_match_report_logic(sel_match_lbl, match_squad)
             else:
                 st.error("Brak pliku wystepy.csv")
 
+
         # --- TAB 2: ANALIZA RYWALA ---
-        with tab2:
+        @st.fragment
+        def rival_analysis_tab(df_m, df_det_sq):
             st.subheader("🆚 Analiza Rywala i Historia Spotkań")
             if df_m is not None:
                 rivs = sorted(df_m['rywal'].dropna().astype(str).unique()) if 'rywal' in df_m.columns else []
                 sel_r = st.selectbox("Wybierz rywala:", [""] + rivs)
                 if sel_r:
-                    if 'dt_obj' not in df_m.columns:
-                        col_d = next((c for c in df_m.columns if c in ['data meczu', 'data']), None)
-                        if col_d: df_m['dt_obj'] = pd.to_datetime(df_m[col_d], dayfirst=True, errors='coerce')
-
                     rival_matches = df_m[df_m['rywal'] == sel_r].copy()
-                    if 'dt_obj' in rival_matches.columns: rival_matches = rival_matches.sort_values('dt_obj',
+                    if 'dt' in rival_matches.columns: rival_matches = rival_matches.sort_values('dt',
                                                                                                     ascending=False)
 
-                    wins, draws, losses, gf, ga = 0, 0, 0, 0, 0
-                    for _, row in rival_matches.iterrows():
-                        res = parse_result(row.get('wynik'))
-                        if res:
-                            gf += res[0];
-                            ga += res[1]
-                            if res[0] > res[1]:
-                                wins += 1
-                            elif res[0] == res[1]:
-                                draws += 1
-                            else:
-                                losses += 1
+                    wins, draws, losses, gf, ga, _ = match_balance(rival_matches)
                     total = wins + draws + losses
                     k1, k2, k3, k4 = st.columns(4)
                     k1.metric("Mecze", total)
@@ -2854,59 +4609,47 @@ elif opcja == "Centrum Meczowe":
                     k4.metric("Bramki", f"{gf}:{ga}", delta=gf - ga)
                     st.divider()
                     st.markdown("#### 📜 Historia Spotkań")
-                    rival_matches['Data'] = rival_matches['dt_obj'].dt.strftime('%d.%m.%Y')
-                    rival_matches['Gdzie'] = rival_matches['dom'].apply(
-                        lambda x: "🏠 Dom" if str(x).lower() in ['1', 'true', 'dom', 'tak'] else "🚌 Wyjazd")
+                    rival_matches['Data'] = rival_matches['dt'].dt.strftime('%d.%m.%Y')
+                    rival_matches['Gdzie'] = np.where(rival_matches['is_home'], "🏠 Dom", "🚌 Wyjazd")
                     event = st.dataframe(rival_matches[['Data', 'sezon', 'Gdzie', 'wynik']], use_container_width=True,
                                          hide_index=True, on_select="rerun", selection_mode="single-row",
                                          key="rival_analysis_table")
                     if event.selection.rows:
                         idx = event.selection.rows[0]
-                        sel_date = rival_matches.iloc[idx]['dt_obj'].date()
+                        sel_date = rival_matches.iloc[idx]['dt'].date()
                         st.markdown("---")
                         st.subheader(f"Raport z dnia {sel_date.strftime('%d.%m.%Y')}")
                         if df_det_sq is not None and 'Data_Sort' in df_det_sq.columns:
-                            found = df_det_sq[df_det_sq['Data_Sort'].dt.date == sel_date]
+                            found = get_match_rows_by_date(df_det_sq, sel_date, load_match_index("wystepy.csv"))
                             if not found.empty:
-                                render_match_report_logic(found.iloc[0]['Mecz_Label'], found.sort_values('File_Order'))
+                                render_match_report_logic(found.iloc[0]['Mecz_Label'], found)
                             else:
                                 st.warning("Brak szczegółów składu.")
             else:
                 st.error("Brak pliku mecze.csv")
 
+
+        with tab1:
+            match_reports_tab(df_det_sq)
+
+        with tab2:
+            rival_analysis_tab(df_m, df_det_sq)
+
         # --- TAB 3: STATYSTYKI ---
         with tab3:
             st.subheader("📊 Centrum Analityczne")
             if df_m is not None:
-                if 'dt_obj' not in df_m.columns:
-                    col_d = next((c for c in df_m.columns if c in ['data', 'data meczu']), None)
-                    if col_d: df_m['dt_obj'] = pd.to_datetime(df_m[col_d], dayfirst=True, errors='coerce')
-
-                df_stats = df_m.sort_values('dt_obj').copy()
+                df_stats = df_m.sort_values('dt').copy()
 
                 # --- [1] BILANS OGÓLNY ---
                 f_mode = st.radio("Filtruj bilans:", ["Wszystkie", "🏠 Tylko Dom", "🚌 Tylko Wyjazd"], horizontal=True)
                 df_bilans = df_stats.copy()
                 if "Dom" in f_mode:
-                    df_bilans = df_bilans[df_bilans['dom'].astype(str).str.lower().isin(['1', 'true', 'dom', 'tak'])]
+                    df_bilans = df_bilans[df_bilans['is_home']]
                 elif "Wyjazd" in f_mode:
-                    df_bilans = df_bilans[~df_bilans['dom'].astype(str).str.lower().isin(['1', 'true', 'dom', 'tak'])]
-
-                w, d, l, gf, ga = 0, 0, 0, 0, 0
-                seq = []  # Do serii
-                for _, r in df_bilans.iterrows():
-                    res = parse_result(r.get('wynik'))
-                    if res:
-                        gf += res[0];
-                        ga += res[1]
-                        if res[0] > res[1]:
-                            w += 1; seq.append('W')
-                        elif res[0] == res[1]:
-                            d += 1; seq.append('D')
-                        else:
-                            l += 1; seq.append('L')
-                    else:
-                        seq.append(None)
+                    df_bilans = df_bilans[~df_bilans['is_home']]
+
+                w, d, l, gf, ga, _ = match_balance(df_bilans)
 
                 tot = w + d + l
                 c1, c2, c3, c4 = st.columns(4)
@@ -2925,9 +4668,6 @@ elif opcja == "Centrum Meczowe":
 
                     if col_att:
                         # Filtruj domowe
-                        home_keywords = ['1', '1.0', 'true', 'tak', 'dom', 'gospodarz', 'u siebie']
-                        df_stats['is_home'] = df_stats['dom'].astype(str).str.lower().str.strip().apply(
-                            lambda x: x in home_keywords)
                         df_home = df_stats[df_stats['is_home']].copy()
 
                         if not df_home.empty:
@@ -2943,10 +4683,10 @@ elif opcja == "Centrum Meczowe":
                                 fm1, fm2 = st.columns(2)
                                 fm1.metric("Średnia Frekwencja (Sezon)", f"{int(avg_total):,}".replace(",", " "))
                                 fm2.metric("Rekord Frekwencji", f"{int(max_total['Widzów_Num']):,}".replace(",", " "),
-                                           f"{max_total.get('rywal', '')} ({max_total['dt_obj'].strftime('%d.%m')})")
+                                           f"{max_total.get('rywal', '')} ({max_total['dt'].strftime('%d.%m')})")
                                 st.write("")
 
-                                df_home['Miesiąc_Idx'] = df_home['dt_obj'].dt.month
+                                df_home['Miesiąc_Idx'] = df_home['dt'].dt.month
                                 pl_months = {1: 'Styczeń', 2: 'Luty', 3: 'Marzec', 4: 'Kwiecień', 5: 'Maj',
                                              6: 'Czerwiec',
                                              7: 'Lipiec', 8: 'Sierpień', 9: 'Wrzesień', 10: 'Październik',
@@ -2993,37 +4733,32 @@ elif opcja == "Centrum Meczowe":
                 st.markdown("### 🔥 Serie i Passy")
 
 
-                def get_streak_with_breaker(df_source, sequence, target_types):
-                    max_streak = []
-                    current_streak = []
-                    # Reset indeksu, żeby łatwiej znaleźć następny mecz
-                    temp_df = df_source.reset_index(drop=True)
-                    breaker_match = None
-                    final_breaker = None
+                # Serie z cache (liczone raz na wersję danych, dom/wyjazd jako osobne grupy)
+                streak_by = 'is_home' if f_mode != "Wszystkie" else None
+                streaks = load_match_streaks(streak_by)
+                if streak_by:
+                    streaks = streaks[streaks['is_home'] == ("Dom" in f_mode)]
+                streaks = streaks.set_index('kind').reindex(list(STREAK_KINDS))
+                streaks[['longest', 'current']] = streaks[['longest', 'current']].fillna(0).astype(int)
 
-                    for i, code in enumerate(sequence):
-                        if code in target_types:
-                            current_streak.append(temp_df.iloc[i])
-                        else:
-                            if len(current_streak) > len(max_streak):
-                                max_streak = current_streak
-                                # Ten mecz przerwał serię (jest pod indeksem i)
-                                if i < len(temp_df):
-                                    final_breaker = temp_df.iloc[i]
-                            current_streak = []
+                # Mecze w tej samej kolejności co w silniku serii - wiersze serii to wycinek między jej końcami
+                df_seq = played_in_order(df_bilans)
+                seq_pos = pd.Series(np.arange(len(df_seq)), index=df_seq['match_id'].to_numpy())
 
-                    if len(current_streak) > len(max_streak):
-                        max_streak = current_streak
-                        final_breaker = None
 
-                    return (pd.DataFrame(max_streak) if max_streak else pd.DataFrame(), final_breaker)
+                def get_streak_with_breaker(kind):
+                    st_row = streaks.loc[kind]
+                    if not st_row['longest']:
+                        return pd.DataFrame(), None
+                    rows = df_seq.iloc[seq_pos[st_row['longest_start']]:seq_pos[st_row['longest_end']] + 1]
+                    breaker = df_seq.iloc[seq_pos[st_row['breaker']]] if pd.notna(st_row['breaker']) else None
+                    return rows, breaker
 
 
-                # Obliczanie serii
-                s_win, b_win = get_streak_with_breaker(df_bilans, seq, ['W'])
-                s_no_loss, b_no_loss = get_streak_with_breaker(df_bilans, seq, ['W', 'D'])
-                s_loss, b_loss = get_streak_with_breaker(df_bilans, seq, ['L'])
-                s_no_win, b_no_win = get_streak_with_breaker(df_bilans, seq, ['L', 'D'])
+                s_win, b_win = get_streak_with_breaker('W')
+                s_no_loss, b_no_loss = get_streak_with_breaker('WD')
+                s_loss, b_loss = get_streak_with_breaker('L')
+                s_no_win, b_no_win = get_streak_with_breaker('LD')
 
                 # Metryki
                 k1, k2, k3, k4 = st.columns(4)
@@ -3031,6 +4766,9 @@ elif opcja == "Centrum Meczowe":
                 k2.metric("Bez Porażki", len(s_no_loss))
                 k3.metric("Seria Porażek", len(s_loss))
                 k4.metric("Bez Zwycięstwa", len(s_no_win))
+                cur = streaks['current']
+                st.caption(f"Obecnie: {cur['W']} zw. z rzędu · {cur['WD']} bez porażki · "
+                           f"{cur['L']} por. z rzędu · {cur['LD']} bez zwycięstwa")
 
                 with st.expander("🔎 Pokaż szczegóły serii"):
                     ts1, ts2, ts3, ts4 = st.tabs(["Zwycięstwa", "Bez Porażki", "Porażki", "Bez Zwycięstwa"])
@@ -3038,9 +4776,8 @@ elif opcja == "Centrum Meczowe":
 
                     def show_streak_table(d, breaker, is_negative_streak=False):
                         if not d.empty:
-                            d['Gdzie'] = d['dom'].apply(
-                                lambda x: "🏠" if str(x).lower() in ['1', 'true', 'dom', 'tak'] else "🚌")
-                            d['Data'] = d['dt_obj'].dt.strftime('%d.%m.%Y')
+                            d['Gdzie'] = np.where(d['is_home'], "🏠", "🚌")
+                            d['Data'] = d['dt'].dt.strftime('%d.%m.%Y')
                             st.dataframe(d[['Data', 'rywal', 'wynik', 'Gdzie']], hide_index=True,
                                          use_container_width=True)
 
@@ -3048,7 +4785,7 @@ elif opcja == "Centrum Meczowe":
                             if breaker is not None:
                                 b_res = str(breaker.get('wynik', ''))
                                 b_opp = str(breaker.get('rywal', ''))
-                                b_date = breaker['dt_obj'].strftime('%d.%m.%Y')
+                                b_date = breaker['dt'].strftime('%d.%m.%Y')
 
                                 # LOGIKA KOLORÓW:
                                 # Jeśli seria była negatywna (np. Porażki), to jej przerwanie jest DOBRE (Zielony ptaszek)
@@ -3103,11 +4840,15 @@ elif opcja == "🏆 Rekordy & TOP":
                 if df_m is not None: df_m = filter_seasons(df_m, 'sezon')
 
             # --- A. PRZYGOTOWANIE DANYCH ---
-            for col, new_col in [('Gole', 'Gole_Num'), ('Minuty', 'Min_Num'), ('Czerwone', 'R_Num'),
-                                 ('Żółte', 'Y_Num')]:
-                df_w[new_col] = pd.to_numeric(df_w[col], errors='coerce').fillna(0).astype(int)
-
-            df_w['join_key'] = df_w['Zawodnik_Clean'].astype(str).str.lower().str.strip()
+            # Jedna pisownia na zawodnika (z rejestru), żeby rankingi nie rozbijały literówek na osobne wiersze
+            reg_names = load_player_registry().set_index('player_id')['name']
+            df_w = df_w.assign(
+                **{new_col: pd.to_numeric(df_w[col], errors='coerce').fillna(0).astype(int)
+                   for col, new_col in [('Gole', 'Gole_Num'), ('Minuty', 'Min_Num'), ('Czerwone', 'R_Num'),
+                                        ('Żółte', 'Y_Num')]},
+                join_key=df_w['player_id'],
+                Zawodnik_Clean=df_w['player_id'].map(reg_names).fillna(df_w['Zawodnik_Clean']),
+            )
 
             # Normalizacja pilkarze.csv
             col_map = {
@@ -3115,14 +4856,14 @@ elif opcja == "🏆 Rekordy & TOP":
                 'narodowość': 'Narodowość', 'narodowosc': 'Narodowość',
                 'Pozycja': 'pozycja', 'imię i nazwisko': 'nazwisko'
             }
-            df_p.rename(columns={k: v for k, v in col_map.items() if k in df_p.columns}, inplace=True)
-            if 'nazwisko' in df_p.columns: df_p.rename(columns={'nazwisko': 'imię i nazwisko'}, inplace=True)
+            df_p = df_p.rename(columns={k: v for k, v in col_map.items() if k in df_p.columns})
+            if 'nazwisko' in df_p.columns: df_p = df_p.rename(columns={'nazwisko': 'imię i nazwisko'})
 
             # Zabezpieczenie braku kolumn
             if 'Narodowość' not in df_p.columns: df_p['Narodowość'] = '-'
             if 'pozycja' not in df_p.columns: df_p['pozycja'] = '-'
 
-            df_p['join_key'] = df_p['imię i nazwisko'].astype(str).str.lower().str.strip()
+            df_p['join_key'] = df_p['player_id']
 
             # Sortujemy tak, żeby mieć najlepsze dane na górze (jeśli są duplikaty)
             df_p['has_nation'] = df_p['Narodowość'].apply(
@@ -3158,6 +4899,7 @@ elif opcja == "🏆 Rekordy & TOP":
                         gk_stats.append({'Zawodnik_Clean': real_name, 'join_key': player_key, 'Mecze': matches,
                                          'Czyste Konta': clean_sheets, 'Wpuszczone': conceded_total,
                                          'Średnia': conceded_total / matches})
+                gk_stats.sort(key=lambda x: str(x['Zawodnik_Clean']).lower())
 
 
             # --- C. LATA GRY ---
@@ -3206,6 +4948,9 @@ elif opcja == "🏆 Rekordy & TOP":
             # [ZMIANA] Używamy OUTER JOIN, aby nie gubić piłkarzy, którzy są tylko w pilkarze.csv (np. przez błędy w nazwisku)
             full_agg = pd.merge(agg, df_p_dates[['join_key', 'Narodowość', 'pozycja', 'Lata gry', 'Manual_Matches']],
                                 on='join_key', how='outer')
+            # Klucz to liczba - porządek alfabetyczny (dla remisów w rankingach) ustawiamy po nazwisku
+            full_agg = full_agg.sort_values('Zawodnik_Clean', key=lambda s: s.str.lower(), kind='stable',
+                                            na_position='last', ignore_index=True)
 
             # Wypełniamy braki zerami, żeby max() działał poprawnie
             full_agg['Mecze_Liczba'] = full_agg['Mecze_Liczba'].fillna(0)
@@ -3281,7 +5026,7 @@ elif opcja == "🏆 Rekordy & TOP":
                     st.info(f"💡 **Znaczenie:** {description}")
                     if player_list:
                         p_df = pd.DataFrame({'Zawodnik': sorted(list(set(player_list)))})
-                        p_df['join_key'] = p_df['Zawodnik'].astype(str).str.lower().str.strip()
+                        p_df['join_key'] = player_ids(p_df['Zawodnik'])
                         p_df = pd.merge(p_df, df_p_dates[['join_key', 'Lata gry']], on='join_key', how='left')
                         st.dataframe(p_df[['Zawodnik', 'Lata gry']], hide_index=True, use_container_width=True)
                     else:
@@ -3468,27 +5213,18 @@ elif opcja == "Trenerzy":
         df = load_data("trenerzy.csv")
 
         if df is not None:
-            def parse_date_safe(val):
-                s = str(val).strip().lower()
-                if s in ['-', 'nan', '', 'obecnie']: return pd.NaT
-                try:
-                    return pd.to_datetime(s, dayfirst=True)
-                except:
-                    return pd.NaT
-
-
-            if 'początek' in df.columns:
-                df['początek_dt'] = df['początek'].apply(parse_date_safe)
-            else:
-                df['początek_dt'] = pd.NaT
-
-            if 'koniec' in df.columns:
-                df['koniec_dt'] = df['koniec'].apply(parse_date_safe)
+            # Wiersze trenerzy.csv i kadencje mają tę samą kolejność (tenure_id = numer wiersza)
+            tenures = load_coach_tenures()
+            coach_matches = load_coach_matches()
+            df = df.assign(początek_dt=tenures['start'].to_numpy())
+
+            # Mecze i punkty kadencji liczone z wyników w mecze.csv (ręczne kolumny tylko bez pliku meczów)
+            if coach_matches is not None:
+                per_tenure = coach_results(coach_matches, 'tenure_id').reindex(tenures['tenure_id'], fill_value=0)
+                df = df.assign(mecze=per_tenure['mecze'].to_numpy(), punkty=per_tenure['punkty'].to_numpy())
             else:
-                df['koniec_dt'] = pd.NaT
-
-            for col in ['mecze', 'punkty']:
-                if col in df.columns: df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
+                for col in ['mecze', 'punkty']:
+                    if col in df.columns: df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
 
             df = prepare_flags(df)
 
@@ -3519,8 +5255,9 @@ elif opcja == "Trenerzy":
             with t2:
                 st.subheader("📊 Tabela Wszechczasów")
                 if 'punkty' in df.columns and 'mecze' in df.columns:
-                    agg = df.groupby(['imię i nazwisko', 'Narodowość', 'Flaga'], as_index=False)[
-                        ['mecze', 'punkty']].sum()
+                    agg = df.assign(coach_id=tenures['coach_id'].to_numpy()).groupby('coach_id', as_index=False).agg(
+                        {'imię i nazwisko': 'first', 'Narodowość': 'first', 'Flaga': 'first', 'mecze': 'sum',
+                         'punkty': 'sum'}).drop(columns='coach_id')
                     agg['Śr. Pkt'] = (agg['punkty'] / agg['mecze']).fillna(0)
 
                     sort_mode = st.radio("Sortuj według:", ["Punkty (Suma)", "Mecze (Liczba)",
@@ -3553,35 +5290,12 @@ elif opcja == "Trenerzy":
 
                 if sel_compare:
                     comp_data = []
-                    mecze_df = load_data("mecze.csv")
+                    mecze_df = coach_matches
                     if mecze_df is not None:
-                        col_m_date = next((c for c in mecze_df.columns if 'data' in c and 'sort' not in c), None)
-                        if col_m_date:
-                            mecze_df['dt_temp'] = pd.to_datetime(mecze_df[col_m_date], dayfirst=True, errors='coerce')
+                        if 'dt' in mecze_df.columns:
                             for coach in sel_compare:
-                                coach_rows = df[df['imię i nazwisko'] == coach]
-                                mask = pd.Series([False] * len(mecze_df))
-                                for _, c_row in coach_rows.iterrows():
-                                    start = c_row['początek_dt']
-                                    end = c_row['koniec_dt']
-                                    if pd.isna(start): continue
-                                    if pd.isna(end): end = pd.Timestamp.now() + pd.Timedelta(days=365)
-                                    mask |= (mecze_df['dt_temp'] >= start) & (mecze_df['dt_temp'] <= end)
-
-                                cm = mecze_df[mask]
-                                w, d, l, gf, ga, pts_sum = 0, 0, 0, 0, 0, 0
-                                if not cm.empty:
-                                    for _, row_match in cm.iterrows():
-                                        res = parse_result(row_match.get('wynik'))
-                                        if res:
-                                            gf += res[0];
-                                            ga += res[1]
-                                            if res[0] > res[1]:
-                                                w += 1; pts_sum += 3
-                                            elif res[0] == res[1]:
-                                                d += 1; pts_sum += 1
-                                            else:
-                                                l += 1
+                                cm = mecze_df[mecze_df['coach_id'] == player_id(coach)]
+                                w, d, l, gf, ga, pts_sum = match_balance(cm)
 
                                 total_m = w + d + l
                                 avg_pts = pts_sum / total_m if total_m > 0 else 0
@@ -3607,7 +5321,8 @@ elif opcja == "Trenerzy":
                                     }
                                 )
 
-                                if HAS_PLOTLY:
+                                go = load_plotly()
+                                if go is not None:
                                     fig = go.Figure()
                                     fig.add_trace(go.Bar(x=res_df.index, y=res_df['Średnia Pkt'], name='Średnia Pkt',
                                                          marker_color='#2ecc71'))
@@ -3807,7 +5522,7 @@ elif opcja == "🕵️ Ciemne Karty Historii":
 
             if df_w_hist is not None:
                 def get_player_seasons(p_name):
-                    p_rows = df_w_hist[df_w_hist['Zawodnik_Clean'] == p_name]
+                    p_rows = df_w_hist[df_w_hist['player_id'] == player_id(p_name)]
                     if p_rows.empty: return "Brak w bazie"
                     if 'Sezon' not in p_rows.columns: return "Brak danych"
                     seasons = sorted(p_rows['Sezon'].unique().tolist())
@@ -0,0 +1,89 @@
+"""Lekka ścieżka startu: ekran logowania i pomiar czasu startu aplikacji.
+
+Moduł importuje tylko streamlit i bibliotekę standardową, więc formularz logowania rysuje się
+bez ładowania pandas i plotly. Ciężkie moduły app.py importuje dopiero po zalogowaniu, a ekran
+logowania rozgrzewa je w tle, zanim użytkownik wpisze hasło.
+"""
+import contextlib
+import importlib
+import threading
+import time
+
+import streamlit as st
+
+# --- LOGOWANIE ---
+USERS = {
+    "Djero": "TSP1995",
+    "KKowalski": "Tsp2025",
+    "PPorebski": "TSP2025",
+    "MCzerniak": "TSP2025",
+    "SJaszczurowski": "TSP2025",
+    "guest": "123456789",
+    "JFilip": "KochamPodbeskidzie",
+    "DJakubiec": "GodziszkaToMy",
+    "DStanclik": "TSP2026",
+    "Gabrielba": "TSP2026",
+    "MSeredyniecki": "TSP2026"
+}
+
+# Moduły, których aplikacja potrzebuje zaraz po zalogowaniu (importowane w tle z ekranu logowania)
+WARMUP_MODULES = ["numpy", "pandas", "pyarrow"]
+
+# ==========================================
+# CZAS STARTU (KROKI IMPORTU I INICJALIZACJI)
+# ==========================================
+# Krok -> {'first': czas w pierwszym przebiegu procesu (zimny start), 'last': czas w ostatnim przebiegu}.
+# Słownik żyje w module, więc jest wspólny dla sesji i przetrwa kolejne przebiegi skryptu.
+STARTUP_TIMES = {}
+_warmup = {'thread': None}
+_warmup_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def startup_step(name):
+    """Mierzy krok startu (import, inicjalizacja) i zapisuje go w STARTUP_TIMES."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STARTUP_TIMES.setdefault(name, {'first': elapsed})['last'] = elapsed
+
+
+def _import_warmup_modules():
+    for name in WARMUP_MODULES:
+        with startup_step(f"import {name} (w tle, ekran logowania)"):
+            try:
+                importlib.import_module(name)
+            except ImportError:
+                pass
+
+
+def warm_up_imports():
+    """Raz na proces importuje WARMUP_MODULES w wątku w tle (import w app.py poczeka na niego, nie zdubluje)."""
+    with _warmup_lock:
+        if _warmup['thread'] is None:
+            _warmup['thread'] = threading.Thread(target=_import_warmup_modules, name="tsp-warmup", daemon=True)
+            _warmup['thread'].start()
+
+
+def login():
+    st.title("🔒 Panel Logowania TSP")
+    col1, col2, col3 = st.columns([1, 2, 1])
+    with col2:
+        u = st.text_input("Użytkownik")
+        p = st.text_input("Hasło", type="password")
+        if st.button("Zaloguj", use_container_width=True):
+            if u in USERS and USERS[u] == p:
+                st.session_state['logged_in'] = True
+                st.session_state['username'] = u
+                st.rerun()
+            else:
+                st.error("Błąd logowania")
+    warm_up_imports()
+
+
+def logout():
+    st.session_state['logged_in'] = False
+    st.session_state['username'] = ""
+    st.rerun()